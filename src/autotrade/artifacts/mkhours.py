@@ -3,12 +3,14 @@
 # Contact: tungstudies@gmail.com
 
 import datetime
+from typing import Optional
 
 import pandas_market_calendars as mcal
 import pytz
 
 from src.autotrade.artifacts.enums import IntervalOption
 from src.errors import ValueNotPresentException
+from src.utility.clock import VirtualClock
 import math
 
 
@@ -30,19 +32,24 @@ class MarketHour:
         self._local_tz = self._exch.tz.zone
         self._interval_option = IntervalOption.get_interval(interval_option=interval_option)
         self._bar_gap_seconds = self._interval_option.value[1]
+        self._clock = VirtualClock()
 
     # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def local_tz(self):
+        return self._local_tz
+
     @property
     def exchange_open(self):
-        return datetime.datetime.now(tz=self._exch.tz).replace(hour=self._exch.open_time.hour,
-                                                               minute=self._exch.open_time.minute,
-                                                               second=0, microsecond=0)
+        return self._clock.now(tz=self._exch.tz).replace(hour=self._exch.open_time.hour,
+                                                          minute=self._exch.open_time.minute,
+                                                          second=0, microsecond=0)
 
     @property
     def exchange_close(self):
-        return datetime.datetime.now(tz=self._exch.tz).replace(hour=self._exch.close_time.hour,
-                                                               minute=self._exch.close_time.minute,
-                                                               second=0, microsecond=0)
+        return self._clock.now(tz=self._exch.tz).replace(hour=self._exch.close_time.hour,
+                                                          minute=self._exch.close_time.minute,
+                                                          second=0, microsecond=0)
 
     @property
     def local_open(self):
@@ -70,9 +77,9 @@ class MarketHour:
 
     # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
     def is_open_now(self):
-        if len(self._exch.schedule(start_date=datetime.datetime.utcnow().date(),
-                                   end_date=datetime.datetime.utcnow().date())) > 0:
-            return self.utc_open <= datetime.datetime.now(tz=pytz.UTC) <= self.utc_close
+        today = self._clock.utcnow().date()
+        if len(self._exch.schedule(start_date=today, end_date=today)) > 0:
+            return self.utc_open <= self._clock.now(tz=pytz.UTC) <= self.utc_close
         else:
             return False
 
@@ -82,15 +89,65 @@ class MarketHour:
 
     @property
     def bar_zero_timestamp(self):
-        if datetime.datetime.now().timestamp() >= self.close_timestamp:
+        now_timestamp = self._clock.timestamp()
+        if now_timestamp >= self.close_timestamp:
             return int(self.close_timestamp)
         else:
-            time_diff = datetime.datetime.now().timestamp() - self.open_timestamp
+            time_diff = now_timestamp - self.open_timestamp
             return int(self.open_timestamp + math.floor(time_diff / self._bar_gap_seconds) * self._bar_gap_seconds)
 
     @property
     def seconds_to_next_bar(self):
-        return self.bar_zero_timestamp + self._bar_gap_seconds - datetime.datetime.now().timestamp()
+        return self.bar_zero_timestamp + self._bar_gap_seconds - self._clock.timestamp()
+
+    def compute_bars_start(self, bar_count: int, now: Optional[datetime.datetime] = None,
+                           max_lookback_days: int = 3650) -> datetime.datetime:
+        """Returns the (UTC) start time of the earliest of the latest ``bar_count`` bars.
+        Bars are counted session by session from the exchange calendar, so weekends, holidays and early closes
+        are accounted for. The bar still forming in an open session counts as a bar.
+        """
+        now = now if now else self._clock.now(tz=pytz.UTC)
+        now_timestamp = now.timestamp()
+        gap = self._bar_gap_seconds
+
+        if gap >= 86400:
+            bars_per_session = 1
+        else:
+            regular_open = datetime.datetime.combine(now.date(), self._exch.open_time)
+            regular_close = datetime.datetime.combine(now.date(), self._exch.close_time)
+            bars_per_session = math.ceil((regular_close - regular_open).total_seconds() / gap)
+
+        # about 5 sessions per 7 calendar days, plus a week of margin for holidays
+        lookback_days = math.ceil(math.ceil(bar_count / bars_per_session) * 7 / 5) + 7
+
+        while lookback_days <= max_lookback_days:
+            schedule = self._exch.schedule(start_date=(now - datetime.timedelta(days=lookback_days)).date(),
+                                           end_date=now.date())
+            remaining = bar_count
+
+            for market_open, market_close in zip(reversed(schedule['market_open'].tolist()),
+                                                 reversed(schedule['market_close'].tolist())):
+                open_timestamp = market_open.timestamp()
+                if open_timestamp >= now_timestamp:
+                    continue
+
+                if gap >= 86400:
+                    session_bars = 1
+                else:
+                    session_end = min(market_close.timestamp(), now_timestamp)
+                    session_bars = math.ceil((session_end - open_timestamp) / gap)
+
+                if session_bars >= remaining:
+                    start_timestamp = open_timestamp + (session_bars - remaining) * gap if gap < 86400 \
+                        else open_timestamp
+                    return datetime.datetime.fromtimestamp(start_timestamp, tz=pytz.UTC)
+
+                remaining -= session_bars
+
+            lookback_days *= 2
+
+        raise ValueError(f'Unable to find {bar_count} bars of {self._interval_option.value[0]} '
+                         f'within {max_lookback_days} days')
 
 
 # DIVIDER: --------------------------------------
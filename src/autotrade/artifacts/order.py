@@ -1,13 +1,11 @@
 # Copyright (C) 2021-2030 StockRead Inc.
 # Author: Thanh Tung Nguyen
 # Contact: tungstudies@gmail.com
-import random
-import string
-import uuid
 from abc import ABC
 from typing import Optional
 
 from src.autotrade.artifacts.enums import OrderStatus, OrderType
+from src.autotrade.artifacts.order_id import client_order_ids, client_stop_order_ids
 from src.errors import MissingOrderAttributeError
 
 
@@ -15,6 +13,12 @@ from src.errors import MissingOrderAttributeError
 # INFO: BaseOrder Abstract Class
 
 class BaseOrder(ABC):
+    # slotted: a backtest keeps many thousands of orders, so they carry no per-instance __dict__
+    __slots__ = ('_client_ref_id', '_trading_symbol', '_ref_price', '_size', '_isbuy', '_status', '_order_type',
+                 '_limit_price', '_ticker_id', '_created_at', '_created_timestamp', '_broker_ref_id',
+                 '_is_broker_settled', '_broker_traded_symbol', '_filled_price', '_transaction_value', '_filled_at',
+                 '_filled_timestamp', '_fill_quantity', '_commission_fee')
+
     def __init__(self, trading_symbol: str, size: int, isbuy: bool, ref_price: float,
                  client_ref_id):
         self._client_ref_id = client_ref_id
@@ -25,8 +29,9 @@ class BaseOrder(ABC):
 
         self._status = OrderStatus.CREATED
 
-        # order type to be defined by child classes
+        # order type and limit price to be defined by child classes
         self._order_type: Optional[OrderType] = None
+        self._limit_price: Optional[float] = None
 
         # pre-submit attributes
         self._ticker_id: Optional[str] = None  # get ticker_id from broker
@@ -159,6 +164,32 @@ class BaseOrder(ABC):
     def commission_fee(self):
         return self._commission_fee
 
+    def to_record(self) -> dict:
+        """Returns the order attributes as a json-serializable dict (i.e.: for the settled order ledger)"""
+        return {
+            'client_ref_id': self._client_ref_id,
+            'broker_ref_id': self._broker_ref_id,
+            'trading_symbol': self._trading_symbol,
+            'ticker_id': self._ticker_id,
+            'order_type': self.type,
+            'isbuy': self._isbuy,
+            'status': self.status,
+            'size': self._size,
+            'ref_price': self._ref_price,
+            'limit_price': self._limit_price,
+            'stop_price': getattr(self, '_stop_price', None),
+            'created_at': self._created_at,
+            'created_timestamp': self._created_timestamp,
+            'is_broker_settled': self._is_broker_settled,
+            'broker_traded_symbol': self._broker_traded_symbol,
+            'filled_price': self._filled_price,
+            'transaction_value': self._transaction_value,
+            'filled_at': self._filled_at,
+            'filled_timestamp': self._filled_timestamp,
+            'fill_quantity': self._fill_quantity,
+            'commission_fee': self._commission_fee,
+        }
+
     # INFO: Class Setters
 
     # after-submit attributes
@@ -202,6 +233,16 @@ class BaseOrder(ABC):
     def set_commission_fee(self, commission_fee: float):
         self._commission_fee = commission_fee
 
+    def set_fill(self, filled_price: float, fill_quantity: int, transaction_value: float, filled_at: str,
+                 filled_timestamp: int, commission_fee: float = 0.0):
+        """Sets all on-fill attributes in one call"""
+        self._filled_price = filled_price
+        self._fill_quantity = fill_quantity
+        self._transaction_value = transaction_value
+        self._filled_at = filled_at
+        self._filled_timestamp = filled_timestamp
+        self._commission_fee = commission_fee
+
     def is_settled(self):
         """Returns True if the order is settled."""
         return self._status in [OrderStatus.CANCELED, OrderStatus.FILLED, OrderStatus.REJECTED, OrderStatus.EXPIRED]
@@ -247,12 +288,13 @@ class BaseOrder(ABC):
 # INFO: RegularOrder Concrete Class
 
 class RegularOrder(BaseOrder):
+    __slots__ = ('_islimit',)
 
     def __init__(self, trading_symbol: str, size: int, isbuy: bool, islimit: bool, limit_price: float,
-                 client_ref_id=f"c-order-{uuid.uuid1().__str__()}-"
-                               f"{''.join(random.choice(string.ascii_lowercase) for _ in range(10))}", ref_price=None):
+                 client_ref_id: Optional[str] = None, ref_price=None):
 
-        super().__init__(trading_symbol=trading_symbol, size=size, client_ref_id=client_ref_id,
+        super().__init__(trading_symbol=trading_symbol, size=size,
+                         client_ref_id=client_ref_id if client_ref_id else client_order_ids.next_id(),
                          isbuy=isbuy, ref_price=ref_price)
 
         self._islimit = islimit
@@ -279,13 +321,14 @@ class RegularOrder(BaseOrder):
 # DIVIDER: --------------------------------------
 # INFO: StopOrder Concrete Class
 class StopOrder(BaseOrder):
+    __slots__ = ('_stop_price', '_isstoplimit')
 
     def __init__(self, trading_symbol: str, size: int, isbuy: bool,
                  isstoplimit: bool, limit_price: float, stop_price: float,
-                 client_ref_id=f"c-stp-order-{uuid.uuid1().__str__()}-"
-                               f"{''.join(random.choice(string.ascii_lowercase) for _ in range(10))}", ref_price=None):
+                 client_ref_id: Optional[str] = None, ref_price=None):
 
-        super().__init__(trading_symbol=trading_symbol, size=size, client_ref_id=client_ref_id,
+        super().__init__(trading_symbol=trading_symbol, size=size,
+                         client_ref_id=client_ref_id if client_ref_id else client_stop_order_ids.next_id(),
                          isbuy=isbuy, ref_price=ref_price)
 
         self._stop_price = stop_price
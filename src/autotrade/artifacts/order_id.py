@@ -0,0 +1,83 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import itertools
+import os
+import time
+from typing import Optional, Union
+
+# start time of the run (hexadecimal epoch seconds), so IDs of different runs never collide
+RUN_TOKEN = format(int(time.time()), 'x')
+
+
+# DIVIDER: --------------------------------------
+# INFO: OrderIDAllocator Concrete Class
+
+class OrderIDAllocator:
+    """
+    Order IDs made of a prefix, the run token, a shard and a monotonic counter (i.e.: 'order-617f1a2b-4120-1024').
+    The shard is the process ID unless set (i.e.: to the worker index of a parameter sweep), and a forked worker
+    process gets its own process ID as shard and a fresh counter, so IDs stay unique across runs and processes.
+    """
+
+    def __init__(self, prefix: str, shard: Optional[Union[int, str]] = None):
+        self._prefix = prefix
+        self._shard = None
+        self._head = ''
+        # itertools.count is advanced atomically, so IDs stay unique across threads without a lock
+        self._counter = itertools.count(1)
+        self.set_shard(shard)
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('Prefix: {}'.format(self._prefix))
+        tojoin.append('RunToken: {}'.format(RUN_TOKEN))
+        tojoin.append('Shard: {}'.format(self._shard))
+
+        return ', '.join(tojoin)
+
+    def set_shard(self, shard: Optional[Union[int, str]] = None):
+        """Sets the shard of the IDs (the process ID by default)"""
+        self._shard = shard if shard is not None else os.getpid()
+        self._head = '{}-{}-{}-'.format(self._prefix, RUN_TOKEN, self._shard)
+
+    def reset(self):
+        """Restarts the counter with the process ID as shard (i.e.: in a forked worker process)"""
+        self._counter = itertools.count(1)
+        self.set_shard()
+
+    def next_id(self) -> str:
+        return self._head + str(next(self._counter))
+
+
+# client order IDs given by the order constructors, and the order IDs given by the backtesting broker
+client_order_ids = OrderIDAllocator('c-order')
+client_stop_order_ids = OrderIDAllocator('c-stp-order')
+back_broker_order_ids = OrderIDAllocator('order')
+
+
+def set_order_id_shard(shard: Optional[Union[int, str]] = None):
+    """Sets the shard of every order ID allocator (i.e.: the worker index, at the start of each worker process)"""
+    for allocator in (client_order_ids, client_stop_order_ids, back_broker_order_ids):
+        allocator.set_shard(shard)
+
+
+def _reset_after_fork():
+    for allocator in (client_order_ids, client_stop_order_ids, back_broker_order_ids):
+        allocator.reset()
+
+
+# a forked worker inherits the counters of its parent (spawned workers import this module again)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    print(client_order_ids.next_id(), client_order_ids.next_id())
+    set_order_id_shard(3)
+    print(back_broker_order_ids.next_id(), back_broker_order_ids)
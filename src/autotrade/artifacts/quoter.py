@@ -2,10 +2,74 @@
 # Author: Thanh Tung Nguyen
 # Contact: tungstudies@gmail.com
 
+import logging
 from abc import ABC, abstractmethod
-from typing import Optional
+from threading import Lock
+from typing import Optional, Iterable, Dict, List
+from weakref import WeakSet
 
 from src.datafeed.questrade.questrade_api import QuesTradeAPI
+from src.utility.clock import VirtualClock
+
+
+# DIVIDER: --------------------------------------
+# INFO: QuoteSnapshot Concrete Class
+
+class QuoteSnapshot:
+    """Level-1 quote captured at a single point in time, so that prices derived from it are consistent"""
+
+    def __init__(self, bid_price: float, bid_size: int, ask_price: float, ask_size: int, fetched_timestamp: float):
+        self._bid_price = bid_price
+        self._bid_size = bid_size
+        self._ask_price = ask_price
+        self._ask_size = ask_size
+        self._fetched_timestamp = fetched_timestamp
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('BidPrice: {}'.format(self._bid_price))
+        tojoin.append('BidSize: {}'.format(self._bid_size))
+        tojoin.append('AskPrice: {}'.format(self._ask_price))
+        tojoin.append('AskSize: {}'.format(self._ask_size))
+        tojoin.append('FetchedTimestamp: {}'.format(self._fetched_timestamp))
+
+        return ', '.join(tojoin)
+
+    @classmethod
+    def from_questrade(cls, quote: dict, fetched_timestamp: float):
+        return cls(bid_price=quote['bidPrice'], bid_size=quote['bidSize'], ask_price=quote['askPrice'],
+                   ask_size=quote['askSize'], fetched_timestamp=fetched_timestamp)
+
+    @property
+    def bid_price(self):
+        return self._bid_price
+
+    @property
+    def bid_size(self):
+        return self._bid_size
+
+    @property
+    def ask_price(self):
+        return self._ask_price
+
+    @property
+    def ask_size(self):
+        return self._ask_size
+
+    @property
+    def fetched_timestamp(self):
+        return self._fetched_timestamp
+
+    @property
+    def mid_price(self):
+        mid_price = (self._bid_price * self._bid_size + self._ask_price * self._ask_size) / (
+                self._bid_size + self._ask_size)
+        return round(mid_price, 2)
+
+    @property
+    def ask_bid_spread(self):
+        return self._ask_price - self._bid_price
 
 
 # DIVIDER: --------------------------------------
@@ -21,6 +85,19 @@ class IQuoter(ABC):
     def _get_quote(self):
         raise NotImplementedError()
 
+    @abstractmethod
+    def refresh(self) -> QuoteSnapshot:
+        raise NotImplementedError()
+
+    def refresh_bar(self):
+        """Called by the trade once per bar. Quoters sharing a quote source may refresh together here"""
+        pass
+
+    @property
+    @abstractmethod
+    def snapshot(self) -> QuoteSnapshot:
+        raise NotImplementedError()
+
     @property
     @abstractmethod
     def bid_price(self):
@@ -56,46 +133,105 @@ class IQuoter(ABC):
 # INFO: QuestradeQuoter Concrete Class
 
 class QuestradeQuoter(IQuoter):
-
-    def __init__(self):
+    """
+    Prices are read from a ``QuoteSnapshot`` which is fetched once and reused for ``ttl_seconds``, so that
+    the prices of one pricing decision are consistent and cost one request. ``refresh`` forces a new snapshot.
+    At each bar, ``refresh_bar`` refreshes the stale snapshots of every quoter of the process in one batch request.
+    """
+
+    _quoters: 'WeakSet[QuestradeQuoter]' = WeakSet()
+    _quoters_lock = Lock()
+    # a child of the default Logger service logger, like the broker loggers
+    _logger = logging.getLogger('stock_trading_logger.QuestradeQuoter')
+
+    def __init__(self, questrade_api: Optional[QuesTradeAPI] = None, ttl_seconds: float = 1.0):
+        """
+        :param questrade_api: quote source, the ``QuesTradeAPI`` singleton by default (or a replay stand-in)
+        :param ttl_seconds: seconds a quote snapshot stays valid
+        """
         self.ticker_symbol = None
-        self.questrade_api: Optional[QuesTradeAPI] = None
+        self.questrade_api: Optional[QuesTradeAPI] = questrade_api
+        self._ttl_seconds = ttl_seconds
+        self._clock = VirtualClock()
+        self._snapshot: Optional[QuoteSnapshot] = None
 
     def set_ticker_symbol(self, ticker_symbol_alias: str):
         self.ticker_symbol = ticker_symbol_alias
-        self.questrade_api = QuesTradeAPI()
+        self._snapshot = None
+        if not self.questrade_api:
+            self.questrade_api = QuesTradeAPI()
+
+        with self._quoters_lock:
+            self._quoters.add(self)
 
     def _get_quote(self):
         return self.questrade_api.get_quotes(self.ticker_symbol)
 
+    def refresh(self) -> QuoteSnapshot:
+        self._snapshot = QuoteSnapshot.from_questrade(self._get_quote(), fetched_timestamp=self._clock.timestamp())
+        return self._snapshot
+
+    def set_quote(self, quote: dict):
+        """set the snapshot from a quote retrieved elsewhere (i.e.: by a batch request)"""
+        self._snapshot = QuoteSnapshot.from_questrade(quote, fetched_timestamp=self._clock.timestamp())
+
+    def refresh_bar(self):
+        """Refreshes the snapshots of every stale quoter of the process (this one included) in one batch request"""
+        with self._quoters_lock:
+            quoters = [quoter for quoter in self._quoters if quoter.is_stale]
+        if quoters:
+            self.refresh_all(quoters)
+
+    @staticmethod
+    def refresh_all(quoters: Iterable['QuestradeQuoter']):
+        """Refreshes the snapshots of many quoters with one batch quote request per quote source.
+        A quoter whose ticker is missing from the batch keeps its snapshot (and refreshes on its own once stale)
+        """
+        quoters_by_api: Dict[int, List[QuestradeQuoter]] = dict()
+        for quoter in quoters:
+            quoters_by_api.setdefault(id(quoter.questrade_api), list()).append(quoter)
+
+        for api_quoters in quoters_by_api.values():
+            quotes = api_quoters[0].questrade_api.get_quotes_batch({quoter.ticker_symbol for quoter in api_quoters})
+            for quoter in api_quoters:
+                if quoter.ticker_symbol in quotes:
+                    quoter.set_quote(quotes[quoter.ticker_symbol])
+                else:
+                    QuestradeQuoter._logger.warning('No quote for %s in the batch', quoter.ticker_symbol)
+
+    @property
+    def is_stale(self) -> bool:
+        return not self._snapshot or self._clock.timestamp() - self._snapshot.fetched_timestamp >= self._ttl_seconds
+
+    @property
+    def snapshot(self) -> QuoteSnapshot:
+        if self.is_stale:
+            return self.refresh()
+        return self._snapshot
+
     @property
     def bid_price(self):
-        return self._get_quote()['bidPrice']
+        return self.snapshot.bid_price
 
     @property
     def bid_size(self):
-        return self._get_quote()['bidSize']
+        return self.snapshot.bid_size
 
     @property
     def ask_price(self):
-        return self._get_quote()['askPrice']
+        return self.snapshot.ask_price
 
     @property
     def ask_size(self):
-        return self._get_quote()['askSize']
+        return self.snapshot.ask_size
 
     @property
     def mid_price(self):
-        quote = self._get_quote()
-        mid_price = (quote['bidPrice'] * quote['bidSize'] + quote['askPrice'] * quote['askSize']) / (
-                quote['bidSize'] + quote['askSize'])
-        return round(mid_price, 2)
+        return self.snapshot.mid_price
 
     @property
     def ask_bid_spread(self):
-        quote = self._get_quote()
-        price_gap = quote['askPrice'] - quote['bidPrice']
-        return price_gap
+        return self.snapshot.ask_bid_spread
 
 
 # DIVIDER: --------------------------------------
@@ -105,3 +241,14 @@ if __name__ == '__main__':
     qq = QuestradeQuoter()
     qq.set_ticker_symbol('CTS.TO')
     print(qq.mid_price)
+    # served from the same snapshot without a second request
+    print(qq.bid_price, qq.ask_price)
+
+    portfolio_quoters = list()
+    for symbol in ['AC.TO', 'SHOP.TO', 'CTS.TO']:
+        symbol_quoter = QuestradeQuoter()
+        symbol_quoter.set_ticker_symbol(symbol)
+        portfolio_quoters.append(symbol_quoter)
+    # one request for all symbols
+    QuestradeQuoter.refresh_all(portfolio_quoters)
+    print([symbol_quoter.mid_price for symbol_quoter in portfolio_quoters])
@@ -1,11 +1,15 @@
+import datetime
 from typing import Optional
 
+from dateutil import tz
+
 
 class Bar:
-    def __init__(self, bar_dict: dict):
+    def __init__(self, bar_dict: dict, local_tz: Optional[str] = None):
+        # 'datetime' is not pre-declared: if bar_dict has no 'datetime', it is derived from 'timestamp' on access
+        self._local_tz = local_tz
         self.is_live_bar: Optional[int] = None
         self.timestamp: Optional[int] = None
-        self.datetime: Optional[int] = None
         self.open: Optional[float] = None
         self.close: Optional[float] = None
         self.high: Optional[float] = None
@@ -17,6 +21,16 @@ class Bar:
         # IMPORTANT: this line must be at the end of the constructor to be able to overwrite the pre-declared attributes
         self.__dict__.update(bar_dict)
 
+    def __getattr__(self, item):
+        if item == 'datetime':
+            timestamp = self.__dict__.get('timestamp')
+            value = None if timestamp is None else datetime.datetime.fromtimestamp(
+                timestamp, tz=tz.gettz(self.__dict__.get('_local_tz')))
+            self.__dict__['datetime'] = value
+            return value
+
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{item}'")
+
     def __str__(self):
         tojoin = list()
         tojoin.append('ClassType: {}'.format(type(self).__name__))
@@ -52,7 +52,7 @@ class BarFeed:
         # loop through dict list converted from the pandas frame
         for bar_dict in self._find_bar_zero_dict_list():
 
-            bar = Bar(bar_dict=bar_dict)
+            bar = Bar(bar_dict=bar_dict, local_tz=self._market_hour.local_tz)
 
             if bar_count < self._index + 1:
                 if bar_count == 0:
@@ -90,11 +90,11 @@ class BarFeed:
 
     @property
     def latest_retrieved_bar(self):
-        return Bar(bar_dict=list(self._frame.to_dict('index').values())[-1])
+        return Bar(bar_dict=list(self._frame.to_dict('index').values())[-1], local_tz=self._market_hour.local_tz)
 
     @property
     def last_valid_bar(self):
-        return Bar(bar_dict=self._find_bar_zero_dict_list()[-1])
+        return Bar(bar_dict=self._find_bar_zero_dict_list()[-1], local_tz=self._market_hour.local_tz)
 
     @property
     def valid_bar_count(self):
@@ -0,0 +1,174 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import time
+from threading import Lock
+from typing import Dict, Tuple, List, Optional
+
+import pandas as pd
+
+from src.autotrade.bars.barfeed import BarFeed
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever
+from src.errors import CandleRetrieverConflictError
+from src.utility.singleton import SingletonMeta
+
+
+# DIVIDER: --------------------------------------
+# INFO: CandleDataHub Concrete Class
+
+class CandleDataHub(metaclass=SingletonMeta):
+    """Process-wide candle store keyed by (ticker_alias, interval_option).
+    Candles are fetched once per bar for each key and fanned out to every subscribed ``BarFeed``,
+    so trades sharing a symbol and interval share a single upstream request. A frame missing the expected bar
+    (or whose last bar is still empty) is stale: it is re-fetched, at most once per ``stale_refetch_seconds``,
+    and the newer frame is pushed again to every subscribed barfeed.
+    """
+
+    def __init__(self, stale_refetch_seconds: float = 5.0):
+        self._lock = Lock()
+        self._key_locks: Dict[Tuple[str, str], Lock] = dict()
+        self._stale_refetch_seconds = stale_refetch_seconds
+
+        self._retrievers: Dict[Tuple[str, str], ICandleRetriever] = dict()
+        self._retriever_types: Dict[Tuple[str, str], type] = dict()
+        self._candle_counts: Dict[Tuple[str, str], int] = dict()
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = dict()
+        self._frame_versions: Dict[Tuple[str, str], int] = dict()
+        self._fetched_bar_timestamps: Dict[Tuple[str, str], int] = dict()
+        self._fetched_candle_counts: Dict[Tuple[str, str], int] = dict()
+        self._fetched_monotonics: Dict[Tuple[str, str], float] = dict()
+
+        # subscribed barfeeds and the frame version each of them was last updated with
+        self._barfeeds: Dict[Tuple[str, str], List[BarFeed]] = dict()
+        self._pushed_versions: Dict[int, int] = dict()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('Keys: {}'.format(list(self._retrievers.keys())))
+        tojoin.append('BarFeedCount: {}'.format(sum(len(feeds) for feeds in self._barfeeds.values())))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def subscribe(self, ticker_symbol: str, interval_option: str, candle_count: int,
+                  candle_retriever: ICandleRetriever) -> Tuple[str, str]:
+        """Registers a trade's interest in a (ticker, interval) key. The first retriever registered for a key
+        is kept and reused by all later subscribers, which must provide a retriever of the same type.
+        Returns the key to be used for later calls.
+        """
+        key = (ticker_symbol, interval_option)
+
+        with self._lock:
+            if key not in self._retrievers:
+                self._retrievers[key] = candle_retriever.for_symbol(ticker_symbol, interval_option)
+                self._retriever_types[key] = type(candle_retriever)
+                self._key_locks[key] = Lock()
+                self._barfeeds[key] = list()
+                self._frame_versions[key] = 0
+
+            elif self._retriever_types[key] is not type(candle_retriever):
+                raise CandleRetrieverConflictError(key=key,
+                                                   expected_retriever=self._retriever_types[key].__name__,
+                                                   provided_retriever=type(candle_retriever).__name__)
+
+            self._candle_counts[key] = max(self._candle_counts.get(key, 0), candle_count)
+
+        return key
+
+    def unsubscribe(self, key: Tuple[str, str], barfeed: Optional[BarFeed] = None):
+        """Stops updating the barfeed. The key (and its stored frame) is dropped once no barfeed is left"""
+        with self._lock:
+            if key not in self._retrievers:
+                return
+
+            with self._key_locks[key]:
+                if barfeed is not None and barfeed in self._barfeeds[key]:
+                    self._barfeeds[key].remove(barfeed)
+                    self._pushed_versions.pop(id(barfeed), None)
+
+                if not self._barfeeds[key]:
+                    for store in (self._retrievers, self._retriever_types, self._barfeeds, self._candle_counts,
+                                  self._frames, self._frame_versions, self._fetched_bar_timestamps,
+                                  self._fetched_candle_counts, self._fetched_monotonics):
+                        store.pop(key, None)
+                    self._key_locks.pop(key)
+
+    def attach_barfeed(self, key: Tuple[str, str], barfeed: BarFeed):
+        """Adds a barfeed, built from the current frame of the given key, to the fan-out list of the key"""
+        with self._lock:
+            self._barfeeds[key].append(barfeed)
+            self._pushed_versions[id(barfeed)] = self._frame_versions[key]
+
+    def get_x_candles(self, key: Tuple[str, str], candle_count: int, bar_timestamp: int,
+                      expected_timestamp: Optional[int] = None) -> pd.DataFrame:
+        """Returns the latest ``candle_count`` candles of the key, requesting upstream at most once per bar
+        (unless the stored frame does not hold the bar of ``expected_timestamp`` yet)
+        """
+        frame, _ = self._fetch(key, bar_timestamp, expected_timestamp)
+        df = frame.tail(candle_count).copy()
+        df.reset_index(level=0, drop=True, inplace=True)
+        return df
+
+    def refresh(self, key: Tuple[str, str], bar_timestamp: int, expected_timestamp: Optional[int] = None) -> bool:
+        """Fetches the key for the given bar and updates every subscribed barfeed not yet updated with the newest
+        frame. Returns False if the frame is still stale (i.e.: the bar of ``expected_timestamp`` is missing)
+        """
+        frame, is_fresh = self._fetch(key, bar_timestamp, expected_timestamp)
+
+        with self._key_locks[key]:
+            version = self._frame_versions[key]
+            for barfeed in self._barfeeds[key]:
+                if self._pushed_versions.get(id(barfeed)) != version:
+                    barfeed.update(dataframe=frame.copy())
+                    self._pushed_versions[id(barfeed)] = version
+
+        return is_fresh
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _fetch(self, key: Tuple[str, str], bar_timestamp: int,
+               expected_timestamp: Optional[int] = None) -> Tuple[pd.DataFrame, bool]:
+        with self._key_locks[key]:
+            frame: Optional[pd.DataFrame] = self._frames.get(key)
+            candle_count = self._candle_counts[key]
+
+            is_due = frame is None or self._fetched_bar_timestamps.get(key) != bar_timestamp or \
+                self._fetched_candle_counts.get(key, 0) < candle_count
+            if not is_due and not self._is_fresh(frame, expected_timestamp):
+                # a partial or late bar: re-fetch, but no more than once per stale_refetch_seconds for all trades
+                is_due = time.monotonic() - self._fetched_monotonics[key] >= self._stale_refetch_seconds
+
+            if is_due:
+                frame = self._retrievers[key].get_x_candles(candle_count)
+                self._frames[key] = frame
+                self._frame_versions[key] += 1
+                self._fetched_bar_timestamps[key] = bar_timestamp
+                self._fetched_candle_counts[key] = candle_count
+                self._fetched_monotonics[key] = time.monotonic()
+
+            return frame, self._is_fresh(frame, expected_timestamp)
+
+    @staticmethod
+    def _is_fresh(frame: pd.DataFrame, expected_timestamp: Optional[int] = None) -> bool:
+        if expected_timestamp is None:
+            return True
+        if frame.empty:
+            return False
+
+        last_bar = frame.iloc[-1]
+        return last_bar['timestamp'] >= expected_timestamp and pd.notnull(last_bar['close'])
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    from src.datafeed.yahoofinance.yf_single import PYahooQuery
+
+    hub = CandleDataHub()
+    hub_key = hub.subscribe(ticker_symbol='AC.TO', interval_option='5m', candle_count=50,
+                            candle_retriever=PYahooQuery())
+    print(hub.get_x_candles(hub_key, candle_count=10, bar_timestamp=0))
+    # served from the hub without a second request
+    print(hub.get_x_candles(hub_key, candle_count=20, bar_timestamp=0))
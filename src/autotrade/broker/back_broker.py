@@ -1,11 +1,10 @@
 import datetime
 import random
-import string
-import uuid
 from typing import Union, Optional
 
 from src.autotrade.artifacts.comm import Commission
 from src.autotrade.artifacts.order import RegularOrder, OrderStatus, StopOrder
+from src.autotrade.artifacts.order_id import back_broker_order_ids
 from src.autotrade.artifacts.position import Position
 from src.autotrade.broker.base_broker import IBroker, BaseBroker
 from src.errors import OrderTypeError, MissingPrice, UnmatchedTickerError, MissingRequiredTradingElement
@@ -227,16 +226,15 @@ class BackBroker(BaseBroker, IBroker):
         """
         if self.trading_symbol == order.trading_symbol:
             if filled_price:
-                order.set_filled_price(filled_price=filled_price)
-                order.set_fill_quantity(fill_quantity=order.size)
-                order.set_transaction_value(transaction_value=order.fill_quantity * order.filled_price)
-                commission_fee = self.commission.estimate_commission(transaction_value=order.transaction_value)
-                order.set_commission_fee(commission_fee=commission_fee)
+                transaction_value = order.size * filled_price
+                filled_datetime = datetime.datetime.now()
+                order.set_fill(filled_price=filled_price, fill_quantity=order.size,
+                               transaction_value=transaction_value, filled_at=filled_datetime.isoformat(),
+                               filled_timestamp=round(filled_datetime.timestamp()),
+                               commission_fee=self.commission.estimate_commission(transaction_value=transaction_value))
 
                 # generate information for filled order after
                 order.set_status(status=OrderStatus.FILLED)
-                order.set_filled_at(filled_at=datetime.datetime.now().isoformat())
-                order.set_filled_timestamp(filled_timestamp=round(datetime.datetime.now().timestamp()))
                 order.set_is_broker_settled(is_broker_settled=True)
 
                 # IMPORTANT: Upsert settled orders -> add to the broker's settled list and remove it from pending
@@ -299,8 +297,7 @@ class BackBroker(BaseBroker, IBroker):
         order.set_created_at(created_at=datetime.datetime.now().isoformat())
         order.set_created_timestamp(created_timestamp=round(datetime.datetime.now().timestamp()))
         order.set_status(status=OrderStatus.SUBMITTED)
-        order.set_broker_ref_id(broker_ref_id=f"order-{uuid.uuid1().__str__()}-"
-                                              f"{''.join(random.choice(string.ascii_lowercase) for i in range(10))}")
+        order.set_broker_ref_id(broker_ref_id=back_broker_order_ids.next_id())
         order.set_ticker_id(ticker_id=self._ticker_id)
         order.set_is_broker_settled(is_broker_settled=False)
         order.set_broker_traded_symbol(broker_traded_symbol=order.trading_symbol)
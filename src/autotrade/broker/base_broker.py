@@ -1,15 +1,31 @@
-import datetime
+import functools
+import logging
 from abc import abstractmethod, ABC
+from threading import Event, RLock
 from typing import Optional, TYPE_CHECKING, Union, Dict
 
 from src.autotrade.artifacts.order import RegularOrder, StopOrder
 from src.autotrade.artifacts.position import Position
-from src.errors import MissingRequiredTradingElement, InvalidOrderListCUD
+from src.autotrade.broker.order_ledger import SettledOrderLedger
+from src.errors import MissingRequiredTradingElement, InvalidOrderListCUD, OrderCancellationError, OrderTypeError, \
+    PendingOrderNotInPendingListError
+from src.utility.clock import VirtualClock
 
 if TYPE_CHECKING:
     from src.autotrade.trade import Trade
 
 
+def orders_locked(method):
+    """Runs a broker method under the order book lock (live brokers also write the books from stream threads)"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._orders_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 # DIVIDER: --------------------------------------
 # INFO: BaseBroker Abstract Class (Broker - BaseClass)
 
@@ -20,15 +36,39 @@ class BaseBroker:
         self._comm_amount: float = 0
         self._position: Optional[Position] = None
 
+        # a child of the default Logger service logger: records reach its handlers and are only formatted when a
+        # handler takes them. Order book moves are logged at INFO, so the console handler shows them; DEBUG records
+        # are only kept by the file handler of a local Logger (Logger(local=True))
+        self._logger = logging.getLogger(f'stock_trading_logger.{type(self).__name__}')
+
         # trading instruments to be added
         self._trading_symbol = None
         self._ticker_id = None
         self._currency = None
 
-        # IMPORTANT: Order Management
+        # IMPORTANT: Order Management (re-entrant lock guarding the order books and their indexes)
+        self._orders_lock = RLock()
         self._pending_orders: Dict[str, Union[RegularOrder, StopOrder]] = dict()
         self._settled_orders: Dict[str, Union[RegularOrder, StopOrder]] = dict()
 
+        # secondary indexes of the order books, kept in step with them by _upsert_pending, _pop_pending and
+        # _upsert_settled: pending orders by kind and side, and filled orders with running counts of fills by side
+        self._pending_side_counts: Dict[bool, int] = {True: 0, False: 0}
+        self._pending_stop_orders: Dict[str, Union[RegularOrder, StopOrder]] = dict()
+        self._pending_regular_orders: Dict[str, Union[RegularOrder, StopOrder]] = dict()
+        self._filled_orders: Dict[str, Union[RegularOrder, StopOrder]] = dict()
+        self._filled_side_counts: Dict[bool, int] = {True: 0, False: 0}
+
+        # events set when the awaited orders (by broker_ref_id) leave the pending list, see cancel_replace
+        self._settle_events: Dict[str, Event] = dict()
+
+        # settled order retention (no limit by default): the older settled orders are dropped from memory and
+        # archived to the ledger, which is only opened by set_settled_retention
+        self._max_settled_count: Optional[int] = None
+        self._max_settled_hours: Optional[float] = None
+        self._settled_ledger: Optional[SettledOrderLedger] = None
+        self._clock = VirtualClock()
+
     def __repr__(self):
         tojoin = list()
         tojoin.append('ClassType: {}'.format(type(self).__name__))
@@ -47,6 +87,32 @@ class BaseBroker:
     def settled_orders(self):
         return self._settled_orders
 
+    @property
+    def pending_stop_orders(self):
+        return self._pending_stop_orders
+
+    @property
+    def pending_regular_orders(self):
+        return self._pending_regular_orders
+
+    @property
+    def filled_orders(self):
+        return self._filled_orders
+
+    def filled_count(self, isbuy: bool) -> int:
+        """Number of buy (True) or sell (False) orders filled since the broker started"""
+        return self._filled_side_counts[isbuy]
+
+    def pending_count(self, isbuy: Optional[bool] = None) -> int:
+        """Number of pending buy (True) or sell (False) orders, or of both (default None)"""
+        if isbuy is None:
+            return len(self._pending_orders)
+        return self._pending_side_counts[isbuy]
+
+    @property
+    def settled_ledger(self) -> Optional[SettledOrderLedger]:
+        return self._settled_ledger
+
     @property
     def trading_symbol(self):
         if not self._trading_symbol:
@@ -75,10 +141,83 @@ class BaseBroker:
         else:
             return self._ticker_id
 
+    @orders_locked
+    def set_settled_retention(self, max_count: Optional[int] = None, max_hours: Optional[float] = None,
+                              ledger: Optional[SettledOrderLedger] = None):
+        """
+        Keeps at most the last ``max_count`` settled orders and/or the ones created in the last ``max_hours`` in
+        memory (None for no limit). Older ones are archived to the ledger (a new one for this broker if not given),
+        where ``find_settled`` still finds them.
+        """
+        self._max_settled_count = max_count
+        self._max_settled_hours = max_hours
+        if ledger is not None:
+            self._settled_ledger = ledger
+        elif self._settled_ledger is None and (max_count is not None or max_hours is not None):
+            self._settled_ledger = SettledOrderLedger(name='{}_settled_orders'.format(type(self).__name__.lower()))
+        self._apply_retention()
+
+    def find_settled(self, broker_ref_id: str) -> Union[RegularOrder, StopOrder, dict, None]:
+        """Returns a settled order from memory, or its archived record (a dict) from the ledger"""
+        if broker_ref_id in self._settled_orders:
+            return self._settled_orders[broker_ref_id]
+        if self._settled_ledger is not None:
+            return self._settled_ledger.find(broker_ref_id)
+        return None
+
+    def cancel_replace(self, order: Union[RegularOrder, StopOrder],
+                       replacement: Union[RegularOrder, StopOrder, None] = None,
+                       confirm_timeout: float = 10.0, confirm_interval: float = 2.0) \
+            -> Union[RegularOrder, StopOrder, None]:
+        """
+        Cancels an order and submits its replacement (if any) as soon as the cancellation is confirmed, i.e.: once
+        the order leaves the pending list. That is signalled by a pushed order event when the broker has one,
+        otherwise by a status check of that single order every ``confirm_interval`` seconds (of the broker clock).
+        Returns the submitted replacement, or None if the order got filled before it could be cancelled.
+        """
+        settle_event = self._settle_events.setdefault(order.broker_ref_id, Event())
+        try:
+            self.cancel_order(order)
+
+            deadline = self._clock.timestamp() + confirm_timeout
+            while self._is_pending(order):
+                if self._clock.timestamp() >= deadline:
+                    raise OrderCancellationError(order=order, timeout=confirm_timeout)
+                if not self._clock.wait(settle_event, confirm_interval) and self._is_pending(order):
+                    try:
+                        self.update_order(order)
+                    except PendingOrderNotInPendingListError:
+                        # settled by a pushed order event between the check and the status request
+                        break
+        finally:
+            self._settle_events.pop(order.broker_ref_id, None)
+
+        if order.is_filled() or not replacement:
+            return None
+        return self.submit_order(replacement)
+
+    def submit_order(self, order: Union[RegularOrder, StopOrder]) -> Union[RegularOrder, StopOrder]:
+        """Places an order with the placing method matching its type and side"""
+        if order.is_stop_limit_order():
+            return self.stop_limit_buy(order) if order.isbuy else self.stop_limit_sell(order)
+        elif order.is_stop_order():
+            if order.isbuy:
+                raise OrderTypeError(message='Only sell stop orders (stop losses) can be submitted')
+            return self.stop_loss(order)
+        elif order.is_limit_order():
+            return self.limit_buy(order) if order.isbuy else self.limit_sell(order)
+        else:
+            return self.market_buy(order) if order.isbuy else self.market_sell(order)
+
+    @orders_locked
+    def _is_pending(self, order: Union[RegularOrder, StopOrder]) -> bool:
+        return order.broker_ref_id in self._pending_orders
+
     def _update_position(self, order: Union[RegularOrder, StopOrder]):
         if order.is_filled():
             self._position.update(order.isbuy, order.fill_quantity, buy_price=order.filled_price)
 
+    @orders_locked
     def _upsert_pending(self, order: Union[RegularOrder, StopOrder]):
         if order.is_settled():
             raise InvalidOrderListCUD(operation='update',
@@ -88,12 +227,16 @@ class BaseBroker:
         else:
             if order.broker_ref_id in self._pending_orders:
                 self._pending_orders[order.broker_ref_id] = order
-                print(f"{type(self).__name__}: Order {order.broker_ref_id} has been updated in PENDING list")
+                self._pending_kind_index(order)[order.broker_ref_id] = order
+                self._logger.info('Order %s has been updated in PENDING list', order.broker_ref_id)
 
             else:
                 self._pending_orders[order.broker_ref_id] = order
-                print(f"{type(self).__name__}: Order {order.broker_ref_id} has been added to PENDING list")
+                self._pending_kind_index(order)[order.broker_ref_id] = order
+                self._pending_side_counts[order.isbuy] += 1
+                self._logger.info('Order %s has been added to PENDING list', order.broker_ref_id)
 
+    @orders_locked
     def _upsert_settled(self, order: Union[RegularOrder, StopOrder, None] = None):
         if order:
             if order.is_settled():
@@ -106,32 +249,83 @@ class BaseBroker:
                 else:
                     if order.broker_ref_id in self._pending_orders:
 
-                        self._settled_orders[order.broker_ref_id] = self._pending_orders.pop(order.broker_ref_id)
-                        print(f"{type(self).__name__}: Order {order.broker_ref_id} has been removed from PENDING and "
-                              f"inserted to SETTLED order list")
+                        self._insert_settled(self._pop_pending(order.broker_ref_id))
+                        self._logger.info('Order %s has been removed from PENDING and inserted to SETTLED order list',
+                                          order.broker_ref_id)
 
                     else:
-                        InvalidOrderListCUD(operation='insert',
-                                            order_list_type='settled',
-                                            additional_msg='The order does not exists in pending list. '
-                                                           'Please review Broker code logic')
+                        raise InvalidOrderListCUD(operation='insert',
+                                                  order_list_type='settled',
+                                                  additional_msg='The order does not exists in pending list. '
+                                                                 'Please review Broker code logic')
 
         else:
-            for key, value in self._pending_orders.items():
+            for key, value in list(self._pending_orders.items()):
                 if value.is_settled():
                     # remove settled orders out of the pending list and add it to settled list:
-                    self._settled_orders[value.broker_ref_id] = self._pending_orders.pop(key)
-                    print(f"{type(self).__name__}: Order {order.broker_ref_id} has been moved from PENDING to SETTLED")
-
+                    self._insert_settled(self._pop_pending(key))
+                    self._logger.info('Order %s has been moved from PENDING to SETTLED', value.broker_ref_id)
+
+    @orders_locked
+    def _pop_pending(self, broker_ref_id: str) -> Union[RegularOrder, StopOrder]:
+        order = self._pending_orders.pop(broker_ref_id)
+        self._pending_kind_index(order).pop(broker_ref_id, None)
+        self._pending_side_counts[order.isbuy] -= 1
+
+        settle_event = self._settle_events.get(broker_ref_id)
+        if settle_event:
+            settle_event.set()
+        return order
+
+    @orders_locked
+    def _insert_settled(self, order: Union[RegularOrder, StopOrder]):
+        self._settled_orders[order.broker_ref_id] = order
+        if order.is_filled():
+            self._filled_orders[order.broker_ref_id] = order
+            self._filled_side_counts[order.isbuy] += 1
+        self._apply_retention()
+
+    @orders_locked
+    def _pop_settled(self, broker_ref_id: str) -> Union[RegularOrder, StopOrder]:
+        # the running fill counts are kept: they count fills since start, not the orders still in the book
+        order = self._settled_orders.pop(broker_ref_id)
+        self._filled_orders.pop(broker_ref_id, None)
+        return order
+
+    def _pending_kind_index(self, order: Union[RegularOrder, StopOrder]) -> Dict[str, Union[RegularOrder, StopOrder]]:
+        if order.is_stop_order() or order.is_stop_limit_order():
+            return self._pending_stop_orders
+        return self._pending_regular_orders
+
+    def _archive_settled(self, broker_ref_id: str):
+        order = self._pop_settled(broker_ref_id)
+        if self._settled_ledger is not None:
+            self._settled_ledger.append(order)
+        return order
+
+    def _apply_retention(self):
+        if self._max_settled_count is not None:
+            while len(self._settled_orders) > self._max_settled_count:
+                # dicts keep the settling order: the first one is the oldest
+                self._archive_settled(next(iter(self._settled_orders)))
+
+        if self._max_settled_hours is not None:
+            past_timestamp = self._clock.timestamp() - self._max_settled_hours * 3600
+            while self._settled_orders:
+                oldest = next(iter(self._settled_orders.values()))
+                if (oldest.created_timestamp or past_timestamp) >= past_timestamp:
+                    break
+                self._archive_settled(oldest.broker_ref_id)
+
+    @orders_locked
     def remove_settled(self, hours_ago=None):
         if hours_ago:
-            current_date = datetime.datetime.now().replace(microsecond=0)
-            past_date = current_date - datetime.timedelta(hours=hours_ago)
-            # remove long lasting settled orders which older than a given timestamp
-            for key, value in self._settled_orders.items():
-                if value.created_timestamp < past_date.timestamp():
-                    self._settled_orders.pop(key)
-                    print(f"{type(self).__name__}: The aged order {value.broker_ref_id} has been removed from SETTLED")
+            past_timestamp = self._clock.timestamp() - hours_ago * 3600
+            # remove long lasting settled orders which older than a given timestamp (archived if there is a ledger)
+            for key, value in list(self._settled_orders.items()):
+                if value.created_timestamp and value.created_timestamp < past_timestamp:
+                    self._archive_settled(key)
+                    self._logger.info('The aged order %s has been removed from SETTLED', value.broker_ref_id)
 
 
 # DIVIDER: --------------------------------------
@@ -233,6 +427,14 @@ class IBroker(ABC):
     def cancel_order(self, order: Union[RegularOrder, StopOrder]) -> Union[RegularOrder, StopOrder]:
         raise NotImplementedError()
 
+    @abstractmethod
+    def cancel_replace(self, order: Union[RegularOrder, StopOrder],
+                       replacement: Union[RegularOrder, StopOrder, None] = None,
+                       confirm_timeout: float = 10.0, confirm_interval: float = 2.0) \
+            -> Union[RegularOrder, StopOrder, None]:
+        """Cancels an order, then submits the replacement as soon as the cancellation is confirmed"""
+        raise NotImplementedError()
+
     @abstractmethod
     def update_order(self, order: Union[RegularOrder, StopOrder], ref_price: Optional[float] = None):
         raise NotImplementedError()
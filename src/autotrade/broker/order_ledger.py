@@ -0,0 +1,122 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import datetime
+import itertools
+import json
+import os
+from threading import Lock
+from typing import Dict, Iterator, Optional, Union
+
+from src.autotrade.artifacts.order import RegularOrder, StopOrder
+from src.config.config import BASE_DIR
+
+LEDGER_PATH = os.path.join(BASE_DIR, 'ledgers')
+
+# tells apart the ledgers opened by one process within the same second
+_ledger_numbers = itertools.count(1)
+
+
+# DIVIDER: --------------------------------------
+# INFO: SettledOrderLedger Concrete Class
+
+class SettledOrderLedger:
+    """
+    Append-only on-disk ledger (JSON lines, one ``BaseOrder.to_record`` per line) of the settled orders a broker no
+    longer keeps in memory. Each ledger writes its own file (named after the run start time and the process ID), so
+    concurrent runs never share one. The file stays open and the offset of every record appended by this ledger is
+    indexed by broker_ref_id, so a single order is read back with one seek; ``records`` scans the whole file.
+    """
+
+    def __init__(self, name: str = 'settled_orders', filepath: Optional[str] = None):
+        """
+        :param name: leading part of the default file name, i.e.: 'wsimplebroker_settled_orders'
+        :param filepath: file to append to instead (its earlier records are only read back by ``records``)
+        """
+        self._filepath = filepath if filepath else os.path.join(LEDGER_PATH, '{}-{}-{}-{}.jsonl'.format(
+            name, datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_ledger_numbers)))
+        self._lock = Lock()
+        self._offsets: Dict[str, int] = dict()
+
+        os.makedirs(os.path.dirname(self._filepath), exist_ok=True)
+        self._file = open(self._filepath, 'a+b')
+        self._end_last_line()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('Filepath: {}'.format(self._filepath))
+        tojoin.append('RecordCount: {}'.format(len(self._offsets)))
+
+        return ', '.join(tojoin)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, broker_ref_id: str):
+        return broker_ref_id in self._offsets
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def filepath(self):
+        return self._filepath
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def append(self, order: Union[RegularOrder, StopOrder]):
+        line = json.dumps(order.to_record(), separators=(',', ':'), default=str).encode() + b'\n'
+        with self._lock:
+            # appends always go to the end of the file, whatever position the last read left
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(line)
+            self._file.flush()
+            self._offsets[order.broker_ref_id] = offset
+
+    def find(self, broker_ref_id: str) -> Optional[dict]:
+        with self._lock:
+            offset = self._offsets.get(broker_ref_id)
+            if offset is None:
+                return None
+
+            self._file.seek(offset)
+            return json.loads(self._file.readline())
+
+    def records(self, trading_symbol: Optional[str] = None,
+                since_timestamp: Optional[float] = None) -> Iterator[dict]:
+        """Yields the archived records in settling order, optionally of one symbol or created from a timestamp on"""
+        with open(self._filepath, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a record cut short by a crash (in a file given by filepath)
+                    continue
+                if trading_symbol and record['trading_symbol'] != trading_symbol:
+                    continue
+                if since_timestamp and (record['created_timestamp'] or 0) < since_timestamp:
+                    continue
+                yield record
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _end_last_line(self):
+        """Starts the next record on a new line if the given file ends with a record cut short (never truncated)"""
+        end = self._file.seek(0, os.SEEK_END)
+        if end:
+            self._file.seek(end - 1)
+            if self._file.read(1) != b'\n':
+                self._file.write(b'\n')
+                self._file.flush()
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    ledger = SettledOrderLedger()
+    print(ledger)
+    for each_record in ledger.records():
+        print(each_record)
@@ -2,18 +2,19 @@
 # Author: Thanh Tung Nguyen
 # Contact: tungstudies@gmail.com
 
-import datetime
-from typing import Optional, Union
-
-from dateutil import tz
+from typing import Optional, Union, List, Dict
 
 from src.autotrade.artifacts.order import OrderStatus, RegularOrder, StopOrder
 from src.autotrade.artifacts.position import Position
-from src.autotrade.broker.base_broker import BaseLiveBroker
+from src.autotrade.broker.base_broker import BaseLiveBroker, orders_locked
 from src.autotrade.broker.base_broker import IBroker, ILiveBroker
+from src.autotrade.broker_conn.wsimple_activity import WSimpleActivitySync
 from src.autotrade.broker_conn.wsimple_conn import WSimpleConnection
+from src.autotrade.broker_conn.wsimple_decode import WSimpleTimeDecoder
+from src.autotrade.broker_conn.wsimple_stream import WSimpleOrderStream
 from src.errors import MissingRequiredTradingElement, TickerIDNotFoundError, OrderPlacingError, \
     PendingOrderNotInPendingListError, PositionRequestError
+from src.utility.symbolcache import SymbolIDCache
 
 
 # DIVIDER: --------------------------------------
@@ -21,10 +22,36 @@ from src.errors import MissingRequiredTradingElement, TickerIDNotFoundError, Ord
 
 class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
 
-    def __init__(self, wsimple_conn: WSimpleConnection = WSimpleConnection(), local_timezone: str = 'America/Montreal'):
+    # activity fields needed to apply a pushed order event without a REST lookup, and the ones needed for a fill
+    _event_required_fields = ('settled', 'status', 'symbol', 'created_at')
+    _event_fill_fields = ('filled_at', 'fill_quantity', 'market_value')
+
+    def __init__(self, wsimple_conn: Optional[WSimpleConnection] = None, local_timezone: str = 'America/Montreal',
+                 fallback_poll_seconds: float = 60.0, is_order_streaming: bool = True):
+        """
+        :param fallback_poll_seconds: while an order stream is connected, pending orders are still polled over REST
+        at most once per this many seconds in case an event was missed
+        :param is_order_streaming: apply the order updates pushed over the connection's websocket from ``initialize``
+        on (REST polling only otherwise)
+        """
         super().__init__()
         self._local_tz = local_timezone
-        self._conn = wsimple_conn
+        self._time_decoder = WSimpleTimeDecoder(local_timezone=local_timezone)
+        # the connection is created on first use rather than when the module is imported
+        self._conn = wsimple_conn if wsimple_conn else WSimpleConnection()
+
+        # pushed order events arrive on the stream thread (the books are guarded by the base broker order lock).
+        # Events of orders not yet in the pending list (i.e.: still being placed) are kept until the order is.
+        self._order_stream: Optional[WSimpleOrderStream] = None
+        self._is_order_streaming = is_order_streaming
+        self._fallback_poll_seconds = fallback_poll_seconds
+        self._last_poll_timestamp = 0.0
+        self._is_poll_forced = False
+        self._unmatched_events: Dict[str, dict] = dict()
+        self._max_unmatched_events = 100
+
+        # incremental activity index shared by order updates and pending order lookups
+        self._activities: Optional[WSimpleActivitySync] = None
 
     # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
 
@@ -61,11 +88,18 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
 
     def _find_ticker_id(self):
         if not self._ticker_id:
+            symbol_cache = SymbolIDCache()
+            cache_symbol = f'{self._trading_symbol}|{self._currency}'
+            self._ticker_id = symbol_cache.get('wsimple', cache_symbol)
+            if self._ticker_id:
+                return self._ticker_id
+
             resp = self.auth.find_securities(ticker=self._trading_symbol, fuzzy=True)
             results = resp['results']
             for each in results:
                 if each and each['stock']['symbol'] == self._trading_symbol and each['currency'] == self._currency:
                     self._ticker_id = each['id']
+                    symbol_cache.set('wsimple', cache_symbol, self._ticker_id)
                     return self._ticker_id
 
             raise TickerIDNotFoundError(ticker_symbol=self._trading_symbol)
@@ -85,6 +119,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
         self._position.set_ticker_id(ticker_id=self._ticker_id)
         self._position.set_currency(currency=self._currency)
 
+        if self._is_order_streaming and not self._order_stream:
+            self.set_order_stream()
+
     def market_buy(self, order: RegularOrder) -> RegularOrder:
         if self._is_well_setup() and order.trading_symbol == self._trading_symbol:
             order.set_ticker_id(ticker_id=self._ticker_id)
@@ -95,10 +132,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                   account_id=self._trading_account_id)
                 # print(resp)
 
-                order = self._write_order_resp(order, resp)
+                order = self._write_placed_order(order, resp)
 
-                print(f'The MARKET BUY order has been made.\n'
-                      f'Order details: {order}')
+                self._logger.info('The MARKET BUY order has been made. Order details: %s', order)
                 return order
 
             except Exception as err:
@@ -114,10 +150,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                    quantity=order.size,
                                                    account_id=self._trading_account_id)
 
-                order = self._write_order_resp(order, resp)
+                order = self._write_placed_order(order, resp)
 
-                print(f'The MARKET SELL order has been made.\n'
-                      f'Order details: {order}')
+                self._logger.info('The MARKET SELL order has been made. Order details: %s', order)
                 return order
 
             except Exception as err:
@@ -125,8 +160,7 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
 
     def limit_buy(self, order: RegularOrder) -> RegularOrder:
         if self._is_well_setup() and order.trading_symbol == self._trading_symbol:
-            print(self._ticker_id)
-            print(self._trading_symbol)
+            self._logger.debug('Ticker: %s (%s)', self._trading_symbol, self._ticker_id)
             order.set_ticker_id(ticker_id=self._ticker_id)
 
             try:
@@ -135,10 +169,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                  quantity=order.size,
                                                  account_id=self._trading_account_id)
 
-                order = self._write_order_resp(order, resp)
+                order = self._write_placed_order(order, resp)
 
-                print(f'The LIMIT BUY order has been made.\n'
-                      f'Order details: {order}')
+                self._logger.info('The LIMIT BUY order has been made. Order details: %s', order)
                 return order
 
             except Exception as err:
@@ -155,10 +188,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                   limit_price=order.limit_price,
                                                   quantity=order.size,
                                                   account_id=self._trading_account_id)
-                order = self._write_order_resp(order, resp)
+                order = self._write_placed_order(order, resp)
 
-                print(f'The LIMIT SELL order has been made.\n'
-                      f'Order details: {order}')
+                self._logger.info('The LIMIT SELL order has been made. Order details: %s', order)
                 return order
 
             except Exception as err:
@@ -174,10 +206,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                   limit_price=order.limit_price,
                                                   quantity=order.size,
                                                   account_id=self._trading_account_id)
-            order = self._write_order_resp(order, resp)
+            order = self._write_placed_order(order, resp)
 
-            print(f'The STOP LIMIT BUY order has been made.\n'
-                  f'Order details: {order}')
+            self._logger.info('The STOP LIMIT BUY order has been made. Order details: %s', order)
             return order
 
         except Exception as err:
@@ -194,10 +225,9 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
                                                    quantity=order.size,
                                                    account_id=self._trading_account_id)
 
-            order = self._write_order_resp(order, resp)
+            order = self._write_placed_order(order, resp)
 
-            print(f'The STOP LIMIT SELL order has been made.\n'
-                  f'Order details: {order}')
+            self._logger.info('The STOP LIMIT SELL order has been made. Order details: %s', order)
             return order
 
         except Exception as err:
@@ -207,10 +237,12 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
         if not order.is_settled():
             try:
                 self.auth.cancel_order(order.broker_ref_id)  # this request will return an empty dict {}
-                order.set_status(status=OrderStatus.PENDING)
+                with self._orders_lock:
+                    order.set_status(status=OrderStatus.PENDING)
+                # the cancellation is confirmed by the next poll, even while the order stream is connected
+                self._is_poll_forced = True
 
-                print(f'The CANCELLING REQUEST has been made.\n'
-                      f'Order details: {order}')
+                self._logger.info('The CANCELLING REQUEST has been made. Order details: %s', order)
                 return order
 
             except Exception as err:
@@ -222,43 +254,34 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
         Update an order if its status is still unsettled
         """
         if not order.is_settled():
-            if order.broker_ref_id not in self._pending_orders:
+            if not self._is_pending(order):
                 raise PendingOrderNotInPendingListError(order=order)
             else:
-                if order.isbuy:
-                    resp = self.auth.get_activities(type='buy', sec_id=order.ticker_id,
-                                                    account_id=self._trading_account_id)
-                else:
-                    resp = self.auth.get_activities(type='sell', sec_id=order.ticker_id,
-                                                    account_id=self._trading_account_id)
-
-                for ord_resp in resp['results']:
-                    if ord_resp['id'] == order.broker_ref_id:
-                        order = self._write_order_resp(order, ord_resp)
-                        return order
+                ord_resp = self._activity_sync().lookup(self.auth, order.broker_ref_id)
+                if ord_resp:
+                    with self._orders_lock:
+                        # a pushed order event may have settled the order during the lookup
+                        if order.broker_ref_id in self._pending_orders:
+                            order = self._write_order_resp(order, ord_resp)
+                    return order
 
     def get_pending_orders(self, isbuy: Optional[bool] = None):
-        if isbuy is None:
-            resp_buy = self.auth.get_activities(type='buy', sec_id=self._ticker_id,
-                                                account_id=self._trading_account_id)
+        # the known pending orders are reconciled in place (settling the ones that are no longer live), and only the
+        # live orders missing from the pending list are built from the fresh activities
+        activities = self._activity_sync().sync(self.auth, order_ids=self._pending_ids())
+        self._reconcile_pending(activities)
 
-            resp_sell = self.auth.get_activities(type='sell', sec_id=self._ticker_id,
-                                                 account_id=self._trading_account_id)
-
-            order_responses = resp_buy['results'] + resp_sell['results']
-
-        elif isbuy:
-            resp = self.auth.get_activities(type='buy', sec_id=self._ticker_id,
-                                            account_id=self._trading_account_id)
-            order_responses = resp['results']
-        else:
-            resp = self.auth.get_activities(type='sell', sec_id=self._ticker_id,
-                                            account_id=self._trading_account_id)
-            order_responses = resp['results']
+        order_responses = list(activities.values())
+        if isbuy is not None:
+            order_type = 'buy' if isbuy else 'sell'
+            order_responses = [resp for resp in order_responses
+                               if str(resp['order_type']).split('_')[0].strip() == order_type]
 
         for resp in order_responses:
             if not resp['settled'] and not (resp['status'] == 'cancelled' or resp['status'] == 'expired'):
                 if resp['symbol'] == self._trading_symbol:
+                    if resp['id'] in self._pending_orders:
+                        continue
 
                     is_a_buy = True if str(resp['order_type']).split('_')[0].strip() == 'buy' else False
 
@@ -290,37 +313,95 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
 
         return self._pending_orders
 
+    def set_order_stream(self, order_stream: Optional[WSimpleOrderStream] = None):
+        """Applies order updates pushed over the websocket (the connection's shared stream by default)"""
+        self._order_stream = order_stream if order_stream else self._conn.order_stream
+        self._order_stream.add_listener(self._on_order_event)
+        self._order_stream.start()
+
     def update_pending_orders(self, ref_price: Optional[float] = None):
-        if self._pending_orders:
-            buy_count = 0
-            sell_count = 0
-            for _ord in self._pending_orders.values():
-                if _ord.isbuy:
-                    buy_count += 1
+        if self._pending_orders and self._is_poll_due():
+            activities = self._activity_sync().sync(self.auth, order_ids=self._pending_ids())
+            self._reconcile_pending(activities)
+
+    async def update_pending_orders_async(self, ref_price: Optional[float] = None):
+        """Same as ``update_pending_orders``, awaitable together with the updates of other brokers from the caller's
+        event loop, i.e.: ``await asyncio.gather(*[broker.update_pending_orders_async() for broker in brokers])``"""
+        if self._pending_orders and self._is_poll_due():
+            activities = await self._activity_sync().sync_async(self._conn.async_auth,
+                                                                order_ids=self._pending_ids())
+            self._reconcile_pending(activities)
+
+    def _activity_sync(self) -> WSimpleActivitySync:
+        """buy/sell activity synchronizer of the current trading account and security"""
+        if not self._activities or (self._activities.account_id, self._activities.sec_id) != \
+                (self._trading_account_id, self._ticker_id):
+            self._activities = WSimpleActivitySync(account_id=self._trading_account_id, sec_id=self._ticker_id)
+        return self._activities
+
+    @orders_locked
+    def _pending_ids(self) -> List[str]:
+        return list(self._pending_orders)
+
+    def _is_poll_due(self) -> bool:
+        """REST polling is the fallback while the order stream is connected (unless a poll has been forced)"""
+        now = self._clock.timestamp()
+        if not self._is_poll_forced and self._order_stream and self._order_stream.is_connected and \
+                now - self._last_poll_timestamp < self._fallback_poll_seconds:
+            return False
+
+        self._is_poll_forced = False
+        self._last_poll_timestamp = now
+        return True
+
+    def _reconcile_pending(self, activities: Dict[str, dict]):
+        """Writes the fresh status read by a poll into every pending order"""
+        with self._orders_lock:
+            for broker_ref_id, order in list(self._pending_orders.items()):
+                ord_resp = activities.get(broker_ref_id)
+                if ord_resp:
+                    self._write_order_resp(order, ord_resp)
                 else:
-                    sell_count += 1
-            if buy_count and not sell_count:
-                resp = self.auth.get_activities(type='buy', sec_id=self._ticker_id,
-                                                account_id=self._trading_account_id)
-                order_responses = resp['results']
-            elif sell_count and not buy_count:
-                resp = self.auth.get_activities(type='sell', sec_id=self._ticker_id,
-                                                account_id=self._trading_account_id)
-                order_responses = resp['results']
+                    self._logger.info('Order %s has not been found in the recent activities', broker_ref_id)
+
+    def _on_order_event(self, event: dict):
+        broker_ref_id = event['order_id'] if 'order_id' in event else event['id']
+        with self._orders_lock:
+            order = self._pending_orders.get(broker_ref_id)
+            if order:
+                self._apply_order_event(order, event)
             else:
-                resp_buy = self.auth.get_activities(type='buy', sec_id=self._ticker_id,
-                                                    account_id=self._trading_account_id)
-
-                resp_sell = self.auth.get_activities(type='sell', sec_id=self._ticker_id,
-                                                     account_id=self._trading_account_id)
-
-                order_responses = resp_buy['results'] + resp_sell['results']
-            for _ord in list(self._pending_orders.values()):
-                for ord_resp in order_responses:
-                    if ord_resp['id'] == _ord.broker_ref_id:
-                        _ord = self._write_order_resp(_ord, ord_resp)
-                        break
+                self._unmatched_events.pop(broker_ref_id, None)
+                self._unmatched_events[broker_ref_id] = event
+                while len(self._unmatched_events) > self._max_unmatched_events:
+                    self._unmatched_events.pop(next(iter(self._unmatched_events)))
+
+    def _apply_order_event(self, order: Union[RegularOrder, StopOrder], event: dict):
+        if self._is_complete_event(event):
+            self._write_order_resp(order, event)
+        else:
+            # the event only tells that the order changed: no REST request on the stream thread, the order is
+            # looked up by the next poll instead
+            self._is_poll_forced = True
+
+    def _is_complete_event(self, event: dict) -> bool:
+        if not all(field in event for field in self._event_required_fields):
+            return False
+        if self._translate_order_status(event['status']) == OrderStatus.FILLED:
+            return all(event.get(field) for field in self._event_fill_fields)
+        return True
+
+    def _write_placed_order(self, order: Union[RegularOrder, StopOrder],
+                            ord_resp: dict) -> Union[RegularOrder, StopOrder]:
+        """Writes the placement response of an order, then any event pushed for it before the response arrived"""
+        with self._orders_lock:
+            order = self._write_order_resp(order, ord_resp)
+            early_event = self._unmatched_events.pop(order.broker_ref_id, None)
+            if early_event and order.broker_ref_id in self._pending_orders:
+                self._apply_order_event(order, early_event)
+        return order
 
+    @orders_locked
     def _write_order_resp(self, order: Union[RegularOrder, StopOrder],
                           ord_resp: dict) -> Union[RegularOrder, StopOrder]:
         order.set_broker_ref_id(broker_ref_id=ord_resp['order_id'] if 'order_id' in ord_resp else ord_resp['id'])
@@ -330,25 +411,19 @@ class WSimpleBroker(BaseLiveBroker, IBroker, ILiveBroker):
         order.set_broker_traded_symbol(broker_traded_symbol=ord_resp['symbol'])
 
         # get 'created at' and 'created_timestamp'
-        utc_created_at = ord_resp['created_at']
-        datetime_utc = datetime.datetime.strptime(utc_created_at, '%Y-%m-%dT%H:%M:%S.%fZ')
-        datetime_created_at = datetime_utc.replace(tzinfo=tz.gettz('UTC')).astimezone(
-            tz.gettz(self._local_tz))
-        order.set_created_at(created_at=datetime_created_at.isoformat())
-        order.set_created_timestamp(created_timestamp=round(datetime_utc.timestamp()))
+        created_at, created_timestamp = self._time_decoder.decode(ord_resp['created_at'])
+        order.set_created_at(created_at=created_at)
+        order.set_created_timestamp(created_timestamp=created_timestamp)
 
         if order.is_settled() or order.is_broker_settled:
             if order.is_filled():
-                if ord_resp['filled_at']:  # if the order has been filled
-                    datetime_utc = datetime.datetime.strptime(ord_resp['filled_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                    datetime_filled_at = datetime_utc.replace(tzinfo=tz.gettz('UTC')).astimezone(
-                        tz.gettz(self._local_tz))
-                    order.set_filled_at(filled_at=datetime_filled_at.isoformat())
-                    order.set_filled_timestamp(filled_timestamp=round(datetime_utc.timestamp()))
-                    order.set_fill_quantity(fill_quantity=ord_resp['fill_quantity'])
+                if ord_resp.get('filled_at'):  # if the order has been filled
+                    filled_at, filled_timestamp = self._time_decoder.decode(ord_resp['filled_at'])
                     broker_transaction_value = ord_resp['market_value']['amount'] if ord_resp['market_value'] else 0
-                    order.set_transaction_value(transaction_value=broker_transaction_value)
-                    order.set_filled_price(filled_price=round(order.transaction_value / order.fill_quantity, 2))
+                    order.set_fill(filled_price=round(broker_transaction_value / ord_resp['fill_quantity'], 2),
+                                   fill_quantity=ord_resp['fill_quantity'], transaction_value=broker_transaction_value,
+                                   filled_at=filled_at, filled_timestamp=filled_timestamp,
+                                   commission_fee=order.commission_fee)
                     # IMPORTANT: Update position when order get filled
                     self._position.update(order.isbuy, order.fill_quantity, order.filled_price)
 
@@ -0,0 +1,127 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+
+# DIVIDER: --------------------------------------
+# INFO: WSimpleActivitySync Concrete Class
+
+class WSimpleActivitySync:
+    """
+    Buy/sell activity synchronizer for one account and security (activities are kept as plain dicts).
+    Every sync requests the newest ``page_limit`` activities with the account/security/type filters (the same small
+    window the broker polled before), so the status of every order in that window is fresh. Orders older than the
+    window are looked up by following the bookmark to older pages (at most ``max_backfill_pages``), only while some
+    of the wanted orders are still missing. A single order is looked up with a smaller window (``lookup_limit``).
+    The local index only keeps live orders (not settled, cancelled or expired), so it never grows with the history.
+    """
+
+    activity_types = ['buy', 'sell']
+    closed_statuses = ('cancelled', 'expired')
+
+    def __init__(self, account_id: str, sec_id: str, page_limit: int = 20, lookup_limit: int = 5,
+                 max_backfill_pages: int = 5):
+        self._account_id = account_id
+        self._sec_id = sec_id
+        self._page_limit = page_limit
+        self._lookup_limit = lookup_limit
+        self._max_backfill_pages = max_backfill_pages
+
+        self._index: Dict[str, dict] = dict()
+        self._lock = Lock()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('AccountID: {}'.format(self._account_id))
+        tojoin.append('SecurityID: {}'.format(self._sec_id))
+        tojoin.append('LiveActivityCount: {}'.format(len(self._index)))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def account_id(self):
+        return self._account_id
+
+    @property
+    def sec_id(self):
+        return self._sec_id
+
+    @property
+    def activities(self) -> List[dict]:
+        """live activities as of the last sync"""
+        with self._lock:
+            return list(self._index.values())
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def sync(self, auth, order_ids: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> Dict[str, dict]:
+        """
+        Fetches the newest window of activities (and older pages while any of ``order_ids`` is missing), then returns
+        the activities of this sync keyed by order ID
+        """
+        wanted_ids = set(order_ids) if order_ids else set()
+        found: Dict[str, dict] = dict()
+
+        bookmark = self._collect(auth.get_activities(**self._window_params(limit), raw=True), found)
+        for _ in range(self._max_backfill_pages):
+            if not bookmark or wanted_ids.issubset(found):
+                break
+            bookmark = self._collect(auth.get_activities_bookmark(bookmark, raw=True), found)
+
+        self._update_index(found)
+        return found
+
+    async def sync_async(self, async_auth, order_ids: Optional[Iterable[str]] = None,
+                         limit: Optional[int] = None) -> Dict[str, dict]:
+        wanted_ids = set(order_ids) if order_ids else set()
+        found: Dict[str, dict] = dict()
+
+        bookmark = self._collect(await async_auth.get_activities(**self._window_params(limit), raw=True), found)
+        for _ in range(self._max_backfill_pages):
+            if not bookmark or wanted_ids.issubset(found):
+                break
+            bookmark = self._collect(await async_auth.get_activities_bookmark(bookmark, raw=True), found)
+
+        self._update_index(found)
+        return found
+
+    def lookup(self, auth, order_id: str) -> Optional[dict]:
+        """Fetches the status of a single order (the newest few activities, older pages only if it is not there)"""
+        return self.sync(auth, order_ids=[order_id], limit=self._lookup_limit).get(order_id)
+
+    def reset(self):
+        """Forgets the indexed live orders"""
+        with self._lock:
+            self._index.clear()
+
+    @classmethod
+    def is_live(cls, activity: dict) -> bool:
+        return not activity['settled'] and activity['status'] not in cls.closed_statuses
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _window_params(self, limit: Optional[int] = None) -> dict:
+        return dict(limit=limit or self._page_limit, type=self.activity_types, sec_id=self._sec_id,
+                    account_id=self._account_id)
+
+    def _collect(self, resp, found: Dict[str, dict]) -> Optional[str]:
+        """Adds the matching activities of a page to ``found`` and returns the bookmark of the next (older) page"""
+        for activity in resp['results']:
+            # bookmarked pages are not filtered by the server, so the filters are applied here as well
+            if activity and activity.get('security_id', self._sec_id) == self._sec_id and \
+                    activity.get('account_id', self._account_id) == self._account_id and \
+                    str(activity.get('order_type', 'buy')).split('_')[0] in self.activity_types:
+                # a buy/sell activity id is the id of the order it reports on (the newest page wins)
+                found.setdefault(activity['id'], activity)
+        return resp.get('bookmark')
+
+    def _update_index(self, found: Dict[str, dict]):
+        with self._lock:
+            for order_id, activity in found.items():
+                if self.is_live(activity):
+                    self._index[order_id] = activity
+                else:
+                    self._index.pop(order_id, None)
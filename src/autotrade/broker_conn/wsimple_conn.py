@@ -6,14 +6,17 @@ import datetime
 import json
 import os
 import re
-from time import sleep
+from threading import RLock
+from typing import Optional
 
-from wsimple import InvalidAccessTokenError, InvalidRefreshTokenError, Wsimple
+from wsimple import InvalidAccessTokenError, InvalidRefreshTokenError, Wsimple, AsyncWsimple
 
+from src.autotrade.broker_conn.wsimple_stream import WSimpleOrderStream
 from src.config.config import BASE_DIR
 from src.secrets.credentials import WSIMPLE_USERNAME, WSIMPLE_PASSWORD
-from src.utility.emailing import MailBox
+from src.utility.emailing import IMAPIdleSession
 from src.utility.singleton import SingletonMeta
+from src.utility.token_refresher import TokenRefresher
 
 
 # DIVIDER: --------------------------------------
@@ -23,15 +26,24 @@ class WSimpleOTPVerifier:
     wsimple = 'support@wealthsimple.com'
     subject = 'Wealthsimple verification code'
 
-    def __init__(self, mailbox: MailBox = MailBox(), otp_wait_time: int = 15):
-        self._mailbox = mailbox
-        self._otp_wait_time = otp_wait_time
+    def __init__(self, otp_session: IMAPIdleSession = IMAPIdleSession(), otp_timeout: float = 120.0):
+        """
+        :param otp_session: IMAP session kept open to catch the verification email as soon as it lands
+        :param otp_timeout: longest wait (in seconds) for the verification email
+        """
+        self._otp_session = otp_session
+        self._otp_timeout = otp_timeout
+        self._since_uid: Optional[int] = None
+
+    def expect_otp(self):
+        """Marks the mailbox right before the login request, so that only the OTP email it triggers is read"""
+        self._since_uid = self._otp_session.mark()
 
     @property
     def otp(self):
-        sleep(self._otp_wait_time)
-
-        email_data = self._mailbox.read_latest(from_sender=self.wsimple, subject_title=self.subject, is_unread=False)
+        email_data = self._otp_session.wait_for_mail(from_sender=self.wsimple, subject_title=self.subject,
+                                                     since_uid=self._since_uid, timeout=self._otp_timeout)
+        self._since_uid = None
 
         pattern = re.compile(r'Wealthsimple:<br><br>\r\n\r\n(.*?)\r\n\r\nThis code will')
 
@@ -51,18 +63,34 @@ class WSimpleConnection(metaclass=SingletonMeta):
 
     def __init__(self, token_filepath=os.path.join(BASE_DIR, 'secrets', 'wstokens.json'),
                  username: str = WSIMPLE_USERNAME, password: str = WSIMPLE_PASSWORD,
-                 wsimple_verifier: WSimpleOTPVerifier = WSimpleOTPVerifier(), tk_refresh_buffer: int = 600):
+                 wsimple_verifier: WSimpleOTPVerifier = WSimpleOTPVerifier(), tk_refresh_buffer: int = 1800,
+                 tk_refresh_fraction: float = 0.25, is_background_refresh: bool = True):
         """
         :param tk_refresh_buffer: buffer time (in seconds) to refresh tokens before they expire
         :type tk_refresh_buffer: int
+        :param tk_refresh_fraction: the buffer never exceeds this fraction of the observed token lifetime, so that
+        short-lived tokens are still kept most of their lifetime instead of being renewed at once
+        :type tk_refresh_fraction: float
+        :param is_background_refresh: renew the tokens (and re-login with an OTP when needed) on a background thread
+        :type is_background_refresh: bool
         """
         self._token_filepath = token_filepath
         self._tk_refresh_buffer = tk_refresh_buffer
+        self._tk_refresh_fraction = tk_refresh_fraction
+        # lifetime (in seconds) of the last tokens issued by a login or a refresh, unknown for the saved tokens
+        self._tk_lifetime: Optional[float] = None
+        # serializes renewals and logins between the token refresher and the trading path
+        self._token_lock = RLock()
+        self._token_refresher = TokenRefresher(name='wsimple-token-refresher',
+                                               seconds_until_due=self._seconds_until_refresh,
+                                               refresh=self.refresh_tokens)
 
         self._username = username
         self._password = password
         self._wsimple_verifier = wsimple_verifier
         self._wst_auth = None
+        self._async_auth = None
+        self._order_stream = None
 
         # ALERT: The 6 lines of code below (including the comment) should not be changed in order
         self._expiry_timestamp = 0
@@ -73,12 +101,16 @@ class WSimpleConnection(metaclass=SingletonMeta):
         # IMPORTANT: Setup expiry_timestamp, access_token, refresh_token by running the method right below
         self._parse_and_save_tokens()
 
+        if is_background_refresh:
+            self._token_refresher.start()
+
     def __str__(self):
         tojoin = list()
         tojoin.append('ClassType: {}'.format(type(self).__name__))
         tojoin.append('AccessExpiryTimestamp: {}'.format(self._expiry_timestamp))
         tojoin.append('IsAccessExpiryExpired: {}'.format(self.is_access_expired))
-        tojoin.append('TokenRefreshBufferTine: {}'.format(self._tk_refresh_buffer))
+        tojoin.append('TokenRefreshBufferTine: {}'.format(self._refresh_buffer()))
+        tojoin.append('IsTokenRefresherRunning: {}'.format(self._token_refresher.is_running))
 
         censored_refresh_token = str(self._refresh_token).replace(str(self._refresh_token)[4:-4],
                                                                   '*' * len(str(self._refresh_token)[4:-4]))
@@ -107,36 +139,90 @@ class WSimpleConnection(metaclass=SingletonMeta):
 
     @property
     def auth(self) -> Wsimple:
-        if self.is_access_expired:
-            print('WealthSimple access has expired. The system is logging in WST to verify')
-            return self._login_and_verify()
+        wst_auth = self._wst_auth
+        if wst_auth and not self.is_access_expired:
+            # renewals happen on the token refresher thread, away from the trading path
+            return wst_auth
 
-        else:
-            if not self._wst_auth:
-                print('Reloading WealthSimple access')
-                self._wst_auth = Wsimple(
-                    self._username,
-                    self._password,
-                    oauth_mode=True,
-                    tokens=self._wsimple_token(),
-                    internally_manage_tokens=True
-                )
-                try:
-                    self._wsimple_token_dict = self._wst_auth.refresh_token(self._wsimple_token())
-                    if datetime.datetime.now().timestamp().__round__() > (
-                            self._expiry_timestamp - self._tk_refresh_buffer):
-                        print(self._wsimple_token_dict)
-                        self._parse_and_save_tokens()
-                        print('WealthSimple access was about to expire. The access has been refreshed and saved')
-                    return self._wst_auth
+        with self._token_lock:
+            return self._load_auth()
+
+    @property
+    def async_auth(self) -> AsyncWsimple:
+        """asyncio access to the same ``Wsimple`` connection (re-wrapped whenever it is re-logged in)"""
+        auth = self.auth
+        if not self._async_auth or self._async_auth.wsimple is not auth:
+            self._async_auth = AsyncWsimple(auth)
+        return self._async_auth
 
+    @property
+    def order_stream(self) -> WSimpleOrderStream:
+        """websocket order-update stream shared by all brokers of this connection (a new ticket per connect)"""
+        if not self._order_stream:
+            self._order_stream = WSimpleOrderStream(uri_provider=lambda: self.auth.get_websocket_uri())
+        return self._order_stream
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def refresh_tokens(self):
+        """Renews the tokens ahead of their expiry (re-logging in when they cannot be refreshed)"""
+        with self._token_lock:
+            if self._wst_auth and not self.is_access_expired:
+                try:
+                    self._renew_tokens()
+                    print('WealthSimple access was about to expire. The access has been refreshed and saved')
                 except (InvalidAccessTokenError, InvalidRefreshTokenError) as err:
                     print("Invalid Token: {}".format(err))
-                    return self._login_and_verify()
+                    self._login_and_verify()
             else:
-                return self._wst_auth
+                self._load_auth()
+
+    def stop_token_refresher(self):
+        self._token_refresher.stop()
 
     # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _load_auth(self) -> Wsimple:
+        """Returns the current access, logging in or reloading it from the saved tokens (under the token lock)"""
+        if self._wst_auth and not self.is_access_expired:
+            # renewed by another thread while waiting for the lock
+            return self._wst_auth
+
+        if self.is_access_expired:
+            print('WealthSimple access has expired. The system is logging in WST to verify')
+            return self._login_and_verify()
+
+        print('Reloading WealthSimple access')
+        wst_auth = Wsimple(
+            self._username,
+            self._password,
+            oauth_mode=True,
+            tokens=self._wsimple_token(),
+            internally_manage_tokens=True
+        )
+        try:
+            # the reloaded access only gets its token box from a first refresh
+            self._renew_tokens(wst_auth)
+            self._wst_auth = wst_auth
+            return self._wst_auth
+
+        except (InvalidAccessTokenError, InvalidRefreshTokenError) as err:
+            print("Invalid Token: {}".format(err))
+            return self._login_and_verify()
+
+    def _renew_tokens(self, wst_auth: Optional[Wsimple] = None):
+        wst_auth = wst_auth if wst_auth else self._wst_auth
+        # Wsimple may rotate the tokens itself (inline refresh before a request): the locked refresh waits for it
+        # and then uses its token box, which is the latest. The refresh token is rotated too, so the pair is saved.
+        self._wsimple_token_dict = wst_auth.refresh_token_locked(self._wsimple_token())
+        self._parse_and_save_tokens(is_issued=True)
+
+    def _seconds_until_refresh(self) -> float:
+        return self._expiry_timestamp - self._refresh_buffer() - datetime.datetime.now().timestamp()
+
+    def _refresh_buffer(self) -> float:
+        if self._tk_lifetime is None:
+            return self._tk_refresh_buffer
+        return min(self._tk_refresh_buffer, self._tk_lifetime * self._tk_refresh_fraction)
+
     def _get_token_info(self):
         try:
             with open(self._token_filepath) as f:
@@ -144,8 +230,10 @@ class WSimpleConnection(metaclass=SingletonMeta):
         except FileNotFoundError as err:
             print(err)
 
-    def _parse_and_save_tokens(self):
+    def _parse_and_save_tokens(self, is_issued: bool = False):
         self._expiry_timestamp = self._wsimple_token_dict['expiry_timestamp']
+        if is_issued:
+            self._tk_lifetime = self._expiry_timestamp - datetime.datetime.now().timestamp()
         self._access_token = None if self.is_access_expired else self._wsimple_token_dict['access_token']
         self._refresh_token = None if self.is_access_expired else self._wsimple_token_dict['refresh_token']
 
@@ -157,10 +245,13 @@ class WSimpleConnection(metaclass=SingletonMeta):
             return [{'Authorization': self._access_token}, {'refresh_token': self._refresh_token}]
 
     def _login_and_verify(self):
-        self._wst_auth = Wsimple(self._username, self._password)
-        self._wsimple_token_dict = self._wst_auth.inject_otp(int(self._wsimple_verifier.otp))
-        self._parse_and_save_tokens()
+        self._wsimple_verifier.expect_otp()
+        wst_auth = Wsimple(self._username, self._password)
+        self._wsimple_token_dict = wst_auth.inject_otp(int(self._wsimple_verifier.otp))
+        self._parse_and_save_tokens(is_issued=True)
 
+        # swapped in only once verified, so that readers never get a half logged-in access
+        self._wst_auth = wst_auth
         return self._wst_auth
 
 
@@ -0,0 +1,70 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import datetime
+from threading import Lock
+from typing import Dict, Tuple
+
+from dateutil import tz
+
+WSIMPLE_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+UTC = tz.tzutc()
+
+
+# DIVIDER: --------------------------------------
+# INFO: WSimpleTimeDecoder Concrete Class
+
+class WSimpleTimeDecoder:
+    """
+    Decodes the UTC timestamps of Wealthsimple responses (i.e.: '2021-09-01T14:00:00.123Z') into a local ISO
+    datetime and a rounded epoch timestamp. The time zones are resolved once and every decoded timestamp is cached,
+    so a timestamp seen in many polls is only parsed once.
+    """
+
+    def __init__(self, local_timezone: str = 'America/Montreal', max_cached: int = 8192):
+        self._local_tz = tz.gettz(local_timezone)
+        self._max_cached = max_cached
+        self._cache: Dict[str, Tuple[str, int]] = dict()
+        self._lock = Lock()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('LocalTimezone: {}'.format(self._local_tz))
+        tojoin.append('CachedCount: {}'.format(len(self._cache)))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def decode(self, utc_time: str) -> Tuple[str, int]:
+        """Returns the (local ISO datetime, epoch timestamp) of a Wealthsimple UTC timestamp"""
+        decoded = self._cache.get(utc_time)
+        if decoded is None:
+            decoded = self._parse(utc_time)
+            with self._lock:
+                if len(self._cache) >= self._max_cached:
+                    self._cache.clear()
+                self._cache[utc_time] = decoded
+        return decoded
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _parse(self, utc_time: str) -> Tuple[str, int]:
+        try:
+            # fast path: the fixed ISO layout without its 'Z' suffix
+            datetime_utc = datetime.datetime.fromisoformat(utc_time[:-1])
+        except ValueError:
+            datetime_utc = datetime.datetime.strptime(utc_time, WSIMPLE_TIME_FORMAT)
+
+        datetime_utc = datetime_utc.replace(tzinfo=UTC)
+        return datetime_utc.astimezone(self._local_tz).isoformat(), round(datetime_utc.timestamp())
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    time_decoder = WSimpleTimeDecoder()
+    print(time_decoder.decode('2021-09-01T14:00:00.123Z'))
+    print(time_decoder.decode('2021-09-01T14:00:00.1234Z'))
+    print(time_decoder)
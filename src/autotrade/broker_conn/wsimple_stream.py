@@ -0,0 +1,165 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import asyncio
+import json
+from threading import Thread, Lock
+from typing import Callable, List, Optional
+
+import websockets
+
+# subscription to the order-update channel of the Wealthsimple websocket, sent on every (re)connect
+ORDER_SUBSCRIBE_MESSAGE = {'type': 'subscribe', 'channel': 'orders'}
+
+
+# DIVIDER: --------------------------------------
+# INFO: WSimpleOrderStream Concrete Class
+
+class WSimpleOrderStream:
+    """
+    Push channel for order-status updates over the Wealthsimple websocket.
+    A background thread keeps the connection open (reconnecting with backoff, asking ``uri_provider`` for a fresh
+    ticketed URI each time), subscribes to the order-update channel and passes every order event to the registered
+    listeners. The ``uri_provider`` may return any ws:// URI, i.e.: a local websocket stand-in for testing.
+    """
+
+    def __init__(self, uri_provider: Callable[[], str], subscribe_messages: Optional[List[dict]] = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        self._uri_provider = uri_provider
+        self._subscribe_messages = subscribe_messages if subscribe_messages is not None else [ORDER_SUBSCRIBE_MESSAGE]
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+
+        self._listeners: List[Callable[[dict], None]] = list()
+        self._listeners_lock = Lock()
+        self._is_connected = False
+        self._is_stopped = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[Thread] = None
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('IsConnected: {}'.format(self._is_connected))
+        tojoin.append('ListenerCount: {}'.format(len(self._listeners)))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def is_connected(self):
+        return self._is_connected
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Registers a callable receiving each order event (called on the stream thread)"""
+        with self._listeners_lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        with self._listeners_lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def start(self):
+        if not self._thread:
+            self._is_stopped = False
+            self._thread = Thread(target=self._run_loop, name='wsimple-order-stream', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._is_stopped = True
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def parse_order_event(message) -> Optional[dict]:
+        """Returns the order carried by a websocket message (bare or wrapped in 'payload'/'data'), if any"""
+        if not isinstance(message, dict):
+            return None
+
+        for candidate in (message, message.get('payload'), message.get('data')):
+            if isinstance(candidate, dict) and 'status' in candidate and ('order_id' in candidate or 'id' in candidate):
+                return candidate
+        return None
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self._listen())
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._is_connected = False
+            self._loop.close()
+            self._loop = None
+
+    async def _listen(self):
+        delay = self._reconnect_delay
+        while not self._is_stopped:
+            try:
+                uri = await self._loop.run_in_executor(None, self._uri_provider)
+                async with websockets.connect(uri) as websocket:
+                    self._is_connected = True
+                    delay = self._reconnect_delay
+                    for subscribe_message in self._subscribe_messages:
+                        await websocket.send(json.dumps(subscribe_message))
+
+                    async for raw_message in websocket:
+                        self._dispatch(raw_message)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                print(f'Wealthsimple order stream disconnected. Error details: {err}')
+
+            self._is_connected = False
+            if not self._is_stopped:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_reconnect_delay)
+
+    def _dispatch(self, raw_message):
+        try:
+            event = self.parse_order_event(json.loads(raw_message))
+        except ValueError:
+            return
+
+        if event:
+            with self._listeners_lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                try:
+                    listener(event)
+                except Exception as err:
+                    print(f'Unable to apply the order event {event}. Error details: {err}')
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    import time
+
+    async def _stand_in(websocket):
+        await websocket.send(json.dumps({'payload': {'id': 'order-1', 'status': 'posted'}}))
+        await asyncio.sleep(1)
+
+    async def _serve():
+        async with websockets.serve(_stand_in, 'localhost', 8765):
+            await asyncio.sleep(3)
+
+    Thread(target=lambda: asyncio.run(_serve()), daemon=True).start()
+    time.sleep(0.5)
+
+    order_stream = WSimpleOrderStream(uri_provider=lambda: 'ws://localhost:8765')
+    order_stream.add_listener(print)
+    order_stream.start()
+    time.sleep(2)
+    order_stream.stop()
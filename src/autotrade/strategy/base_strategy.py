@@ -1,7 +1,7 @@
 import math
-import time
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, Optional, Union, Dict, Deque
+from src.utility.clock import VirtualClock
 from src.utility.helper import ColorPrinter
 from src.autotrade.artifacts.order import RegularOrder, StopOrder
 from src.autotrade.bars.bar import Bar
@@ -29,6 +29,9 @@ class BaseStrategy(ABC):
         self._bars: Optional[Deque[Bar]] = None
         self._bar_count = 0
 
+        # waits go through the process clock so that replayed sessions can run faster than real time
+        self._clock = VirtualClock()
+
     # DIVIDER: Required Class Construction Methods --------------------------------------------------------
 
     def __iter__(self):
@@ -108,46 +111,32 @@ class BaseStrategy(ABC):
 
     @property
     def filled_orders(self):
-        if self.broker.settled_orders:
-            return {order.broker_ref_id: order for order in self.broker.settled_orders.values() if order.is_filled()}
+        if self.broker.filled_orders:
+            return self.broker.filled_orders
 
     @property
     def pending_stop_order(self):
-        if self.broker.pending_orders:
-            pending_stp = [order for order in self.broker.pending_orders.values() if
-                           order.is_stop_order() or order.is_stop_limit_order()]
-            if len(pending_stp) > 1:
-                raise MultiplePendingOrderException(pending_orders=pending_stp, is_regular_order=False)
-            else:
-                if pending_stp:
-                    return pending_stp[0]
+        pending_stp = self.broker.pending_stop_orders
+        if len(pending_stp) > 1:
+            raise MultiplePendingOrderException(pending_orders=list(pending_stp.values()), is_regular_order=False)
+        elif pending_stp:
+            return next(iter(pending_stp.values()))
 
     @property
     def pending_regular_order(self):
-
-        if self.broker.pending_orders:
-            pending_reg_odr = [order for order in self.broker.pending_orders.values()
-                               if order.is_market_order() or order.is_limit_order()]
-
-            if len(pending_reg_odr) > 1:
-                raise MultiplePendingOrderException(pending_orders=pending_reg_odr, is_regular_order=True)
-            else:
-                if pending_reg_odr:
-                    return pending_reg_odr[0]
+        pending_reg_odr = self.broker.pending_regular_orders
+        if len(pending_reg_odr) > 1:
+            raise MultiplePendingOrderException(pending_orders=list(pending_reg_odr.values()), is_regular_order=True)
+        elif pending_reg_odr:
+            return next(iter(pending_reg_odr.values()))
 
     @property
     def buy_count(self):
-        if self.broker.settled_orders:
-            return len([_ord for _ord in self.broker.settled_orders.values() if _ord.isbuy and _ord.is_filled()])
-        else:
-            return 0
+        return self.broker.filled_count(isbuy=True)
 
     @property
     def sell_count(self):
-        if self.broker.settled_orders:
-            return len([_ord for _ord in self.broker.settled_orders.values() if not _ord.isbuy and _ord.is_filled()])
-        else:
-            return 0
+        return self.broker.filled_count(isbuy=False)
 
     # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
 
@@ -168,7 +157,7 @@ class BaseStrategy(ABC):
         if self.pending_regular_order:
             self.cancel_order(self.pending_regular_order)
             # wait 5 seconds (or some time) for cancelling request to be processed by the broker
-            time.sleep(5 if self.is_live else 0)
+            self._clock.sleep(5 if self.is_live else 0)
             self.update_pending_orders(is_multiple_update=False)
 
         if self.pending_regular_order:
@@ -232,34 +221,28 @@ class BaseStrategy(ABC):
         if self.trade.reps_limit <= self.sell_count:
             return
 
-        for _ in range(3):
-            if self.pending_stop_order:
-                self.cancel_order(order=self.pending_stop_order)
-                time.sleep(3 if self.is_live else 0)
-                self.update_pending_orders(is_multiple_update=False)
-            else:
-                break
-
         ref_price = ref_price if ref_price else self.bars[0].close
         size = size if size is not None else self._getsizing(isbuy=False, ref_price=ref_price)
 
+        sell_order = None
         if size:
             if islimit:
                 if limit_price:
-                    limit_sell_order = RegularOrder(isbuy=False, islimit=islimit, size=size,
-                                                    limit_price=limit_price,
-                                                    trading_symbol=self.trading_symbol, ref_price=ref_price)
-
-                    submitted_order = self.broker.limit_sell(order=limit_sell_order)
+                    sell_order = RegularOrder(isbuy=False, islimit=islimit, size=size, limit_price=limit_price,
+                                              trading_symbol=self.trading_symbol, ref_price=ref_price)
                 else:
                     raise MissingPrice(price_type='limit_price')
 
             else:
-                market_sell_order = RegularOrder(isbuy=False, islimit=islimit, size=size, limit_price=limit_price,
-                                                 trading_symbol=self.trading_symbol, ref_price=ref_price)
+                sell_order = RegularOrder(isbuy=False, islimit=islimit, size=size, limit_price=limit_price,
+                                          trading_symbol=self.trading_symbol, ref_price=ref_price)
 
-                submitted_order = self.broker.market_sell(order=market_sell_order)
+        # the pending stop order protecting the position is swapped for the sell once its cancellation is confirmed
+        if self.pending_stop_order:
+            return self.cancel_replace(order=self.pending_stop_order, replacement=sell_order)
 
+        if sell_order:
+            submitted_order = self.broker.submit_order(order=sell_order)
             self._submitted_orders[submitted_order.broker_ref_id] = submitted_order
             return submitted_order
 
@@ -269,33 +252,10 @@ class BaseStrategy(ABC):
         if self.pending_stop_order:
             return
 
-        if self.trade.reps_limit <= self.sell_count:
-            return
-
-        ref_price = ref_price if ref_price else self.bars[0].close
-        size = size if size is not None else self._getsizing(isbuy=False, ref_price=ref_price)
-
-        if not stop_price:
-            raise MissingPrice(price_type='stop_price')
-
-        if size:
-            if isstoplimit:
-                if limit_price:
-                    stop_limit_order = StopOrder(isbuy=False, size=size, isstoplimit=isstoplimit,
-                                                 stop_price=stop_price, limit_price=limit_price, ref_price=ref_price,
-                                                 trading_symbol=self.trading_symbol)
-
-                    submitted_stp = self.broker.stop_limit_sell(order=stop_limit_order)
-                else:
-                    raise MissingPrice(price_type='limit_price')
-
-            else:
-                stop_order = StopOrder(isbuy=False, size=size, isstoplimit=isstoplimit,
-                                       stop_price=stop_price, limit_price=limit_price, ref_price=ref_price,
-                                       trading_symbol=self.trading_symbol)
-
-                submitted_stp = self.broker.stop_loss(order=stop_order)
-
+        stop_order = self._create_stop_order(isstoplimit, stop_price, ref_price=ref_price, size=size,
+                                             limit_price=limit_price)
+        if stop_order:
+            submitted_stp = self.broker.submit_order(order=stop_order)
             self._submitted_orders[submitted_stp.broker_ref_id] = submitted_stp
             return submitted_stp
 
@@ -322,7 +282,7 @@ class BaseStrategy(ABC):
 
                 update_count = 0
                 while self.market_hour.seconds_to_next_bar > buffer_seconds and update_count <= update_reps:
-                    time.sleep(wait_time if self.is_live else 0)
+                    self._clock.sleep(wait_time if self.is_live else 0)
                     self.broker.update_pending_orders(ref_price=ref_price)
                     self.monitor_and_notify()
                     if not self.pending_regular_order:
@@ -335,6 +295,25 @@ class BaseStrategy(ABC):
 
     # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
 
+    def _create_stop_order(self, isstoplimit: bool, stop_price: float, ref_price=None, size=None,
+                           limit_price=None) -> Optional[StopOrder]:
+        if self.trade.reps_limit <= self.sell_count:
+            return
+
+        ref_price = ref_price if ref_price else self.bars[0].close
+        size = size if size is not None else self._getsizing(isbuy=False, ref_price=ref_price)
+
+        if not stop_price:
+            raise MissingPrice(price_type='stop_price')
+
+        if size:
+            if isstoplimit and not limit_price:
+                raise MissingPrice(price_type='limit_price')
+
+            return StopOrder(isbuy=False, size=size, isstoplimit=isstoplimit,
+                             stop_price=stop_price, limit_price=limit_price, ref_price=ref_price,
+                             trading_symbol=self.trading_symbol)
+
     def monitor_and_notify(self, ref_price: float = 0.0):
         ref_price = ref_price if ref_price else self.bars[0].close
 
@@ -364,6 +343,14 @@ class BaseStrategy(ABC):
         submitted_order = self.broker.cancel_order(order)
         self._submitted_orders[submitted_order.broker_ref_id] = submitted_order
 
+    def cancel_replace(self, order: Union[RegularOrder, StopOrder],
+                       replacement: Union[RegularOrder, StopOrder, None] = None):
+        submitted_order = self.broker.cancel_replace(order=order, replacement=replacement)
+        self._submitted_orders[order.broker_ref_id] = order
+        if submitted_order:
+            self._submitted_orders[submitted_order.broker_ref_id] = submitted_order
+        return submitted_order
+
     def cancel_orders(self):
         if self.broker.pending_orders:
             for _ord in list(self.broker.pending_orders.values()):
@@ -392,19 +379,10 @@ class BaseStrategy(ABC):
             if not limit_price:
                 limit_price = stop_price
 
-        # cancel current stoploss before placing new one
-        for _ in range(3):
-            if self.pending_stop_order:
-                self.cancel_order(order=self.pending_stop_order)
-                time.sleep(3 if self.is_live else 0)
-                self.update_pending_orders(is_multiple_update=False)
-            else:
-                break
-
-        if self.pending_stop_order:
-            raise Exception('Unable to cancel the current pending stop order')
-
-        self.stoploss(isstoplimit=isstoplimit, stop_price=stop_price, limit_price=limit_price, ref_price=ref_price)
+        # replace the current stoploss: the new one is placed as soon as the cancellation is confirmed
+        stop_order = self._create_stop_order(isstoplimit=isstoplimit, stop_price=stop_price, ref_price=ref_price,
+                                             limit_price=limit_price)
+        self.cancel_replace(order=self.pending_stop_order, replacement=stop_order)
 
     def setup(self):
         # IMPORTANT: This line helps to avoid AttributeError: 'NoneType' of barfeed - when running prepare() method
@@ -3,7 +3,7 @@
 # Contact: tungstudies@gmail.com
 
 import time
-from typing import Optional, Union, List
+from typing import Optional, Union, List, Tuple
 
 from src.autotrade.artifacts.enums import IntervalOption, TradingDurationType, Exchange, TradeStatus
 from src.autotrade.artifacts.gltracker import GainLossTracker
@@ -12,6 +12,7 @@ from src.autotrade.artifacts.quoter import IQuoter
 from src.autotrade.artifacts.sizer import Sizer
 from src.autotrade.artifacts.stopper import StopOrderPricer
 from src.autotrade.bars.barfeed import BarFeed
+from src.autotrade.bars.datahub import CandleDataHub
 from src.autotrade.broker.base_broker import IBroker, BaseLiveBroker, BaseBroker
 from src.autotrade.errors import InvalidBrokerSetting
 from src.autotrade.strategy.base_strategy import BaseStrategy
@@ -30,7 +31,8 @@ class Trade:
     def __init__(self, codename: str, is_live_trade: bool, trading_symbol: str, ticker_alias: str, currency: str,
                  interval_option: str, candle_count: int, exchange: str,
                  country=None, reps: int = 1, duration_type: str = 'DAY',
-                 logger: Logger = Logger(), to_notify: Union[tuple, str, None] = None):
+                 logger: Logger = Logger(), to_notify: Union[tuple, str, None] = None,
+                 datafeed: Optional[ICandleRetriever] = None):
 
         # INFO: Constructor Input Parameter Check
         if interval_option.lower() not in IntervalOption.interval_options():
@@ -96,8 +98,10 @@ class Trade:
         self._interval_option = IntervalOption.get_interval(interval_option=interval_option)
         self._candle_count = candle_count
         self._candle_retriever: Optional[ICandleRetriever] = None
+        self._data_hub: CandleDataHub = CandleDataHub()
+        self._data_key: Optional[Tuple[str, str]] = None
         self._barfeed: Optional[BarFeed] = None
-        self.set_data()
+        self.set_data(datafeed)
 
     # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
 
@@ -230,9 +234,12 @@ class Trade:
     # INFO: Dealing with Trade Status
     def reset_trade(self):
         self._status = TradeStatus.ACTIVATED
+        if not self._data_key:
+            self.set_data(self._candle_retriever)
 
     def cancel_trade(self):
         self._status = TradeStatus.CANCELLED
+        self.release_data()
 
     def stop_trade(self):
         self._status = TradeStatus.PAUSED
@@ -242,6 +249,7 @@ class Trade:
 
     def close_trade(self):
         self._status = TradeStatus.CLOSED
+        self.release_data()
 
     def is_stopped(self):
         return self._status in [TradeStatus.CANCELLED, TradeStatus.CLOSED, TradeStatus.PAUSED]
@@ -250,25 +258,55 @@ class Trade:
         return self._status in [TradeStatus.CANCELLED, TradeStatus.CLOSED]
 
     # INFO: Dealing with Candle/Bar Data and Interval
-    def set_data(self, datafeed: ICandleRetriever = PYahooQuery()):
-        self._candle_retriever = datafeed
-
-
+    def set_data(self, datafeed: Optional[ICandleRetriever] = None):
+        """subscribe the trade to the process-wide ``CandleDataHub`` so that trades sharing the same
+        ticker and interval share one candle request per bar
+        """
         if self._exchange == 'TSX' or self._currency == 'CAD':
             ticker_symbol = self._ticker_alias
         else:
             ticker_symbol = self._trading_symbol
 
-        self._candle_retriever.set_ticker_symbol(ticker_symbol)
-        self._candle_retriever.set_interval(self._interval_option.value[0])
-        bar_df = self._candle_retriever.get_x_candles(self._candle_count)
+        self._candle_retriever = datafeed if datafeed else PYahooQuery()
+        self._candle_retriever.set_market_hour(self._market_hour)
+        self._data_key = self._data_hub.subscribe(ticker_symbol=ticker_symbol,
+                                                  interval_option=self._interval_option.value[0],
+                                                  candle_count=self._candle_count,
+                                                  candle_retriever=self._candle_retriever)
+
+        bar_timestamp = self._market_hour.bar_zero_timestamp
+        bar_df = self._data_hub.get_x_candles(self._data_key, candle_count=self._candle_count,
+                                              bar_timestamp=bar_timestamp)
         print(bar_df)
-        self._barfeed = BarFeed(dataframe=bar_df,market_hour=self._market_hour)
+        self._barfeed = BarFeed(dataframe=bar_df, market_hour=self._market_hour)
+        self._data_hub.attach_barfeed(self._data_key, barfeed=self._barfeed)
 
     def refresh_data(self):
-        new_bar_df = self._candle_retriever.get_x_candles(self._candle_count)
-        print(new_bar_df)
-        self._barfeed.update(dataframe=new_bar_df)
+        # the hub requests the new bar once and updates the barfeeds of all trades subscribed to the same key
+        bar_timestamp = self._market_hour.bar_zero_timestamp
+        expected_timestamp = bar_timestamp if self._market_hour.is_open_now() else None
+
+        refresh_count = 1
+        while not self._data_hub.refresh(self._data_key, bar_timestamp=bar_timestamp,
+                                         expected_timestamp=expected_timestamp):
+            if refresh_count >= self._barfeed.data_refresh_limit:
+                print(f'{self._codename}: The bar {bar_timestamp} is still missing or partial after '
+                      f'{refresh_count} requests')
+                break
+            # the new bar is missing or partial: wait for YFinance to catch up before requesting it again
+            countdown(message='Countdown to stale data refresh', time_sec=round(self._barfeed.data_delay_seconds))
+            refresh_count += 1
+        print(self._barfeed.frame)
+
+        # the quotes of the new bar: quoters sharing a source refresh together in one batch request
+        if self._quoter:
+            self._quoter.refresh_bar()
+
+    def release_data(self):
+        """Unsubscribes the trade from the ``CandleDataHub`` so that its barfeed is no longer updated"""
+        if self._data_key:
+            self._data_hub.unsubscribe(self._data_key, barfeed=self._barfeed)
+            self._data_key = None
 
     # EXECUTION/RUN TRADE
     def execute(self):
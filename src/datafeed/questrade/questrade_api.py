@@ -6,11 +6,17 @@ import datetime
 import json
 import os
 import time
+from threading import RLock
+from typing import Dict, Iterable, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.config.config import BASE_DIR
+from src.datafeed.replay.recording import QUOTES
 from src.utility.singleton import SingletonMeta
+from src.utility.symbolcache import SymbolIDCache
+from src.utility.token_refresher import TokenRefresher
 
 
 # DIVIDER: --------------------------------------
@@ -22,8 +28,29 @@ class QuesTradeAPI(metaclass=SingletonMeta):
     endpoint = '/oauth2/token'
     token_url = f'{host}{endpoint}'.format(host=host, endpoint=endpoint)
 
-    def __init__(self, token_filepath=os.path.join(BASE_DIR, 'secrets', 'qtokens.json')):
+    def __init__(self, token_filepath=os.path.join(BASE_DIR, 'secrets', 'qtokens.json'),
+                 pool_connections: int = 4, pool_maxsize: int = 10, timeout: Tuple[float, float] = (3.05, 10),
+                 tk_refresh_buffer: int = 300, is_background_refresh: bool = True):
+        """
+        :param pool_connections: number of hosts (login and api servers) whose connections are kept alive
+        :param pool_maxsize: maximum number of kept-alive connections per host
+        :param timeout: (connect, read) timeout in seconds of every request
+        :param tk_refresh_buffer: buffer time (in seconds) to refresh the access token before it expires
+        :param is_background_refresh: renew the access token on a background thread
+        """
         self._token_filepath = token_filepath
+        self._timeout = timeout
+        self._tk_refresh_buffer = tk_refresh_buffer
+        self._token_lock = RLock()
+        self._token_refresher = TokenRefresher(name='questrade-token-refresher',
+                                               seconds_until_due=self._seconds_until_refresh,
+                                               refresh=self.refresh_tokens)
+
+        # one keep-alive session for the singleton's lifetime so that requests skip the TLS handshake
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._session.mount('https://', adapter)
+
         self._questrade_tokens = self._get_token_info()
 
         self._expiry_timestamp = self._questrade_tokens['expiry_timestamp']
@@ -36,13 +63,14 @@ class QuesTradeAPI(metaclass=SingletonMeta):
         if self.is_refresh_token_expired:
             self._request_access_token()
 
-
-
-        self._data_request_headers = {
-            'Authorization': 'Bearer {}'.format(self._access_token)
-        }
+        self._set_authorization_header()
 
         self._ticker_id_dict: dict = dict()
+        self._symbol_cache = SymbolIDCache()
+        self._recorder = None
+
+        if is_background_refresh:
+            self._token_refresher.start()
 
     def __str__(self):
         tojoin = list()
@@ -52,6 +80,7 @@ class QuesTradeAPI(metaclass=SingletonMeta):
         tojoin.append('IsAccessExpiryExpired: {}'.format(self.is_access_expired))
         tojoin.append('IsRefreshTokenExpiryExpired: {}'.format(self.is_refresh_token_expired))
         tojoin.append('ApiServer: {}'.format(self._api_server))
+        tojoin.append('IsTokenRefresherRunning: {}'.format(self._token_refresher.is_running))
         censored_refresh_token = str(self._refresh_token).replace(str(self._refresh_token)[4:-4],
                                                                   '*' * len(str(self._refresh_token)[4:-4]))
         censored_access_token = str(self._access_token).replace(str(self._access_token)[4:-4],
@@ -73,19 +102,39 @@ class QuesTradeAPI(metaclass=SingletonMeta):
 
     # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
     def set_refresh_token(self, new_refresh_token: str):
-        self._refresh_token = new_refresh_token
-        self._request_access_token()
+        with self._token_lock:
+            self._refresh_token = new_refresh_token
+            self._request_access_token()
+
+    def refresh_tokens(self):
+        """Renews the access token ahead of its expiry"""
+        with self._token_lock:
+            if self._seconds_until_refresh() <= 0:
+                self._request_access_token(is_forced=True)
+
+    def stop_token_refresher(self):
+        self._token_refresher.stop()
+
+    def set_recorder(self, recorder):
+        """set a ``SessionRecorder`` receiving every quote returned by ``get_quotes`` (None to stop)"""
+        self._recorder = recorder
 
     def find_ticker_id(self, ticker_symbol: str, request_attempts=5):
         if ticker_symbol in self._ticker_id_dict:
             return self._ticker_id_dict[ticker_symbol]
+
+        cached_id = self._symbol_cache.get('questrade', ticker_symbol)
+        if cached_id:
+            self._ticker_id_dict[ticker_symbol] = cached_id
+            return cached_id
         else:
             ticker_search_suffix = 'v1/symbols/search?prefix'
             url = f"{self._api_server}{ticker_search_suffix}={ticker_symbol}"
             data = None
-            for _ in range(request_attempts):
-                time.sleep(0.1)
-                response = requests.request("GET", url, headers=self._data_request_headers)
+            for attempt in range(request_attempts):
+                if attempt:
+                    time.sleep(0.1)
+                response = self._session.get(url, timeout=self._timeout)
                 data = response.json()
                 if data['symbols']:
                     break
@@ -95,6 +144,7 @@ class QuesTradeAPI(metaclass=SingletonMeta):
                 for each in symbols_found:
                     if each['symbol'] == ticker_symbol:
                         self._ticker_id_dict[ticker_symbol] = each['symbolId']
+                        self._symbol_cache.set('questrade', ticker_symbol, each['symbolId'])
                         return each['symbolId']
 
             except Exception as err:
@@ -107,9 +157,49 @@ class QuesTradeAPI(metaclass=SingletonMeta):
         ticker_id = self.find_ticker_id(ticker_symbol=ticker_symbol)
         url = f"{self._api_server}{market_quotes_suffix}{ticker_id}"
 
-        response = requests.request("GET", url, headers=self._data_request_headers)
+        response = self._session.get(url, timeout=self._timeout)
         json_data = response.json()
-        return json_data['quotes'][0]
+        quote = json_data['quotes'][0]
+        if self._recorder:
+            self._recorder.record(QUOTES, ticker_symbol, quote)
+        return quote
+
+    def get_quotes_batch(self, ticker_symbols: Iterable[str], batch_size: int = 100) -> Dict[str, dict]:
+        """Returns the level-1 quotes of many tickers keyed by ticker symbol, with one request per
+        ``batch_size`` symbol IDs (symbol IDs are resolved through the ticker ID cache).
+        Tickers without a symbol ID or a quote are left out of the result.
+        """
+        market_quotes_suffix = 'v1/markets/quotes'
+
+        id_to_symbol = dict()
+        for ticker_symbol in ticker_symbols:
+            try:
+                ticker_id = self.find_ticker_id(ticker_symbol=ticker_symbol)
+            except Exception as err:
+                ticker_id = None
+                print(f'QuesTradeAPI: Unable to resolve the ticker ID of {ticker_symbol}. Error details: {err}')
+
+            if ticker_id:
+                id_to_symbol[ticker_id] = ticker_symbol
+            else:
+                print(f'QuesTradeAPI: {ticker_symbol} has no ticker ID and is left out of the quote batch')
+        ticker_ids = list(id_to_symbol.keys())
+
+        quotes: Dict[str, dict] = dict()
+        for i in range(0, len(ticker_ids), batch_size):
+            ids_param = ','.join(str(ticker_id) for ticker_id in ticker_ids[i:i + batch_size])
+            url = f"{self._api_server}{market_quotes_suffix}?ids={ids_param}"
+
+            response = self._session.get(url, timeout=self._timeout)
+            for quote in response.json()['quotes']:
+                ticker_symbol = id_to_symbol.get(quote['symbolId'])
+                if not ticker_symbol:
+                    continue
+                quotes[ticker_symbol] = quote
+                if self._recorder:
+                    self._recorder.record(QUOTES, ticker_symbol, quote)
+
+        return quotes
 
     # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
     def _get_token_info(self):
@@ -119,8 +209,15 @@ class QuesTradeAPI(metaclass=SingletonMeta):
         except FileNotFoundError as err:
             print(err)
 
-    def _request_access_token(self):
-        if self.is_access_expired:
+    def _set_authorization_header(self):
+        # pooled requests pick up a rotated access token from the session headers
+        self._session.headers.update({'Authorization': 'Bearer {}'.format(self._access_token)})
+
+    def _seconds_until_refresh(self) -> float:
+        return self._expiry_timestamp - self._tk_refresh_buffer - datetime.datetime.now().timestamp()
+
+    def _request_access_token(self, is_forced: bool = False):
+        if self.is_access_expired or is_forced:
             if self._refresh_token:
                 params = {
                     'grant_type': 'refresh_token',
@@ -129,7 +226,9 @@ class QuesTradeAPI(metaclass=SingletonMeta):
 
                 resp_text = "PotentialBadRequest"
                 try:
-                    response = requests.post(url=self.token_url, params=params)
+                    # the token endpoint is called without the (expired) bearer header of the session
+                    response = self._session.post(url=self.token_url, params=params, timeout=self._timeout,
+                                                  headers={'Authorization': None})
                     resp_text = response.text
                     json_response = response.json()
                     print(json_response)
@@ -141,6 +240,8 @@ class QuesTradeAPI(metaclass=SingletonMeta):
                 self._refresh_expiry_timestamp = round(datetime.datetime.now().timestamp()) + 603000  # 167.5 hrs ~ 7d
                 self._access_token = json_response['access_token']
                 self._api_server = json_response['api_server']
+                # the new bearer header is swapped in before the new expiry is published to the refresher
+                self._set_authorization_header()
                 self._expiry_timestamp = round(datetime.datetime.now().timestamp()) + int(json_response['expires_in'])
 
                 json_response['expiry_timestamp'] = self._expiry_timestamp
@@ -163,3 +264,4 @@ if __name__ == '__main__':
     print(questrade_api)
     quotes = questrade_api.get_quotes('CTS.TO')
     print(quotes)
+    print(questrade_api.get_quotes_batch(['CTS.TO', 'AC.TO', 'SHOP.TO']))
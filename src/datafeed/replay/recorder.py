@@ -0,0 +1,175 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import copy
+import json
+import os
+import queue
+from threading import Thread
+from typing import Optional, Any, TYPE_CHECKING
+
+import pandas as pd
+from wsimple.api import requestor
+
+from src.datafeed.replay.recording import RECORDING_PATH, CANDLES, QUOTES, WSIMPLE, candle_key, encode_frame
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever
+from src.utility.clock import VirtualClock
+
+if TYPE_CHECKING:
+    from src.autotrade.artifacts.mkhours import MarketHour
+
+
+# DIVIDER: --------------------------------------
+# INFO: SessionRecorder Concrete Class
+
+class SessionRecorder:
+    """
+    Opt-in, append-only recorder of live responses (see ``recording`` for the line format).
+    ``record`` snapshots the response as it is when recorded (a copy of a dataframe, the json text of other data)
+    and queues it: frame encoding and buffered file writes happen on a background thread, so recording adds no
+    disk I/O to the trading path and later changes to the recorded objects are not recorded.
+    """
+
+    def __init__(self, filepath: Optional[str] = None, flush_interval: float = 1.0,
+                 write_buffer_size: int = 65536):
+        self._clock = VirtualClock()
+        self._filepath = filepath if filepath else \
+            os.path.join(RECORDING_PATH, '{}.jsonl'.format(self._clock.now().date().isoformat()))
+        self._flush_interval = flush_interval
+        self._write_buffer_size = write_buffer_size
+
+        self._queue: queue.Queue = queue.Queue()
+        self._sentinel = object()
+        self._writer = Thread(target=self._write_records, name='session-recorder', daemon=True)
+
+        os.makedirs(os.path.dirname(self._filepath), exist_ok=True)
+        self._writer.start()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('Filepath: {}'.format(self._filepath))
+        tojoin.append('QueuedRecords: {}'.format(self._queue.qsize()))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def filepath(self):
+        return self._filepath
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def record(self, source: str, key: str, data: Any):
+        """Queues a snapshot of a response (a dataframe or json-serializable data) stamped with the clock time"""
+        if isinstance(data, pd.DataFrame):
+            data = data.copy()
+        else:
+            try:
+                data = json.dumps(data, separators=(',', ':'), default=str)
+            except (TypeError, ValueError) as err:
+                print(f'Unable to record the {source} response of {key}. Error details: {err}')
+                return
+
+        self._queue.put((self._clock.timestamp(), source, key, data))
+
+    def record_wsimple_responses(self, is_recorded: bool = True):
+        """Starts (or stops) recording every response received through the Wsimple requestor"""
+        requestor.set_response_sink(self._record_wsimple if is_recorded else None)
+
+    def close(self):
+        """Stops the Wsimple recording, writes the queued records and closes the file"""
+        self.record_wsimple_responses(is_recorded=False)
+        self._queue.put(self._sentinel)
+        self._writer.join()
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _record_wsimple(self, endpoint_name: str, data: Any):
+        self.record(WSIMPLE, endpoint_name, data)
+
+    def _write_records(self):
+        with open(self._filepath, 'a', buffering=self._write_buffer_size) as f:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self._flush_interval)
+                except queue.Empty:
+                    f.flush()
+                    continue
+
+                if item is self._sentinel:
+                    break
+
+                timestamp, source, key, data = item
+                try:
+                    if isinstance(data, pd.DataFrame):
+                        data = json.dumps(encode_frame(data), separators=(',', ':'), default=str)
+
+                    f.write('{{"ts":{},"src":{},"key":{},"data":{}}}\n'.format(
+                        json.dumps(timestamp), json.dumps(source), json.dumps(key), data))
+                except (TypeError, ValueError) as err:
+                    print(f'Unable to record the {source} response of {key}. Error details: {err}')
+
+
+# DIVIDER: --------------------------------------
+# INFO: RecordingCandleRetriever Concrete Class
+
+class RecordingCandleRetriever(ICandleRetriever):
+    """Passes requests to any ``ICandleRetriever`` and records the candles it returns"""
+
+    def __init__(self, candle_retriever: ICandleRetriever, recorder: SessionRecorder):
+        self._retriever = candle_retriever
+        self._recorder = recorder
+        self._interval_option: Optional[str] = None
+
+    def set_interval(self, interval_option: str):
+        self._retriever.set_interval(interval_option)
+        self._interval_option = interval_option
+
+    def set_ticker_symbol(self, ticker_symbol: str):
+        self._retriever.set_ticker_symbol(ticker_symbol)
+
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        self._retriever.set_market_hour(market_hour)
+
+    def for_symbol(self, ticker_symbol: str, interval_option: str) -> 'RecordingCandleRetriever':
+        """Returns a copy of this recorder in front of a per-ticker retriever (the recorder is shared)"""
+        retriever = copy.copy(self)
+        retriever._retriever = self._retriever.for_symbol(ticker_symbol, interval_option)
+        retriever._interval_option = interval_option
+        return retriever
+
+    def get_candles(self) -> pd.DataFrame:
+        df = self._retriever.get_candles()
+        self._recorder.record(CANDLES, candle_key(self.ticker_symbol, self._interval_option), df)
+        return df
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        df = self._retriever.get_x_candles(candle_count)
+        self._recorder.record(CANDLES, candle_key(self.ticker_symbol, self._interval_option), df)
+        return df
+
+    @property
+    def ticker_symbol(self):
+        return self._retriever.ticker_symbol
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    from src.datafeed.questrade.questrade_api import QuesTradeAPI
+    from src.datafeed.yahoofinance.yf_single import PYahooQuery
+
+    recorder = SessionRecorder()
+    datafeed = RecordingCandleRetriever(PYahooQuery(), recorder)
+    datafeed.set_ticker_symbol('AC.TO')
+    datafeed.set_interval('5m')
+    print(datafeed.get_x_candles(10))
+
+    questrade_api = QuesTradeAPI()
+    questrade_api.set_recorder(recorder)
+    print(questrade_api.get_quotes('AC.TO'))
+
+    recorder.record_wsimple_responses()
+    recorder.close()
+    print(recorder)
@@ -0,0 +1,104 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import bisect
+import json
+import os
+from typing import Dict, Tuple, List, Any
+
+import pandas as pd
+
+from src.config.config import BASE_DIR
+
+RECORDING_PATH = os.path.join(BASE_DIR, 'recordings')
+
+# record sources: one JSON object per line as {"ts": <epoch seconds>, "src": <source>, "key": <key>, "data": <data>}
+CANDLES = 'candles'  # key: '<ticker_symbol>|<interval_option>', data: frame in 'split' orientation
+QUOTES = 'quotes'  # key: ticker symbol, data: Questrade quote
+WSIMPLE = 'wsimple'  # key: Wsimple endpoint name, data: decoded json response
+
+
+def candle_key(ticker_symbol: str, interval_option: str) -> str:
+    return f'{ticker_symbol}|{interval_option}'
+
+
+def encode_frame(dataframe: pd.DataFrame) -> dict:
+    # the optional 'datetime' column is left out: bars derive it from 'timestamp'
+    dataframe = dataframe.drop(columns=['datetime'], errors='ignore')
+    return {'columns': list(dataframe.columns), 'data': dataframe.values.tolist()}
+
+
+def decode_frame(data: dict) -> pd.DataFrame:
+    return pd.DataFrame(data['data'], columns=data['columns'])
+
+
+# DIVIDER: --------------------------------------
+# INFO: SessionRecording Concrete Class
+
+class SessionRecording:
+    """Read-only, in-memory index of a recorded session file, grouped by (source, key) in time order"""
+
+    def __init__(self, filepath: str):
+        self._filepath = filepath
+        self._timestamps: Dict[Tuple[str, str], List[float]] = dict()
+        self._records: Dict[Tuple[str, str], List[Any]] = dict()
+        self._load()
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('Filepath: {}'.format(self._filepath))
+        tojoin.append('StartTimestamp: {}'.format(self.start_timestamp))
+        tojoin.append('EndTimestamp: {}'.format(self.end_timestamp))
+        tojoin.append('Keys: {}'.format(list(self._records.keys())))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def start_timestamp(self) -> float:
+        return min(timestamps[0] for timestamps in self._timestamps.values())
+
+    @property
+    def end_timestamp(self) -> float:
+        return max(timestamps[-1] for timestamps in self._timestamps.values())
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def has(self, source: str, key: str) -> bool:
+        return (source, key) in self._records
+
+    def at(self, source: str, key: str, timestamp: float) -> Any:
+        """Returns the latest record of (source, key) made at or before ``timestamp``
+        (the earliest record if ``timestamp`` precedes all of them)
+        """
+        if not self.has(source, key):
+            raise KeyError(f'No {source} record found for {key} in {self._filepath}')
+
+        index = bisect.bisect_right(self._timestamps[(source, key)], timestamp) - 1
+        return self._records[(source, key)][max(index, 0)]
+
+    def sequence(self, source: str, key: str) -> List[Any]:
+        """Returns every record of (source, key) in the order they were made"""
+        return self._records.get((source, key), list())
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _load(self):
+        with open(self._filepath) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                group = (record['src'], record['key'])
+                self._timestamps.setdefault(group, list()).append(record['ts'])
+                self._records.setdefault(group, list()).append(record['data'])
+
+        if not self._records:
+            raise ValueError(f'The recording {self._filepath} is empty')
+
+        # background writers may append slightly out of order
+        for group, timestamps in self._timestamps.items():
+            if any(earlier > later for earlier, later in zip(timestamps, timestamps[1:])):
+                order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+                self._timestamps[group] = [timestamps[i] for i in order]
+                self._records[group] = [self._records[group][i] for i in order]
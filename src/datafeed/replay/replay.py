@@ -0,0 +1,184 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+from threading import Lock
+from typing import Dict, Iterable, Optional, TYPE_CHECKING
+
+import pandas as pd
+from wsimple import Wsimple, AsyncWsimple
+from wsimple.api import requestor
+
+from src.datafeed.replay.recording import SessionRecording, CANDLES, QUOTES, WSIMPLE, candle_key, decode_frame
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever
+from src.utility.clock import VirtualClock
+
+if TYPE_CHECKING:
+    from src.autotrade.artifacts.mkhours import MarketHour
+
+
+# DIVIDER: --------------------------------------
+# INFO: ReplayCandleRetriever Concrete Class
+
+class ReplayCandleRetriever(ICandleRetriever):
+    """Serves the candles recorded for the current ticker and interval as they were at the current clock time"""
+
+    def __init__(self, recording: SessionRecording):
+        self._recording = recording
+        self._clock = VirtualClock()
+        self._ticker_symbol: Optional[str] = None
+        self._interval_option: Optional[str] = None
+        self._market_hour: Optional['MarketHour'] = None
+
+    def set_interval(self, interval_option: str):
+        self._interval_option = interval_option
+
+    def set_ticker_symbol(self, ticker_symbol: str):
+        self._ticker_symbol = ticker_symbol
+
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        self._market_hour = market_hour
+
+    def get_candles(self) -> pd.DataFrame:
+        data = self._recording.at(CANDLES, candle_key(self._ticker_symbol, self._interval_option),
+                                  self._clock.timestamp())
+        return decode_frame(data)
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        return self.get_candles().tail(candle_count).reset_index(drop=True)
+
+    @property
+    def ticker_symbol(self):
+        return self._ticker_symbol
+
+
+# DIVIDER: --------------------------------------
+# INFO: ReplayQuesTradeAPI Concrete Class
+
+class ReplayQuesTradeAPI:
+    """Stand-in for ``QuesTradeAPI`` answering ``get_quotes`` with the quote recorded at the current clock time"""
+
+    def __init__(self, recording: SessionRecording):
+        self._recording = recording
+        self._clock = VirtualClock()
+
+    def get_quotes(self, ticker_symbol: str):
+        return self._recording.at(QUOTES, ticker_symbol, self._clock.timestamp())
+
+    def get_quotes_batch(self, ticker_symbols: Iterable[str]) -> Dict[str, dict]:
+        return {ticker_symbol: self.get_quotes(ticker_symbol) for ticker_symbol in ticker_symbols}
+
+
+# DIVIDER: --------------------------------------
+# INFO: ReplayWSimpleConnection Concrete Class
+
+class ReplayWSimpleConnection:
+    """
+    Stand-in for ``WSimpleConnection``: ``auth`` is a token-less ``Wsimple`` whose requests are answered from the
+    recording. Responses of each endpoint are served in recorded order so that order placements and the
+    activities polled afterwards stay consistent; the last response is repeated once an endpoint runs out.
+    """
+
+    def __init__(self, recording: SessionRecording):
+        self._recording = recording
+        self._cursors: Dict[str, int] = dict()
+        self._lock = Lock()
+        self._wst_auth = None
+        self._async_auth = None
+
+    @property
+    def auth(self):
+        if not self._wst_auth:
+            requestor.set_response_source(self._next_response)
+            self._wst_auth = Wsimple('', '', oauth_mode=True, verbose_mode=False,
+                                     tokens=[{'Authorization': 'replay'}, {'refresh_token': 'replay'}],
+                                     internally_manage_tokens=False)
+        return self._wst_auth
+
+    @property
+    def async_auth(self):
+        if not self._async_auth:
+            self._async_auth = AsyncWsimple(self.auth)
+        return self._async_auth
+
+    def close(self):
+        if self._wst_auth:
+            requestor.set_response_source(None)
+            self._wst_auth = None
+            self._async_auth = None
+
+    def _next_response(self, endpoint_name: str):
+        responses = self._recording.sequence(WSIMPLE, endpoint_name)
+        if not responses:
+            raise KeyError(f'No Wsimple response recorded for {endpoint_name}')
+
+        with self._lock:
+            index = self._cursors.get(endpoint_name, 0)
+            self._cursors[endpoint_name] = index + 1
+
+        return responses[min(index, len(responses) - 1)]
+
+
+# DIVIDER: --------------------------------------
+# INFO: SessionReplay Concrete Class
+
+class SessionReplay:
+    """
+    Replays a recorded trading day offline. ``start`` moves the process ``VirtualClock`` to the start of the
+    recording at ``speed`` times real speed (e.g.: 1.0, 60.0, or None for as fast as possible), so that
+    ``Trade.execute`` takes its live branch against the replayed candles, quotes and broker responses.
+    """
+
+    def __init__(self, recording_filepath: str, speed: Optional[float] = 1.0):
+        self._recording = SessionRecording(recording_filepath)
+        self._speed = speed
+        self._clock = VirtualClock()
+        self._wsimple_conn: Optional[ReplayWSimpleConnection] = None
+
+    @property
+    def recording(self):
+        return self._recording
+
+    def start(self, start_timestamp: Optional[float] = None):
+        self._clock.start_virtual(start_timestamp=start_timestamp if start_timestamp else
+                                  self._recording.start_timestamp, speed=self._speed)
+
+    def stop(self):
+        self._clock.stop_virtual()
+        if self._wsimple_conn:
+            self._wsimple_conn.close()
+
+    def candle_retriever(self) -> ReplayCandleRetriever:
+        return ReplayCandleRetriever(self._recording)
+
+    def questrade_api(self) -> ReplayQuesTradeAPI:
+        return ReplayQuesTradeAPI(self._recording)
+
+    def wsimple_connection(self) -> ReplayWSimpleConnection:
+        if not self._wsimple_conn:
+            self._wsimple_conn = ReplayWSimpleConnection(self._recording)
+        return self._wsimple_conn
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    import os
+
+    from src.autotrade.artifacts.quoter import QuestradeQuoter
+    from src.autotrade.broker.wsimple_broker import WSimpleBroker
+    from src.autotrade.trade import Trade
+    from src.datafeed.replay.recording import RECORDING_PATH
+
+    replay = SessionReplay(os.path.join(RECORDING_PATH, '2021-09-01.jsonl'), speed=None)
+    replay.start()
+
+    trade = Trade(codename='AirCanadaReplay', is_live_trade=True, trading_symbol='AC', ticker_alias='AC.TO',
+                  currency='CAD', interval_option='5m', candle_count=100, exchange='TSX',
+                  datafeed=replay.candle_retriever())
+    trade.set_quoter(QuestradeQuoter(questrade_api=replay.questrade_api()))
+    trade.set_broker(WSimpleBroker(wsimple_conn=replay.wsimple_connection(), is_order_streaming=False))
+    # set sizer, stop order pricer and strategy as for a live trade, then:
+    # trade.execute()
+    replay.stop()
@@ -0,0 +1,202 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, AsyncIterator, Tuple, Optional
+
+import pandas as pd
+
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever, PublicBase
+from src.datafeed.yahoofinance.yf_single import PYahooQuery
+from src.errors import ValueNotPresentException
+
+
+# DIVIDER: --------------------------------------
+# INFO: HostRateLimiter Concrete Class
+
+class HostRateLimiter:
+    """Spaces out request starts to a host so that no more than ``requests_per_second`` are issued.
+    Slots are reserved under a thread lock, so a limiter can be shared by several event loops.
+    """
+
+    def __init__(self, requests_per_second: float):
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = Lock()
+
+    def set_rate(self, requests_per_second: float):
+        with self._lock:
+            self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+
+    def reserve(self) -> float:
+        """Reserves the next request slot and returns the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            return slot - now
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait_blocking(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# one worker pool and one request limiter for the Yahoo host, shared by every AsyncPYahooQuery of the process
+YAHOO_MAX_WORKERS = 8
+_yahoo_executor: Optional[ThreadPoolExecutor] = None
+_yahoo_executor_lock = Lock()
+yahoo_rate_limiter = HostRateLimiter(requests_per_second=5.0)
+
+
+def yahoo_executor() -> ThreadPoolExecutor:
+    """Returns the worker pool of the Yahoo requests, created on first use and kept for the process lifetime"""
+    global _yahoo_executor
+    with _yahoo_executor_lock:
+        if _yahoo_executor is None:
+            _yahoo_executor = ThreadPoolExecutor(max_workers=YAHOO_MAX_WORKERS, thread_name_prefix='yf-async')
+        return _yahoo_executor
+
+
+def set_yahoo_rate_limit(requests_per_second: float):
+    """Sets the request rate of the shared Yahoo limiter (for every retriever of the process)"""
+    yahoo_rate_limiter.set_rate(requests_per_second)
+
+
+# DIVIDER: --------------------------------------
+# INFO: AsyncPYahooQuery Concrete Class
+
+class AsyncPYahooQuery(PublicBase, ICandleRetriever):
+    """Concurrent candle retriever for many ticker symbols.
+    The coroutines request each symbol through ``PYahooQuery`` on the shared Yahoo worker pool, with at most
+    ``max_concurrency`` requests in flight, request starts limited by the shared Yahoo limiter and failed requests
+    retried with exponential backoff. They are awaited from the caller's event loop; the synchronous
+    ``ICandleRetriever`` methods request on the calling thread instead, so they also work while a loop is running.
+    """
+
+    def __init__(self, ticker_symbol: str = None, interval_option: str = None, period=None, is_fromto: bool = False,
+                 start=None, end=None, max_concurrency: int = YAHOO_MAX_WORKERS, retries: int = 3,
+                 retry_backoff: float = 0.5):
+
+        super().__init__(ticker_symbol=ticker_symbol, interval_option=interval_option,
+                         period=period, is_fromto=is_fromto, start=start, end=end)
+
+        self._max_concurrency = max_concurrency
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+
+    def set_interval(self, interval_option: str):
+
+        if interval_option.lower() not in ['1m', '2m', '5m', '15m', '30m', '1h', '4h', '1d']:
+            raise ValueNotPresentException(provided_value=interval_option.lower(),
+                                           value_list=['1m', '2m', '5m', '15m', '30m', '1h', '4h', '1d'])
+
+        self._interval_option = interval_option
+
+    def set_ticker_symbol(self, ticker_symbol: str):
+        self._ticker_symbol = ticker_symbol
+
+    # DIVIDER: Asynchronous Methods ---------------------------------------------------------------
+    async def fetch_x_candles(self, ticker_symbol: str, candle_count: int,
+                              semaphore: Optional[asyncio.Semaphore] = None) -> pd.DataFrame:
+        """Fetches the latest ``candle_count`` candles of a single symbol"""
+        semaphore = semaphore if semaphore else asyncio.Semaphore(self._max_concurrency)
+        return await self._fetch(ticker_symbol, semaphore, lambda retriever: retriever.get_x_candles(candle_count))
+
+    async def fetch_candles(self, ticker_symbol: str,
+                            semaphore: Optional[asyncio.Semaphore] = None) -> pd.DataFrame:
+        """Fetches the period/range candles of a single symbol"""
+        semaphore = semaphore if semaphore else asyncio.Semaphore(self._max_concurrency)
+        return await self._fetch(ticker_symbol, semaphore, lambda retriever: retriever.get_candles())
+
+    async def iter_x_candles(self, ticker_symbols: Iterable[str],
+                             candle_count: int) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+        """Yields (ticker_symbol, dataframe) pairs as soon as each symbol's data is ready"""
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def _fetch_with_symbol(symbol: str):
+            return symbol, await self.fetch_x_candles(symbol, candle_count, semaphore)
+
+        for next_done in asyncio.as_completed([_fetch_with_symbol(symbol) for symbol in ticker_symbols]):
+            yield await next_done
+
+    async def gather_x_candles(self, ticker_symbols: Iterable[str], candle_count: int) -> Dict[str, pd.DataFrame]:
+        return {symbol: df async for symbol, df in self.iter_x_candles(ticker_symbols, candle_count)}
+
+    # DIVIDER: Synchronous ICandleRetriever Methods -----------------------------------------------
+    def get_candles(self) -> pd.DataFrame:
+        return self._fetch_blocking(self.ticker_symbol, lambda retriever: retriever.get_candles())
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        return self._fetch_blocking(self.ticker_symbol, lambda retriever: retriever.get_x_candles(candle_count))
+
+    @property
+    def ticker_symbol(self):
+        return self._ticker_symbol
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _make_retriever(self, ticker_symbol: str) -> PYahooQuery:
+        retriever = PYahooQuery(period=self._period, is_fromto=self._range_type, start=self._start, end=self._end)
+        retriever.set_ticker_symbol(ticker_symbol)
+        retriever.set_interval(self._interval_option)
+        if self._df_headers:
+            retriever.set_dataframe_headers(self._df_headers)
+        if self._market_hour:
+            retriever.set_market_hour(self._market_hour)
+        return retriever
+
+    async def _fetch(self, ticker_symbol: str, semaphore: asyncio.Semaphore, request) -> pd.DataFrame:
+        retriever = self._make_retriever(ticker_symbol)
+        loop = asyncio.get_running_loop()
+
+        attempt = 0
+        while True:
+            async with semaphore:
+                await yahoo_rate_limiter.wait()
+                try:
+                    return await loop.run_in_executor(yahoo_executor(), request, retriever)
+                except Exception as err:
+                    if attempt >= self._retries:
+                        raise Exception(f'Unable to retrieve candles of {ticker_symbol} after {attempt + 1} '
+                                        f'attempt(s). Error details: {err}')
+
+            # back off outside of the semaphore so that other symbols can proceed
+            await asyncio.sleep(self._retry_backoff * 2 ** attempt)
+            attempt += 1
+
+    def _fetch_blocking(self, ticker_symbol: str, request) -> pd.DataFrame:
+        retriever = self._make_retriever(ticker_symbol)
+
+        attempt = 0
+        while True:
+            yahoo_rate_limiter.wait_blocking()
+            try:
+                return request(retriever)
+            except Exception as err:
+                if attempt >= self._retries:
+                    raise Exception(f'Unable to retrieve candles of {ticker_symbol} after {attempt + 1} '
+                                    f'attempt(s). Error details: {err}')
+
+            time.sleep(self._retry_backoff * 2 ** attempt)
+            attempt += 1
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    datafeed = AsyncPYahooQuery(max_concurrency=4)
+    datafeed.set_interval('5m')
+    frames = asyncio.run(datafeed.gather_x_candles(['AC.TO', 'CTS.TO', 'SHOP.TO'], candle_count=10))
+    for symbol, frame in frames.items():
+        print(symbol)
+        print(frame)
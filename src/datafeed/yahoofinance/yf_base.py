@@ -2,17 +2,24 @@
 # Author: Thanh Tung Nguyen
 # Contact: tungstudies@gmail.com
 
+import copy
 import math
 from abc import abstractmethod, ABC
-from typing import Optional, List
+from typing import Optional, List, TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 
+if TYPE_CHECKING:
+    from src.autotrade.artifacts.mkhours import MarketHour
+
 
 # DIVIDER: --------------------------------------
 # INFO: PublicBase Abstract Class (YahooFinance Public API - BaseClass)
 
 class PublicBase:
+    default_local_tz = 'America/Montreal'
+
     def __init__(self, ticker_symbol: str=None, interval_option: str=None,
                  period=None, is_fromto: bool = False, start=None, end=None):
         self._range_type = is_fromto
@@ -30,10 +37,82 @@ class PublicBase:
         self._ticker_symbol = ticker_symbol
         self._interval_option = interval_option
         self._df_headers: Optional[List[str]] = None
+        self._market_hour: Optional['MarketHour'] = None
+
+        # the 'datetime' column is only derived from 'timestamp' on request, otherwise bars derive it when displayed
+        self._is_datetime_derived = False
 
     def set_dataframe_headers(self, df_headers: List[str]):
         self._df_headers = df_headers
 
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        """set the ``MarketHour`` whose exchange calendar drives the request range of ``get_x_candles``"""
+        self._market_hour = market_hour
+
+    def set_datetime_derived(self, is_datetime_derived: bool):
+        """set whether formatted frames carry a 'datetime' column derived from the 'timestamp' column"""
+        self._is_datetime_derived = is_datetime_derived
+
+    @property
+    def local_tz(self):
+        return self._market_hour.local_tz if self._market_hour else self.default_local_tz
+
+    @property
+    def range_setting(self):
+        """Returns the current (is_fromto, period, start, end) range setting"""
+        return self._range_type, self._period, self._start, self._end
+
+    def set_range_by_period(self, period: str):
+        self._range_type = False
+        self._period = period
+        self._start = None
+        self._end = None
+
+    def set_range_by_fromto(self, start, end):
+        self._range_type = True
+        self._period = None
+        self._start = start
+        self._end = end
+
+    def _normalize_timestamps(self, datetime_values) -> np.ndarray:
+        """Converts datetime values to int64 epoch seconds in a vectorized way.
+        Naive values are taken as exchange wall time; tz-aware values (including mixed offsets across
+        a DST change) are converted to UTC.
+        """
+        try:
+            datetime_index = pd.DatetimeIndex(datetime_values)
+        except (ValueError, TypeError):
+            datetime_index = pd.DatetimeIndex(pd.to_datetime(datetime_values, utc=True))
+
+        if datetime_index.tz is None:
+            datetime_index = datetime_index.tz_localize(self.local_tz, ambiguous='NaT', nonexistent='shift_forward')
+
+        utc_values = datetime_index.tz_convert('UTC').tz_localize(None).values
+        return utc_values.astype('datetime64[s]').astype(np.int64)
+
+    def _derive_datetime(self, timestamps) -> pd.DatetimeIndex:
+        """Converts int64 epoch seconds to tz-aware datetimes in the exchange timezone"""
+        return pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(self.local_tz)
+
+    def _format_columns(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """Adds or drops the derived 'datetime' column and re-orders/filters the frame columns"""
+        if self._is_datetime_derived:
+            dataframe = dataframe.assign(datetime=self._derive_datetime(dataframe['timestamp'].values))
+            columns = ['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume',
+                       'interval_option', 'ticker_symbol']
+        else:
+            columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'interval_option', 'ticker_symbol']
+
+        if not self._df_headers:
+            # re-order columns
+            return dataframe[columns]
+        else:
+            for header in self._df_headers:
+                if header not in dataframe.columns:
+                    raise Exception(f'The {header} field does not exist in the dataframe column names')
+
+            return dataframe[self._df_headers]
+
     def _compute_data_days(self, number_of_bar_intervals: int):
         number = number_of_bar_intervals
         minutes_per_day = 390
@@ -59,6 +138,16 @@ class PublicBase:
 
         return math.ceil(minutes / minutes_per_day)
 
+    def _compute_request_range(self, number_of_bar_intervals: int):
+        """Returns the (start, end, period) download arguments for the latest ``number_of_bar_intervals`` bars.
+        With a market hour set, start is the exact open of the earliest bar from the exchange session calendar.
+        Otherwise, falls back to whole days assuming 390 trading minutes per day.
+        """
+        if self._market_hour:
+            return self._market_hour.compute_bars_start(number_of_bar_intervals), self._end, None
+        else:
+            return self._start, self._end, f'{self._compute_data_days(number_of_bar_intervals)}d'
+
 
 # DIVIDER: --------------------------------------
 # INFO: ICandleFeed Interface
@@ -72,6 +161,10 @@ class ICandleRetriever(ABC):
     def set_ticker_symbol(self, ticker_symbol: str):
         raise NotImplementedError()
 
+    @abstractmethod
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        raise NotImplementedError()
+
     @abstractmethod
     def get_candles(self) -> pd.DataFrame:
         raise NotImplementedError()
@@ -84,3 +177,12 @@ class ICandleRetriever(ABC):
     @abstractmethod
     def ticker_symbol(self):
         raise NotImplementedError()
+
+    def for_symbol(self, ticker_symbol: str, interval_option: str) -> 'ICandleRetriever':
+        """Returns the retriever serving the given ticker and interval. By default, it is a copy of this retriever
+        set to them, so one retriever passed to many trades is never re-pointed to another ticker; a retriever shared
+        by many tickers returns a per-ticker view instead"""
+        retriever = copy.copy(self)
+        retriever.set_ticker_symbol(ticker_symbol)
+        retriever.set_interval(interval_option)
+        return retriever
@@ -0,0 +1,177 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import copy
+import datetime
+import os
+from typing import Dict, Tuple, Optional, TYPE_CHECKING
+
+import pandas as pd
+
+from src.autotrade.artifacts.enums import IntervalOption
+from src.config.config import BASE_DIR
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever, PublicBase
+
+if TYPE_CHECKING:
+    from src.autotrade.artifacts.mkhours import MarketHour
+
+CANDLE_CACHE_PATH = os.path.join(BASE_DIR, 'cache', 'candles')
+
+# the oldest intraday bars Yahoo serves, in days back from now (daily bars have no such limit)
+YAHOO_MAX_LOOKBACK_DAYS = {'1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '1h': 730, '4h': 730}
+
+
+# DIVIDER: --------------------------------------
+# INFO: CachedCandleRetriever Concrete Class
+
+class CachedCandleRetriever(ICandleRetriever):
+    """Local candle cache in front of any ``ICandleRetriever``.
+    Bars are kept per (ticker_symbol, interval_option) in memory and on disk. Once the cache holds enough bars,
+    a refresh only requests the range starting at the last cached bar (which may still have been forming),
+    instead of re-downloading whole days of history. When the last cached bar is beyond the oldest bar Yahoo
+    serves for the interval, the cache is rebuilt from a full request. The cache file is only rewritten when a
+    request adds bars to the cache (an update of the forming bar alone is requested again on the next refresh).
+    """
+
+    def __init__(self, candle_retriever: ICandleRetriever, cache_folder_path: str = CANDLE_CACHE_PATH,
+                 is_persistent: bool = True, max_cached_rows: int = 5000):
+        self._retriever = candle_retriever
+        self._cache_folder_path = cache_folder_path
+        self._is_persistent = is_persistent
+        self._max_cached_rows = max_cached_rows
+
+        self._interval_option: Optional[str] = None
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = dict()
+
+        if self._is_persistent:
+            os.makedirs(self._cache_folder_path, exist_ok=True)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def ticker_symbol(self):
+        return self._retriever.ticker_symbol
+
+    @property
+    def cache_key(self) -> Tuple[str, str]:
+        return self.ticker_symbol, self._interval_option
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def set_interval(self, interval_option: str):
+        self._retriever.set_interval(interval_option)
+        self._interval_option = interval_option
+
+    def set_ticker_symbol(self, ticker_symbol: str):
+        self._retriever.set_ticker_symbol(ticker_symbol)
+
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        self._retriever.set_market_hour(market_hour)
+
+    def for_symbol(self, ticker_symbol: str, interval_option: str) -> 'CachedCandleRetriever':
+        """Returns a copy of this cache in front of a per-ticker retriever (the cached frames are shared)"""
+        retriever = copy.copy(self)
+        retriever._retriever = self._retriever.for_symbol(ticker_symbol, interval_option)
+        retriever._interval_option = interval_option
+        return retriever
+
+    def get_candles(self) -> pd.DataFrame:
+        df = self._retriever.get_candles()
+        self._merge(df)
+        return df
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        cached_df = self._load()
+
+        if cached_df is not None and len(cached_df) >= candle_count and isinstance(self._retriever, PublicBase):
+            last_timestamp = int(cached_df['timestamp'].iloc[-1])
+            if self._is_within_lookback(last_timestamp):
+                merged_df = self._merge(self._get_candles_since(last_timestamp))
+            else:
+                # the bars since the last cached bar cannot be requested anymore: drop them rather than keep a gap
+                merged_df = self._merge(self._retriever.get_x_candles(candle_count), is_replacing=True)
+        else:
+            merged_df = self._merge(self._retriever.get_x_candles(candle_count))
+
+        df = merged_df.tail(candle_count).copy()
+        df.reset_index(level=0, drop=True, inplace=True)
+        return df
+
+    def clear(self):
+        """Removes the cached bars of the current ticker and interval"""
+        self._frames.pop(self.cache_key, None)
+        if self._is_persistent and os.path.exists(self._cache_filepath()):
+            os.remove(self._cache_filepath())
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _cache_filepath(self):
+        ticker_symbol, interval_option = self.cache_key
+        return os.path.join(self._cache_folder_path, f'{ticker_symbol}_{interval_option}.pkl')
+
+    def _load(self) -> Optional[pd.DataFrame]:
+        if self.cache_key not in self._frames:
+            if self._is_persistent and os.path.exists(self._cache_filepath()):
+                self._frames[self.cache_key] = pd.read_pickle(self._cache_filepath())
+            else:
+                return None
+
+        return self._frames[self.cache_key]
+
+    def _merge(self, new_df: pd.DataFrame, is_replacing: bool = False) -> pd.DataFrame:
+        cached_df = None if is_replacing else self._load()
+
+        if cached_df is None or cached_df.empty:
+            merged_df = new_df
+            has_new_rows = True
+        else:
+            has_new_rows = bool((~new_df['timestamp'].isin(cached_df['timestamp'])).any())
+            # newly retrieved bars replace cached bars of the same timestamp (i.e.: the last bar while forming)
+            merged_df = pd.concat([cached_df, new_df], ignore_index=True)
+            merged_df = merged_df.drop_duplicates(subset='timestamp', keep='last')
+            merged_df = merged_df.sort_values(by='timestamp')
+
+        merged_df = merged_df.tail(self._max_cached_rows).reset_index(drop=True)
+        self._frames[self.cache_key] = merged_df
+
+        if self._is_persistent and has_new_rows:
+            merged_df.to_pickle(self._cache_filepath())
+
+        return merged_df
+
+    def _is_within_lookback(self, last_timestamp: int) -> bool:
+        max_lookback_days = YAHOO_MAX_LOOKBACK_DAYS.get(self._interval_option)
+        if max_lookback_days is None:
+            return True
+
+        # keep a day of margin: Yahoo counts its limit from the request time, not from the session open
+        oldest = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(days=max_lookback_days - 1)
+        return last_timestamp >= oldest.timestamp()
+
+    def _get_candles_since(self, last_timestamp: int) -> pd.DataFrame:
+        """Requests only the bars from the last cached bar onwards, then restores the retriever range setting"""
+        bar_gap_seconds = IntervalOption.get_interval(interval_option=self._interval_option).value[1]
+        start = datetime.datetime.fromtimestamp(last_timestamp, tz=datetime.timezone.utc)
+        end = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(seconds=bar_gap_seconds)
+
+        is_fromto, period, old_start, old_end = self._retriever.range_setting
+        self._retriever.set_range_by_fromto(start=start, end=end)
+        try:
+            return self._retriever.get_candles()
+        finally:
+            if is_fromto:
+                self._retriever.set_range_by_fromto(start=old_start, end=old_end)
+            else:
+                self._retriever.set_range_by_period(period=period)
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    from src.datafeed.yahoofinance.yf_single import PYahooQuery
+
+    datafeed = CachedCandleRetriever(PYahooQuery())
+    datafeed.set_ticker_symbol('CTS.TO')
+    datafeed.set_interval('5m')
+    print(datafeed.get_x_candles(10))
+    # only the newest bars are requested this time
+    print(datafeed.get_x_candles(10))
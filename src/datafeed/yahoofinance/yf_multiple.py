@@ -1,100 +1,233 @@
-pass
-'''
-from typing import Set, List
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+import time
+from threading import Lock
+from typing import Set, Dict, List, Optional, TYPE_CHECKING
 
-from src.datafeed.yahoofinance.yf_base import PublicBase
-import yfinance as yf
 import pandas as pd
+import yfinance as yf
+
+from src.datafeed.yahoofinance.yf_base import ICandleRetriever, PublicBase
+from src.errors import ValueNotPresentException, CandleDataNotFoundError
+
+if TYPE_CHECKING:
+    from src.autotrade.artifacts.mkhours import MarketHour
+
+
+# DIVIDER: --------------------------------------
+# INFO: PYahooFinanceMulti Concrete Class
+
+class PYahooFinanceMulti(PublicBase, ICandleRetriever):
+    """Batched candle retriever for a set of ticker symbols.
+    Tickers are downloaded ``batch_size`` at a time with ``yf.download`` and the combined frame is split into
+    per-symbol normalized frames (same columns as ``PYahooFinance``). The latest batch is kept for
+    ``batch_ttl_seconds``, so the per-symbol retrievers given by ``for_symbol`` (i.e.: to the trades of a
+    ``CandleDataHub``) are all served by one batched request per bar.
+    """
+
+    def __init__(self, ticker_symbols: Optional[Set[str]] = None, interval_option: str = None, period=None,
+                 is_fromto: bool = False, start=None, end=None, batch_size: int = 50, batch_ttl_seconds: float = 5.0):
+        super().__init__(ticker_symbol=None, interval_option=interval_option,
+                         period=period, is_fromto=is_fromto, start=start, end=end)
+
+        self._ticker_symbols: Set[str] = set(ticker_symbols) if ticker_symbols else set()
+        self._batch_size = batch_size
+        self._batch_ttl_seconds = batch_ttl_seconds
+
+        # the latest batch of get_x_candles_dict: frames by symbol, the candle count and the time it was requested
+        self._batch_lock = Lock()
+        self._batch_frames: Dict[str, pd.DataFrame] = dict()
+        self._batch_symbols: Set[str] = set()
+        self._batch_candle_count = 0
+        self._batch_monotonic: Optional[float] = None
+
+    def set_interval(self, interval_option: str):
+
+        if interval_option.lower() not in ['1m', '2m', '5m', '15m', '30m', '1h', '4h', '1d']:
+            raise ValueNotPresentException(provided_value=interval_option.lower(),
+                                           value_list=['1m', '2m', '5m', '15m', '30m', '1h', '4h', '1d'])
 
+        self._interval_option = interval_option
 
-class PublicMultipleTickerYF(PublicBase):
+    def set_ticker_symbol(self, ticker_symbol: str):
+        """selects the ticker returned by ``get_candles`` and ``get_x_candles`` and adds it to the batch"""
+        self._ticker_symbol = ticker_symbol
+        self._ticker_symbols.add(ticker_symbol)
 
-    def __init__(self, ticker_set: [Set[str]], interval="15m", is_fromto: bool = False, period="5d",
-                 start=None, end=None):
-        super().__init__(interval=interval, is_fromto=is_fromto, period=period, start=start, end=end)
-        self._ticker_set = ticker_set
+    def add_ticker_symbols(self, ticker_symbols: Set[str]):
+        self._ticker_symbols.update(ticker_symbols)
 
-    def set_dataframe_headers(self, df_headers: List[str]):
-        self.df_headers = df_headers
+    def remove_ticker_symbol(self, ticker_symbol: str):
+        self._ticker_symbols.discard(ticker_symbol)
 
-    def _format_dataframe(self, ticker_symbol, dataframe: pd.DataFrame):
+    def for_symbol(self, ticker_symbol: str, interval_option: str) -> 'PYahooFinanceMultiView':
+        """Adds the ticker to the batch and returns a retriever of its candles, served from the shared batch"""
+        if self._interval_option and self._interval_option != interval_option:
+            raise ValueError(f"The batch is set to the '{self._interval_option}' interval. "
+                             f"Got '{interval_option}' for {ticker_symbol} instead")
+        if not self._interval_option:
+            self.set_interval(interval_option)
+
+        self._ticker_symbols.add(ticker_symbol)
+        return PYahooFinanceMultiView(batch_retriever=self, ticker_symbol=ticker_symbol)
+
+    def _format_dataframe(self, ticker_symbol: str, dataframe: pd.DataFrame):
+        # rows where the ticker had no trade are all NaN in a combined download
+        dataframe = dataframe.dropna(how='all').copy()
         # convert datetime index column of a pandas dataframe into a normal column
         dataframe.reset_index(level=0, inplace=True)
         # lowercase dataframe column headers
         dataframe.columns = map(str.lower, dataframe.columns)
 
         if 'date' in dataframe.columns:
-            # add 'timestamp' column translated from 'date' column
-            dataframe = dataframe.assign(timestamp=dataframe['date'].values.astype(np.int64) // 10 ** 9)
             # rename dataframe column header from 'date' to 'datetime'
             dataframe = dataframe.rename(columns={'date': 'datetime'})
-        else:
-            # add 'timestamp' column translated from 'date' column
-            dataframe = dataframe.assign(timestamp=dataframe['datetime'].values.astype(np.int64) // 10 ** 9)
 
-        if not ticker_symbol:
-            raise Exception('Missing data "ticker_symbol" method input parameter')
+        # add 'timestamp' column as int64 epoch seconds
+        dataframe = dataframe.assign(timestamp=self._normalize_timestamps(dataframe['datetime']))
 
-        dataframe = dataframe.assign(interval=self.interval)
+        dataframe = dataframe.assign(interval_option=self._interval_option)
         dataframe = dataframe.assign(ticker_symbol=ticker_symbol)
 
-        if not self.df_headers:
-            # re-order columns
-            return dataframe[
-                ['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'interval', 'ticker_symbol']]
-        else:
-            for header in self.df_headers:
-                if header not in dataframe.columns:
-                    raise Exception(f'The {header} field does not exist in the dataframe column names')
-
-            return dataframe[[self.df_headers]]
-
-    def get_candles(self):
-        """Download yahoo tickers
-        :Parameters:
-            tickers : str, list
-                List of tickers to download
-
-            period : str
-                Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
-                Either Use period parameter or use start and end
-
-            interval : str
-                Valid intervals: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo
-                Intraday data cannot extend last 60 days
-
-            start: str
-                Download start date string (YYYY-MM-DD) or _datetime.
-                Default is 1900-01-01
-            end: str
-                Download end date string (YYYY-MM-DD) or _datetime.
-                Default is now
-            group_by : str
-                Group by 'ticker' or 'column' (default)
-
-            threads: bool / int
-                How many threads to use for mass downloading. Default is True
-
-            proxy: str
-                Optional. Proxy server URL scheme. Default is None
-
-            rounding: bool
-                Optional. Round values to 2 decimal places?
-
-            show_errors: bool
-                Optional. Doesn't print errors if True
-        """
-        separator = ' '
-        tickers = separator.join(self._ticker_set)
-        combined_df = yf.download(tickers, start=self.start, end=self.end, actions=False, threads=True,
-                                  group_by='ticker', period=self.period, show_errors=True,
-                                  interval=self.interval, proxy=None, rounding=False)
-
-        ticker_dataframes = dict()
-
-        for ticker in self._ticker_set:
-            ticker_df = combined_df[ticker]
-            ticker_dataframes[ticker] = self._format_dataframe(ticker, ticker_df)
+        return self._format_columns(dataframe)
+
+    def _download(self, period=None, start=None, end=None) -> Dict[str, pd.DataFrame]:
+        """Returns the frames by symbol. A symbol without any candle (i.e.: delisted or mistyped) is left out"""
+        if not self._ticker_symbols:
+            raise ValueError("Missing 'ticker_symbols' while requesting batched data")
+
+        symbols: List[str] = sorted(self._ticker_symbols)
+        ticker_dataframes: Dict[str, pd.DataFrame] = dict()
+
+        for i in range(0, len(symbols), self._batch_size):
+            batch = symbols[i:i + self._batch_size]
+            combined_df = yf.download(' '.join(batch), start=start, end=end, actions=False,
+                                      threads=True, group_by='ticker', period=period, show_errors=True,
+                                      interval=self._interval_option, proxy=None, rounding=False)
+
+            for ticker in batch:
+                # a single-ticker download is not grouped by ticker
+                if len(batch) == 1:
+                    ticker_df = combined_df
+                elif ticker in combined_df.columns.get_level_values(0):
+                    ticker_df = combined_df[ticker]
+                else:
+                    continue
+
+                if not ticker_df.dropna(how='all').empty:
+                    ticker_dataframes[ticker] = self._format_dataframe(ticker, ticker_df)
 
         return ticker_dataframes
-'''
\ No newline at end of file
+
+    def get_candles_dict(self) -> Dict[str, pd.DataFrame]:
+        if self._range_type:
+            if not (self._start and self._end):
+                raise ValueError("Missing 'start' & 'end' parameters while requesting historical data")
+        else:
+            if not self._period:
+                raise ValueError("Missing 'period' parameter while requesting historical data")
+
+        return self._download(period=self._period, start=self._start, end=self._end)
+
+    def get_x_candles_dict(self, candle_count: int) -> Dict[str, pd.DataFrame]:
+        start, end, period = super()._compute_request_range(candle_count)
+        ticker_dataframes = self._download(period=period, start=start, end=end)
+
+        return {ticker: df.tail(candle_count).reset_index(level=0, drop=True)
+                for ticker, df in ticker_dataframes.items()}
+
+    def get_symbol_candles(self, ticker_symbol: str) -> pd.DataFrame:
+        return self._pick(self.get_candles_dict(), ticker_symbol)
+
+    def get_symbol_x_candles(self, ticker_symbol: str, candle_count: int) -> pd.DataFrame:
+        """Returns the latest candles of the ticker, from the latest batch while it is recent enough"""
+        with self._batch_lock:
+            is_batch_due = self._batch_monotonic is None or \
+                time.monotonic() - self._batch_monotonic >= self._batch_ttl_seconds or \
+                self._batch_candle_count < candle_count or ticker_symbol not in self._batch_symbols
+
+            if is_batch_due:
+                self._ticker_symbols.add(ticker_symbol)
+                self._batch_symbols = set(self._ticker_symbols)
+                self._batch_frames = self.get_x_candles_dict(candle_count)
+                self._batch_candle_count = candle_count
+                self._batch_monotonic = time.monotonic()
+
+            ticker_df = self._pick(self._batch_frames, ticker_symbol)
+
+        return ticker_df.tail(candle_count).reset_index(level=0, drop=True)
+
+    def get_candles(self) -> pd.DataFrame:
+        return self.get_symbol_candles(self.ticker_symbol)
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        return self.get_symbol_x_candles(self.ticker_symbol, candle_count)
+
+    def _pick(self, ticker_dataframes: Dict[str, pd.DataFrame], ticker_symbol: str) -> pd.DataFrame:
+        if ticker_symbol not in ticker_dataframes:
+            raise CandleDataNotFoundError(ticker_symbol=ticker_symbol, interval_option=self._interval_option)
+        return ticker_dataframes[ticker_symbol]
+
+    @property
+    def ticker_symbol(self):
+        return self._ticker_symbol
+
+    @property
+    def ticker_symbols(self):
+        return self._ticker_symbols
+
+    @property
+    def interval_option(self):
+        return self._interval_option
+
+
+# DIVIDER: --------------------------------------
+# INFO: PYahooFinanceMultiView Concrete Class
+
+class PYahooFinanceMultiView(ICandleRetriever):
+    """Candle retriever of one ticker, served from the batches of a shared ``PYahooFinanceMulti``"""
+
+    def __init__(self, batch_retriever: PYahooFinanceMulti, ticker_symbol: str):
+        self._batch_retriever = batch_retriever
+        self._ticker_symbol = ticker_symbol
+
+    def set_interval(self, interval_option: str):
+        if interval_option != self._batch_retriever.interval_option:
+            raise ValueError(f"The batch is set to the '{self._batch_retriever.interval_option}' interval. "
+                             f"Got '{interval_option}' instead")
+
+    def set_ticker_symbol(self, ticker_symbol: str):
+        self._ticker_symbol = ticker_symbol
+        self._batch_retriever.add_ticker_symbols({ticker_symbol})
+
+    def set_market_hour(self, market_hour: 'MarketHour'):
+        self._batch_retriever.set_market_hour(market_hour)
+
+    def get_candles(self) -> pd.DataFrame:
+        return self._batch_retriever.get_symbol_candles(self._ticker_symbol)
+
+    def get_x_candles(self, candle_count: int) -> pd.DataFrame:
+        return self._batch_retriever.get_symbol_x_candles(self._ticker_symbol, candle_count)
+
+    @property
+    def ticker_symbol(self):
+        return self._ticker_symbol
+
+
+# DIVIDER: --------------------------------------
+# INFO: Usage Examples
+
+if __name__ == '__main__':
+    datafeed = PYahooFinanceMulti(ticker_symbols={'AC.TO', 'CTS.TO', 'SHOP.TO'})
+    datafeed.set_interval('5m')
+    for symbol, frame in datafeed.get_x_candles_dict(10).items():
+        print(symbol)
+        print(frame)
+
+    # per-symbol retrievers (i.e.: passed as the datafeed of many trades) share one batched request per bar
+    ac_candles = datafeed.for_symbol('AC.TO', '5m')
+    cts_candles = datafeed.for_symbol('CTS.TO', '5m')
+    print(ac_candles.get_x_candles(10))
+    print(cts_candles.get_x_candles(10))
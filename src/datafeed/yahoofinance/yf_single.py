@@ -1,4 +1,3 @@
-import numpy as np
 import pandas as pd
 import yfinance as yf
 from yahooquery import Ticker
@@ -32,27 +31,16 @@ class PYahooFinance(PublicBase, ICandleRetriever):
         dataframe.columns = map(str.lower, dataframe.columns)
 
         if 'date' in dataframe.columns:
-            # add 'timestamp' column translated from 'date' column
-            dataframe = dataframe.assign(timestamp=dataframe['date'].values.astype(np.int64) // 10 ** 9)
             # rename dataframe column header from 'date' to 'datetime'
             dataframe = dataframe.rename(columns={'date': 'datetime'})
-        else:
-            # add 'timestamp' column translated from 'date' column
-            dataframe = dataframe.assign(timestamp=dataframe['datetime'].values.astype(np.int64) // 10 ** 9)
+
+        # add 'timestamp' column as int64 epoch seconds
+        dataframe = dataframe.assign(timestamp=self._normalize_timestamps(dataframe['datetime']))
 
         dataframe = dataframe.assign(interval_option=self._interval_option)
         dataframe = dataframe.assign(ticker_symbol=self.ticker_symbol)
 
-        if not self._df_headers:
-            # re-order columns
-            return dataframe[
-                ['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'interval_option', 'ticker_symbol']]
-        else:
-            for header in self._df_headers:
-                if header not in dataframe.columns:
-                    raise Exception(f'The {header} field does not exist in the dataframe column names')
-
-            return dataframe[[self._df_headers]]
+        return self._format_columns(dataframe)
 
     def get_candles(self):
         if self._range_type:
@@ -68,9 +56,8 @@ class PYahooFinance(PublicBase, ICandleRetriever):
         return self._format_dataframe(single_df)
 
     def get_x_candles(self, candle_count: int) -> pd.DataFrame:
-        days = super()._compute_data_days(candle_count)
-        period = f'{days}d'
-        single_df = yf.download(self.ticker_symbol, start=self._start, end=self._end, actions=False, threads=True,
+        start, end, period = super()._compute_request_range(candle_count)
+        single_df = yf.download(self.ticker_symbol, start=start, end=end, actions=False, threads=True,
                                 group_by='ticker', period=period, show_errors=True,
                                 interval=self._interval_option, proxy=None, rounding=False)
         df = self._format_dataframe(single_df).tail(candle_count)
@@ -101,32 +88,23 @@ class PYahooQuery(PublicBase, ICandleRetriever):
         self._ticker_symbol = ticker_symbol
 
     def _format_dataframe(self, dataframe: pd.DataFrame):
-        # convert datetime index column of a pandas dataframe into a normal column
+        # convert the symbol index level of a pandas dataframe into a normal column
         dataframe.reset_index(level=0, inplace=True)
         # lowercase dataframe column headers
         dataframe.columns = map(str.lower, dataframe.columns)
-        dataframe['datetime'] = dataframe.index
+
+        # add 'timestamp' column as int64 epoch seconds from the date index
+        timestamps = self._normalize_timestamps(dataframe.index)
         dataframe.reset_index(level=0, drop=True, inplace=True)
+        dataframe = dataframe.assign(timestamp=timestamps)
 
         # rename dataframe column header from 'symbol' to 'ticker_symbol'
         dataframe = dataframe.rename(columns={'symbol': 'ticker_symbol'})
 
         # add 'interval_option' column
         dataframe = dataframe.assign(interval_option=self._interval_option)
-        dataframe['datetime'] = pd.to_datetime(dataframe['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S-04:00'))
-        # add 'timestamp' column translated from 'datetime' column
-        dataframe = dataframe.assign(timestamp=dataframe['datetime'].values.astype(np.int64) // 10 ** 9)
-
-        if not self._df_headers:
-            # re-order columns
-            return dataframe[
-                ['timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'interval_option', 'ticker_symbol']]
-        else:
-            for header in self._df_headers:
-                if header not in dataframe.columns:
-                    raise Exception(f'The {header} field does not exist in the dataframe column names')
 
-            return dataframe[[self._df_headers]]
+        return self._format_columns(dataframe)
 
     def get_candles(self):
 
@@ -143,10 +121,9 @@ class PYahooQuery(PublicBase, ICandleRetriever):
         return self._format_dataframe(single_df)
 
     def get_x_candles(self, candle_count: int) -> pd.DataFrame:
-        days = super()._compute_data_days(candle_count)
-        period = f'{days}d'
+        start, end, period = super()._compute_request_range(candle_count)
         single_ticker = Ticker(self.ticker_symbol, asynchronous=False)
-        single_df = single_ticker.history(period=period, interval=self._interval_option, start=self._start, end=self._end)
+        single_df = single_ticker.history(period=period, interval=self._interval_option, start=start, end=end)
         df = self._format_dataframe(single_df).tail(candle_count)
         df.reset_index(level=0, drop=True, inplace=True)
         return df
@@ -143,6 +143,30 @@ class TickerIDNotFoundError(Exception):
         )
 
 
+# DIVIDER: --------------------------------------
+# INFO: CandleDataNotFoundError ErrorClass
+
+class CandleDataNotFoundError(Exception):
+    """Error thrown when a candle data source returns no candles for a requested ticker symbol"""
+
+    def __init__(self, ticker_symbol: str, interval_option: str = None):
+        super().__init__(
+            f"Unable to find any {interval_option + ' ' if interval_option else ''}candles for {ticker_symbol}"
+        )
+
+
+# DIVIDER: --------------------------------------
+# INFO: CandleRetrieverConflictError ErrorClass
+
+class CandleRetrieverConflictError(ValueError):
+    """Error thrown when a trade subscribes to shared candles with a retriever unlike the one already serving them"""
+
+    def __init__(self, key, expected_retriever: str, provided_retriever: str):
+        super().__init__(
+            f"The candles of {key} are served by {expected_retriever}. Got {provided_retriever} instead"
+        )
+
+
 # DIVIDER: --------------------------------------
 # INFO: OrderPlacingError ErrorClass
 
@@ -155,6 +179,18 @@ class OrderPlacingError(Exception):
         )
 
 
+# DIVIDER: --------------------------------------
+# INFO: OrderCancellationError ErrorClass
+
+class OrderCancellationError(Exception):
+    """Error thrown when the cancellation of an order is not confirmed by the broker in time"""
+
+    def __init__(self, order, timeout: float):
+        super().__init__(
+            f"The cancellation of the order was not confirmed within {timeout} seconds -\n{order}"
+        )
+
+
 # DIVIDER: --------------------------------------
 # INFO: ValueNotPresentException ErrorClass
 
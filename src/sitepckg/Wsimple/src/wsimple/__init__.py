@@ -1,4 +1,5 @@
 from .api import Wsimple
+from .api import AsyncWsimple
 
 from .api import TokensBox
 
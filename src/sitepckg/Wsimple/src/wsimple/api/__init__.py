@@ -3,6 +3,7 @@
  No Copyright (c) please take: 2020 Chromazmoves
 """
 from .api import Wsimple
+from .async_api import AsyncWsimple
 
 from .tokens import TokensBox
 
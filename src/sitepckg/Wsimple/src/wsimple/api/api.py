@@ -7,6 +7,7 @@ File Name: rest_api/rest_api.py
 # !/usr/bin/env python3
 # standard library
 import sys
+import threading
 from datetime import datetime, timedelta
 from typing import Optional, Union
 
@@ -115,6 +116,8 @@ class Wsimple:
         self.oauth_mode = oauth_mode
         self.logger = logger
         self.internally_manage_tokens = internally_manage_tokens
+        # serializes token refreshes when the instance is shared by threads (i.e.: AsyncWsimple workers)
+        self._token_lock = threading.Lock()
         if not self.verbose:
             self.logger.add(sys.stderr, level="SUCCESS")
         else:
@@ -230,6 +233,15 @@ class Wsimple:
 
                 return token_dict
 
+    def refresh_token_locked(self, tokens=None):
+        """
+        Same as refresh_token, serialized with the inline refreshes of the managed tokens.
+        The current token box (rotated by an inline refresh) is used over ***tokens*** when there is one.
+        """
+        with self._token_lock:
+            box = getattr(self, "box", None)
+            return self.refresh_token(tokens=box.tokens if box else tokens)
+
     @classmethod
     def oauth_login(cls, token_dict, verbose=False):
         """
@@ -248,13 +260,16 @@ class Wsimple:
 
     def _manage_tokens(f):
         def wrap_manage_tokens(self, *args, **kwargs):
-            self.logger.info(f"Tokens: {self.box} {args} {kwargs}")
+            self.logger.info("Tokens: {} {} {}", self.box, args, kwargs)
             if self.internally_manage_tokens:
-                diff = self.box.access_expires - datetime.now()
-                self.logger.debug(f"Reset in -> {diff}")
-                if diff < timedelta(minutes=15):
-                    self.box = self.refresh_token(tokens=self.box.tokens)
-                kwargs["tokens"] = self.box.tokens
+                with self._token_lock:
+                    diff = self.box.access_expires - datetime.now()
+                    self.logger.debug("Reset in -> {}", diff)
+                    if diff < timedelta(minutes=15):
+                        # refresh_token swaps self.box for the new tokens
+                        self.refresh_token(tokens=self.box.tokens)
+                    tokens = self.box.tokens
+                kwargs["tokens"] = tokens
                 return f(self, *args, **kwargs)
             else:
                 return f(self, *args, **kwargs)
@@ -750,6 +765,7 @@ class Wsimple:
             type: Union[str, list] = "all",
             sec_id: Optional[str] = None,
             account_id: Union[str, list] = None,
+            raw: bool = False,
     ):
         """
         Grabs the 20 most recent activities on under your Wealthsimple Trade account.
@@ -759,6 +775,7 @@ class Wsimple:
           'refund','referral_bonus', 'affiliate'
         ] autoset to "all".
         Where ***limit*** is the limitation of the response has to be less than 100: autoset 20.
+        Where ***raw*** returns the plain decoded json instead of a Box: autoset False.
         !Wealthsimple Servers will default to trade account if account_id = None
         """
         params = {}
@@ -776,13 +793,15 @@ class Wsimple:
             headers=tokens[0],
             params=params,
             logger=self.logger,
+            raw=raw,
         )
 
     @_manage_tokens
-    def get_activities_bookmark(self, bookmark: str, tokens=None):
+    def get_activities_bookmark(self, bookmark: str, tokens=None, raw: bool = False):
         """
         Provides the last 20 activities on the Wealthsimple Trade based on the bookmark.
         Where ***bookmark*** is the bookmark id.
+        Where ***raw*** returns the plain decoded json instead of a Box: autoset False.
         """
         params = {"bookmark": bookmark}
         return requestor(
@@ -791,6 +810,7 @@ class Wsimple:
             headers=tokens[0],
             params=params,
             logger=self.logger,
+            raw=raw,
         )
 
     # ! withdrawal functions
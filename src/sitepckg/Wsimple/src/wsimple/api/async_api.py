@@ -0,0 +1,109 @@
+"""
+Project Name: Wsimple
+File Name: api/async_api.py
+**File: asyncio access point to the API**
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .api import Wsimple
+
+
+class AsyncWsimple:
+    """
+    AsyncWsimple exposes the order, activity, position, security and account calls of a
+    logged-in Wsimple as coroutines.
+
+    Requests still go through the requestor's pooled cloudscraper session, which is needed
+    to pass Cloudflare. They run on a process-wide worker pool, so calls awaited together
+    (e.g. with asyncio.gather) are in flight at the same time.
+
+    Token handling is unchanged: each call goes through Wsimple._manage_tokens, and that
+    refreshes the tokens under a lock shared by all workers.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, wsimple: Wsimple, max_workers: int = 16):
+        self.wsimple = wsimple
+        with AsyncWsimple._executor_lock:
+            if AsyncWsimple._executor is None:
+                AsyncWsimple._executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="wsimple-async"
+                )
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs)
+        )
+
+    # ! account related functions
+    async def get_accounts(self, **kwargs):
+        return await self._run(self.wsimple.get_accounts, **kwargs)
+
+    async def get_account(self, **kwargs):
+        return await self._run(self.wsimple.get_account, **kwargs)
+
+    async def accounts(self, **kwargs):
+        return await self._run(self.wsimple.accounts, **kwargs)
+
+    async def get_positions(self, **kwargs):
+        return await self._run(self.wsimple.get_positions, **kwargs)
+
+    # ! order functions
+    async def get_orders(self, **kwargs):
+        return await self._run(self.wsimple.get_orders, **kwargs)
+
+    async def market_buy_order(self, security_id: str, ref_price: float, **kwargs):
+        return await self._run(self.wsimple.market_buy_order, security_id, ref_price, **kwargs)
+
+    async def limit_buy_order(self, security_id: str, limit_price, **kwargs):
+        return await self._run(self.wsimple.limit_buy_order, security_id, limit_price, **kwargs)
+
+    async def stop_limit_buy_order(self, security_id: str, stop_price, limit_price, **kwargs):
+        return await self._run(
+            self.wsimple.stop_limit_buy_order, security_id, stop_price, limit_price, **kwargs
+        )
+
+    async def market_sell_order(self, security_id: str, ref_price: float, **kwargs):
+        return await self._run(self.wsimple.market_sell_order, security_id, ref_price, **kwargs)
+
+    async def limit_sell_order(self, security_id: str, limit_price, **kwargs):
+        return await self._run(self.wsimple.limit_sell_order, security_id, limit_price, **kwargs)
+
+    async def stop_limit_sell_order(self, security_id: str, stop_price, limit_price, **kwargs):
+        return await self._run(
+            self.wsimple.stop_limit_sell_order, security_id, stop_price, limit_price, **kwargs
+        )
+
+    async def cancel_order(self, order_id: str, **kwargs):
+        return await self._run(self.wsimple.cancel_order, order_id, **kwargs)
+
+    async def pending_orders(self, **kwargs):
+        return await self._run(self.wsimple.pending_orders, **kwargs)
+
+    async def cancelled_orders(self, **kwargs):
+        return await self._run(self.wsimple.cancelled_orders, **kwargs)
+
+    async def filled_orders(self, **kwargs):
+        return await self._run(self.wsimple.filled_orders, **kwargs)
+
+    # ! security functions
+    async def find_securities(self, ticker: str, **kwargs):
+        return await self._run(self.wsimple.find_securities, ticker, **kwargs)
+
+    async def find_securities_by_id(self, sec_id: str, **kwargs):
+        return await self._run(self.wsimple.find_securities_by_id, sec_id, **kwargs)
+
+    # ! activity functions
+    async def get_activities(self, **kwargs):
+        return await self._run(self.wsimple.get_activities, **kwargs)
+
+    async def get_activities_bookmark(self, bookmark: str, **kwargs):
+        return await self._run(self.wsimple.get_activities_bookmark, bookmark, **kwargs)
@@ -1,4 +1,5 @@
 import json
+import threading
 
 # 3 party
 import cloudscraper as req
@@ -11,6 +12,64 @@ from .errors import (
     RouteNotFoundException,
 )
 
+# process-wide keep-alive scraper session shared by every Wsimple instance and thread
+_session = None
+_session_lock = threading.Lock()
+_pool_maxsize = 10
+_timeout = (3.05, 15)
+
+# optional callable returning a recorded (decoded json) response for an endpoint name, used to replay sessions
+_response_source = None
+# optional callable receiving (endpoint name, decoded json) of every response, used to record sessions
+_response_sink = None
+
+
+def configure_session(pool_maxsize: int = 10, timeout=(3.05, 15)):
+    """
+    Sets the connection pool size and the default (connect, read) timeout of the shared session.
+    The session is rebuilt on the next request.
+    """
+    global _session, _pool_maxsize, _timeout
+    with _session_lock:
+        _pool_maxsize = pool_maxsize
+        _timeout = timeout
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_session():
+    """Returns the shared scraper session, creating it on first use"""
+    global _session
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                scraper = req.create_scraper()
+                # resize cloudscraper's own https adapter pool so that its TLS cipher settings are kept
+                scraper.get_adapter("https://").init_poolmanager(4, _pool_maxsize)
+                _session = scraper
+            session = _session
+    return session
+
+
+def set_response_source(response_source=None):
+    """
+    Serves every non login/refresh request from ``response_source(endpoint_name)`` instead of the network.
+    Pass None to go back to live requests.
+    """
+    global _response_source
+    _response_source = response_source
+
+
+def set_response_sink(response_sink=None):
+    """
+    Passes the endpoint name and decoded json of every non login/refresh response to ``response_sink``.
+    The sink is called on the requesting thread and should return quickly. Pass None to stop.
+    """
+    global _response_sink
+    _response_sink = response_sink
+
 
 def requestor(
     endpoint,
@@ -19,13 +78,21 @@ def requestor(
     request_status=False,
     response_list=False,
     login_refresh=False,
+    raw=False,
     **kwargs,
-) -> Box:
+):
+    """
+    Sends the request of ``endpoint`` and returns its decoded json as a Box,
+    or as the plain decoded dict/list when ``raw`` is set (no Box conversion, for bulk responses).
+    """
     name: str = endpoint.name
     url: str = endpoint.value.route.format(**args)
-    rcloud = req.create_scraper()
+    if _response_source and not login_refresh:
+        data = _response_source(name)
+        return _wrap(data, response_list and not request_status, raw)
+    kwargs.setdefault("timeout", _timeout)
     # logger.debug("{} called".format(name))
-    r = rcloud.request(method=endpoint.value[1], url=url, **kwargs)
+    r = get_session().request(method=endpoint.value[1], url=url, **kwargs)
     # logger.debug("{}: {}".format(name, r.status_code, r.url))
     if login_refresh:
         return r
@@ -37,9 +104,13 @@ def requestor(
     elif r.status_code >= 500:
         raise WealthsimpleServerError
     else:
-        if request_status:
-            return Box(json.loads(r.content))
-        elif response_list:
-            return Box(r.json()[0])
-        else:
-            return Box(r.json())
+        data = json.loads(r.content) if request_status else r.json()
+        if _response_sink:
+            _response_sink(name, data)
+        # request_status responses are returned whole, even for list endpoints
+        return _wrap(data, response_list and not request_status, raw)
+
+
+def _wrap(data, response_list: bool, raw: bool):
+    data = data[0] if response_list else data
+    return data if raw else Box(data)
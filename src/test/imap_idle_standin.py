@@ -0,0 +1,160 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+# Runs IMAPIdleSession against a local plain IMAP stand-in (IDLE -> EXISTS -> fetch/delete), no mailbox needed:
+# python -m src.test.imap_idle_standin
+
+import re
+import socketserver
+import time
+from threading import Lock, Thread, Timer
+
+from src.utility.emailing import IMAPIdleSession
+
+STAND_IN_PORT = 14300
+OTP_SUBJECT = 'Wealthsimple verification code'
+
+
+def _otp_email(code: str) -> bytes:
+    return (f'From: support@wealthsimple.com\r\nSubject: {OTP_SUBJECT}\r\nDate: Tue, 1 Jun 2021 10:30:00 -0400\r\n'
+            f'\r\nYour verification code is {code}\r\n').encode()
+
+
+class _StandInMailbox:
+    """Inbox shared by the stand-in connections: emails by UID, and the writers of the connections idling"""
+
+    def __init__(self):
+        self.emails = dict()
+        self.deleted_uids = set()
+        self.uid_next = 1
+        self.idle_writers = list()
+        # an email to deliver with the next SEARCH response, its EXISTS sent in the same write as the tagged OK
+        self.email_after_search = None
+        self.lock = Lock()
+
+    def deliver(self, raw_email: bytes):
+        with self.lock:
+            self.emails[self.uid_next] = raw_email
+            self.uid_next += 1
+            idle_writers = list(self.idle_writers)
+        for write in idle_writers:
+            # EXISTS and RECENT arrive in one write, as real servers often send them
+            write(b'* %d EXISTS\r\n* 1 RECENT\r\n' % len(self.emails))
+
+
+mailbox = _StandInMailbox()
+
+
+class _StandInIMAPHandler(socketserver.StreamRequestHandler):
+
+    def _write(self, data: bytes):
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def handle(self):
+        self._write(b'* OK IMAP4rev1 stand-in ready\r\n')
+        for raw_line in self.rfile:
+            tag, command, *rest = raw_line.decode().rstrip('\r\n').split(' ', 2)
+            argument = rest[0] if rest else ''
+            done = f'{tag} OK {command} completed\r\n'.encode()
+            command = command.upper()
+
+            if command == 'CAPABILITY':
+                self._write(b'* CAPABILITY IMAP4rev1 IDLE\r\n' + done)
+            elif command in ('LOGIN', 'NOOP'):
+                self._write(done)
+            elif command == 'SELECT':
+                self._write(b'* %d EXISTS\r\n' % len(mailbox.emails) + done)
+            elif command == 'STATUS':
+                self._write(b'* STATUS INBOX (UIDNEXT %d)\r\n' % mailbox.uid_next + done)
+            elif command == 'IDLE':
+                mailbox.idle_writers.append(self._write)
+                self._write(b'+ idling\r\n')
+                self.rfile.readline()  # DONE
+                mailbox.idle_writers.remove(self._write)
+                self._write(done)
+            elif command == 'UID':
+                self._write(self._uid(argument, done))
+            elif command == 'EXPUNGE':
+                with mailbox.lock:
+                    for uid in mailbox.deleted_uids:
+                        mailbox.emails.pop(uid, None)
+                    mailbox.deleted_uids.clear()
+                self._write(done)
+            elif command == 'LOGOUT':
+                self._write(b'* BYE\r\n' + done)
+                return
+            else:
+                self._write(f'{tag} BAD unknown command\r\n'.encode())
+
+    @staticmethod
+    def _uid(argument: str, done: bytes) -> bytes:
+        sub_command, sub_argument = argument.split(' ', 1)
+        sub_command = sub_command.upper()
+
+        if sub_command == 'SEARCH':
+            since_uid = re.search(r'UID (\d+):\*', sub_argument)
+            uids = [uid for uid, raw_email in mailbox.emails.items() if OTP_SUBJECT.encode() in raw_email
+                    and (not since_uid or uid >= int(since_uid.group(1)))]
+            response = ('* SEARCH ' + ' '.join(map(str, uids))).rstrip().encode() + b'\r\n' + done
+            if mailbox.email_after_search:
+                # the unsolicited EXISTS stays in the client's read buffer after it takes the tagged OK
+                with mailbox.lock:
+                    mailbox.emails[mailbox.uid_next] = mailbox.email_after_search
+                    mailbox.uid_next += 1
+                    mailbox.email_after_search = None
+                response += b'* %d EXISTS\r\n' % len(mailbox.emails)
+            return response
+
+        uid = int(sub_argument.split()[0])
+        if sub_command == 'FETCH':
+            raw_email = mailbox.emails[uid]
+            return b'* 1 FETCH (UID %d RFC822 {%d}\r\n' % (uid, len(raw_email)) + raw_email + b')\r\n' + done
+        if sub_command == 'STORE':
+            mailbox.deleted_uids.add(uid)
+        return done
+
+
+class _StandInIMAPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if __name__ == '__main__':
+    imap_server = _StandInIMAPServer(('localhost', STAND_IN_PORT), _StandInIMAPHandler)
+    Thread(target=imap_server.serve_forever, daemon=True).start()
+
+    session = IMAPIdleSession(imap_host='localhost', imap_port=STAND_IN_PORT, email='otp@standin.test',
+                              password='standin', use_ssl=False, idle_seconds=5.0, response_timeout=2.0)
+
+    # IDLE -> EXISTS -> fetch/delete: the email is read as soon as it lands
+    since_uid = session.mark()
+    Timer(0.5, mailbox.deliver, args=(_otp_email('123456'),)).start()
+    started = time.monotonic()
+    mail_data = session.wait_for_mail(subject_title=OTP_SUBJECT, since_uid=since_uid, timeout=10)
+    elapsed = time.monotonic() - started
+    print(f'Email read {elapsed:.2f}s after waiting: {mail_data}')
+    assert '123456' in mail_data['payload'] and elapsed < 2
+    assert not mailbox.emails and not mailbox.deleted_uids
+
+    # an EXISTS already held in imaplib's read buffer when idling starts still wakes the session at once
+    since_uid = session.mark()
+    mailbox.email_after_search = _otp_email('654321')
+    started = time.monotonic()
+    mail_data = session.wait_for_mail(subject_title=OTP_SUBJECT, since_uid=since_uid, timeout=10)
+    elapsed = time.monotonic() - started
+    print(f'Buffered EXISTS handled in {elapsed:.2f}s: {mail_data}')
+    assert '654321' in mail_data['payload'] and elapsed < 2
+
+    # an IDLE ending on its timeout leaves the session in sync for the next commands
+    try:
+        session.wait_for_mail(subject_title=OTP_SUBJECT, since_uid=session.mark(), timeout=0.5)
+        raise AssertionError('No email was delivered')
+    except TimeoutError as err:
+        print(err)
+    assert session.mark() == mailbox.uid_next
+
+    session.close()
+    imap_server.shutdown()
+    print('The IMAP IDLE stand-in checks have passed.')
@@ -0,0 +1,71 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+# Awaits the pending order polls of two Wealthsimple brokers in one event loop, against a stand-in of the async
+# client (no Wealthsimple account needed): python -m src.test.wsimple_async_poll
+
+import asyncio
+import time
+
+from src.autotrade.artifacts.order import RegularOrder
+from src.autotrade.artifacts.position import Position
+from src.autotrade.broker.wsimple_broker import WSimpleBroker
+
+CREATED_AT = '2021-06-01T14:30:00.000Z'
+RESPONSE_SECONDS = 0.5
+
+
+def _activity(order_id: str, ticker_id: str, symbol: str, status: str, settled: bool) -> dict:
+    return {'id': order_id, 'status': status, 'settled': settled, 'symbol': symbol, 'security_id': ticker_id,
+            'account_id': 'tfsa-standin', 'order_type': 'buy_quantity', 'created_at': CREATED_AT}
+
+
+class _StandInAsyncAuth:
+    """Answers activity requests after RESPONSE_SECONDS, like a slow Wealthsimple server would"""
+
+    def __init__(self):
+        self.request_count = 0
+
+    async def get_activities(self, limit, type, sec_id, account_id, raw):
+        self.request_count += 1
+        await asyncio.sleep(RESPONSE_SECONDS)
+        symbol = 'CTS' if sec_id == 'sec-s-cts' else 'AC'
+        return {'results': [_activity(f'order-{symbol}', sec_id, symbol, 'cancelled', True)], 'bookmark': None}
+
+
+class _StandInConnection:
+    async_auth = _StandInAsyncAuth()
+
+
+def _stand_in_broker(trading_symbol: str, ticker_id: str) -> WSimpleBroker:
+    broker = WSimpleBroker(wsimple_conn=_StandInConnection())
+    broker._trading_symbol, broker._currency = trading_symbol, 'CAD'
+    broker._ticker_id, broker._trading_account_id = ticker_id, 'tfsa-standin'
+    broker._position = Position(trading_symbol)
+    broker._write_order_resp(RegularOrder(isbuy=True, islimit=True, size=1, trading_symbol=trading_symbol,
+                                          ref_price=10.0, limit_price=10.0),
+                             _activity(f'order-{trading_symbol}', ticker_id, trading_symbol, 'submitted', False))
+    return broker
+
+
+async def _update_all(brokers):
+    await asyncio.gather(*[broker.update_pending_orders_async() for broker in brokers])
+
+
+if __name__ == '__main__':
+    wsimple_brokers = [_stand_in_broker('CTS', 'sec-s-cts'), _stand_in_broker('AC', 'sec-s-ac')]
+    assert all(broker.pending_orders for broker in wsimple_brokers)
+
+    started = time.monotonic()
+    asyncio.run(_update_all(wsimple_brokers))
+    elapsed = time.monotonic() - started
+
+    # both polls were in flight together: the two requests took about one response time, not two
+    print(f'Polled {len(wsimple_brokers)} brokers in {elapsed:.2f}s')
+    assert _StandInConnection.async_auth.request_count == 2
+    assert elapsed < 2 * RESPONSE_SECONDS
+    for wsimple_broker in wsimple_brokers:
+        print(wsimple_broker.settled_orders)
+        assert not wsimple_broker.pending_orders and len(wsimple_broker.settled_orders) == 1
+    print('The concurrent polling checks have passed.')
@@ -0,0 +1,98 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+# Runs the Wealthsimple order stream against a local websocket stand-in and checks how the broker applies the pushed
+# order events (no Wealthsimple account needed): python -m src.test.wsimple_stream_standin
+
+import asyncio
+import json
+import time
+from threading import Thread
+
+import websockets
+
+from src.autotrade.artifacts.order import RegularOrder
+from src.autotrade.artifacts.position import Position
+from src.autotrade.broker.wsimple_broker import WSimpleBroker
+from src.autotrade.broker_conn.wsimple_stream import WSimpleOrderStream, ORDER_SUBSCRIBE_MESSAGE
+
+STAND_IN_PORT = 8766
+CREATED_AT = '2021-06-01T14:30:00.000Z'
+received_messages = list()
+
+
+def _order_event(order_id: str, status: str, **fields) -> dict:
+    event = {'id': order_id, 'status': status, 'settled': False, 'symbol': 'CTS', 'created_at': CREATED_AT}
+    event.update(fields)
+    return event
+
+
+class _StandInAuth:
+    """Answers the placing requests of the broker like Wealthsimple would"""
+
+    def market_buy_order(self, security_id, ref_price, quantity, account_id):
+        return _order_event('order-standin-1', 'submitted')
+
+    def limit_buy_order(self, security_id, limit_price, quantity, account_id):
+        return _order_event('order-standin-3', 'submitted')
+
+
+class _StandInConnection:
+    auth = _StandInAuth()
+
+
+async def _push_events(websocket, *args):
+    # the stream subscribes to the order-update channel first
+    received_messages.append(json.loads(await websocket.recv()))
+    # a partial fill (without its fill fields), a complete fill, then an event pushed before its order was placed
+    await websocket.send(json.dumps({'payload': _order_event('order-standin-1', 'posted')}))
+    await websocket.send(json.dumps({'payload': _order_event('order-standin-1', 'posted', settled=True,
+                                                             filled_at='2021-06-01T14:30:05.000Z', fill_quantity=2,
+                                                             market_value={'amount': 22.2})}))
+    await websocket.send(json.dumps({'payload': _order_event('order-standin-3', 'cancelled', settled=True)}))
+    await asyncio.sleep(2)
+
+
+async def _serve(seconds: float):
+    async with websockets.serve(_push_events, 'localhost', STAND_IN_PORT):
+        await asyncio.sleep(seconds)
+
+
+def _stand_in_broker() -> WSimpleBroker:
+    broker = WSimpleBroker(wsimple_conn=_StandInConnection())
+    broker._trading_symbol, broker._currency = 'CTS', 'CAD'
+    broker._ticker_id, broker._trading_account_id = 'sec-s-standin', 'tfsa-standin'
+    broker._position = Position('CTS')
+    return broker
+
+
+if __name__ == '__main__':
+    Thread(target=lambda: asyncio.run(_serve(seconds=4)), daemon=True).start()
+    time.sleep(0.5)
+
+    wsimple_broker = _stand_in_broker()
+    market_buy_order = wsimple_broker.market_buy(RegularOrder(isbuy=True, islimit=False, size=2, trading_symbol='CTS',
+                                                              ref_price=11.1, limit_price=11.1))
+    assert market_buy_order.broker_ref_id in wsimple_broker.pending_orders
+
+    order_stream = WSimpleOrderStream(uri_provider=lambda: f'ws://localhost:{STAND_IN_PORT}')
+    wsimple_broker.set_order_stream(order_stream)
+    time.sleep(1.5)
+    order_stream.stop()
+
+    assert received_messages == [ORDER_SUBSCRIBE_MESSAGE]
+
+    # the partial fill only forced a poll, the complete fill settled the order and updated the position
+    print(market_buy_order)
+    print(wsimple_broker.position)
+    assert market_buy_order.is_filled() and market_buy_order.broker_ref_id not in wsimple_broker.pending_orders
+    assert market_buy_order.fill_quantity == 2 and market_buy_order.filled_price == 11.1
+
+    # the event pushed before its placement response is applied once the order is placed
+    assert 'order-standin-3' in wsimple_broker._unmatched_events
+    limit_buy_order = wsimple_broker.limit_buy(RegularOrder(isbuy=True, islimit=True, size=1, trading_symbol='CTS',
+                                                            ref_price=11.0, limit_price=11.0))
+    print(limit_buy_order)
+    assert limit_buy_order.is_settled() and not wsimple_broker.pending_orders
+    print('The order stream stand-in checks have passed.')
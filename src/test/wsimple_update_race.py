@@ -0,0 +1,80 @@
+# Copyright (C) 2021-2030 StockRead Inc.
+# Author: Thanh Tung Nguyen
+# Contact: tungstudies@gmail.com
+
+# Pushes a fill through the order stream while the status of that order is being looked up, and checks the fill is
+# applied once (no Wealthsimple account needed): python -m src.test.wsimple_update_race
+
+from src.autotrade.artifacts.order import RegularOrder
+from src.autotrade.artifacts.position import Position
+from src.autotrade.broker.wsimple_broker import WSimpleBroker
+
+CREATED_AT = '2021-06-01T14:30:00.000Z'
+FILLED_AT = '2021-06-01T14:30:05.000Z'
+
+
+def _activity(order_id: str, status: str, settled: bool, **fields) -> dict:
+    activity = {'id': order_id, 'status': status, 'settled': settled, 'symbol': 'CTS', 'security_id': 'sec-s-standin',
+                'account_id': 'tfsa-standin', 'order_type': 'buy_quantity', 'created_at': CREATED_AT}
+    activity.update(fields)
+    return activity
+
+
+def _fill(order_id: str) -> dict:
+    return _activity(order_id, 'posted', True, filled_at=FILLED_AT, fill_quantity=2, market_value={'amount': 22.2})
+
+
+class _StandInAuth:
+    """Pushes the fill of the order through the broker's stream handler while it answers the lookup request"""
+
+    def __init__(self):
+        self.broker = None
+        self.limits = list()
+
+    def get_activities(self, limit, type, sec_id, account_id, raw):
+        self.limits.append(limit)
+        self.broker._on_order_event(_fill('order-standin-1'))
+        return {'results': [_fill('order-standin-1')], 'bookmark': None}
+
+    def cancel_order(self, order_id):
+        return dict()
+
+
+class _StandInConnection:
+    auth = _StandInAuth()
+
+
+def _stand_in_broker() -> WSimpleBroker:
+    broker = WSimpleBroker(wsimple_conn=_StandInConnection(), is_order_streaming=False)
+    broker._trading_symbol, broker._currency = 'CTS', 'CAD'
+    broker._ticker_id, broker._trading_account_id = 'sec-s-standin', 'tfsa-standin'
+    broker._position = Position('CTS')
+    _StandInConnection.auth.broker = broker
+    return broker
+
+
+def _pending_order(broker: WSimpleBroker) -> RegularOrder:
+    return broker._write_order_resp(RegularOrder(isbuy=True, islimit=True, size=2, trading_symbol='CTS',
+                                                 ref_price=11.1, limit_price=11.1),
+                                    _activity('order-standin-1', 'submitted', False))
+
+
+if __name__ == '__main__':
+    # update_order: the lookup returns the same fill the stream has already applied
+    wsimple_broker = _stand_in_broker()
+    limit_buy_order = _pending_order(wsimple_broker)
+    wsimple_broker.update_order(limit_buy_order)
+    print(wsimple_broker.position)
+    assert limit_buy_order.is_filled() and not wsimple_broker.pending_orders
+    assert wsimple_broker.position.size == 2 and len(wsimple_broker.settled_orders) == 1
+    # the status of a single order is read from a small window of activities
+    assert _StandInConnection.auth.limits == [5]
+
+    # cancel_replace: the order got filled while its cancellation was being confirmed, so nothing is replaced
+    wsimple_broker = _stand_in_broker()
+    limit_buy_order = _pending_order(wsimple_broker)
+    replacement = RegularOrder(isbuy=True, islimit=True, size=2, trading_symbol='CTS', ref_price=11.0,
+                               limit_price=11.0)
+    assert wsimple_broker.cancel_replace(limit_buy_order, replacement, confirm_interval=0.1) is None
+    assert limit_buy_order.is_filled() and wsimple_broker.position.size == 2
+    print('The stream fill race checks have passed.')
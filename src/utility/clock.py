@@ -0,0 +1,87 @@
+import datetime
+import time
+from threading import Event, Lock
+from typing import Optional
+
+from src.utility.singleton import SingletonMeta
+
+
+class VirtualClock(metaclass=SingletonMeta):
+    """
+    Process-wide clock used by market hours, countdowns and order polling.
+    It follows the system clock by default. A replay can switch it to virtual time starting at a recorded
+    timestamp and running at ``speed`` times real speed, or as fast as possible (``speed=None``) in which case
+    virtual time only moves when something sleeps.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._is_virtual = False
+        self._speed: Optional[float] = 1.0
+        self._virtual_anchor = 0.0  # virtual epoch timestamp at the anchor
+        self._real_anchor = 0.0  # monotonic time at the anchor
+
+    @property
+    def is_virtual(self):
+        return self._is_virtual
+
+    @property
+    def speed(self):
+        return self._speed
+
+    def start_virtual(self, start_timestamp: float, speed: Optional[float] = 1.0):
+        with self._lock:
+            self._is_virtual = True
+            self._speed = speed
+            self._virtual_anchor = start_timestamp
+            self._real_anchor = time.monotonic()
+
+    def stop_virtual(self):
+        with self._lock:
+            self._is_virtual = False
+
+    def timestamp(self) -> float:
+        if not self._is_virtual:
+            return time.time()
+
+        with self._lock:
+            if self._speed:
+                return self._virtual_anchor + (time.monotonic() - self._real_anchor) * self._speed
+            else:
+                return self._virtual_anchor
+
+    def now(self, tz: Optional[datetime.tzinfo] = None) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.timestamp(), tz=tz)
+
+    def utcnow(self) -> datetime.datetime:
+        return datetime.datetime.utcfromtimestamp(self.timestamp())
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+
+        if not self._is_virtual:
+            time.sleep(seconds)
+        elif self._speed:
+            time.sleep(seconds / self._speed)
+        else:
+            with self._lock:
+                self._virtual_anchor += seconds
+
+    def wait(self, event: Event, seconds: float) -> bool:
+        """Same as ``event.wait`` for ``seconds`` of clock time (an as-fast-as-possible replay only moves the time)"""
+        if not self._is_virtual:
+            return event.wait(seconds)
+        elif self._speed:
+            return event.wait(max(seconds, 0) / self._speed)
+        else:
+            self.sleep(seconds)
+            return event.is_set()
+
+
+if __name__ == '__main__':
+    clock = VirtualClock()
+    clock.start_virtual(start_timestamp=datetime.datetime(2021, 9, 1, 9, 30).timestamp(), speed=None)
+    print(clock.now())
+    clock.sleep(300)
+    print(clock.now())
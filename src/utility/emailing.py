@@ -5,10 +5,13 @@
 import email
 import imaplib
 import re
+import select
 import smtplib
 import ssl
+import time
 from email.mime.text import MIMEText
-from typing import List
+from threading import RLock
+from typing import List, Optional
 
 from src.secrets.credentials import EMAIL_ADDRESS, EMAIL_PASSWORD
 
@@ -83,16 +86,7 @@ class MailBox:
                 # Select mailbox
                 server.select(mailbox="INBOX", readonly=False)
 
-                factors = list()
-
-                if is_unread:
-                    factors.append('UNSEEN')
-
-                if from_sender:
-                    factors.append(f'HEADER FROM "{from_sender}"')
-
-                if subject_title:
-                    factors.append(f'SUBJECT "{subject_title}"')
+                factors = _search_factors(from_sender, subject_title, is_unread)
 
                 search_query = ' '.join(map(str, factors))
 
@@ -120,18 +114,234 @@ class MailBox:
                 server.close()
                 # logout from the account
                 server.logout()
-                return {
-                    'from': received_message.get("From"),
-                    'date': received_message.get("Date"),
-                    'subject': received_message.get("Subject"),
-                    'payload': received_message.get_payload(0)._payload
-                }
+                return _to_mail_data(received_message)
 
             except imaplib.IMAP4.error as err:
                 # Print any error messages to stdout
                 raise Exception(f"Error: unable to read email - {err}")
 
 
+# DIVIDER: --------------------------------------
+# INFO: IMAPIdleSession Concrete Class
+
+class IMAPIdleSession:
+    """
+    Authenticated IMAP session kept open between reads. ``wait_for_mail`` returns as soon as a matching email lands:
+    it waits on IMAP IDLE notifications instead of sleeping and re-connecting. ``use_ssl=False`` connects to a plain
+    IMAP server (i.e.: a local IMAP stand-in for testing).
+    """
+
+    def __init__(self, imap_host: str = 'imap.gmail.com', imap_port: int = 993,
+                 email: str = EMAIL_ADDRESS, password: str = EMAIL_PASSWORD, use_ssl: bool = True,
+                 idle_seconds: float = 300.0, response_timeout: float = 30.0):
+        """
+        :param idle_seconds: longest single IDLE before re-checking the mailbox (servers drop IDLE after ~30 min)
+        :param response_timeout: longest wait for the server to answer an IDLE command
+        """
+        self._imap_host = imap_host
+        self._imap_port = imap_port
+        self._email = email
+        self._password = password
+        self._use_ssl = use_ssl
+        self._idle_seconds = idle_seconds
+        self._response_timeout = response_timeout
+
+        self._server: Optional[imaplib.IMAP4] = None
+        self._lock = RLock()
+        self._idle_count = 0
+
+    def __str__(self):
+        tojoin = list()
+        tojoin.append('ClassType: {}'.format(type(self).__name__))
+        tojoin.append('IMAP_Host: {}'.format(self._imap_host))
+        tojoin.append('IMAP_Port: {}'.format(self._imap_port))
+        tojoin.append('UseSSL: {}'.format(self._use_ssl))
+        tojoin.append('IsConnected: {}'.format(self.is_connected))
+        censored_email = str(self._email).replace(str(self._email)[4:-4],
+                                                  '*' * len(str(self._email)[4:-4]))
+        tojoin.append('Email: {}'.format(censored_email))
+
+        return ', '.join(tojoin)
+
+    # DIVIDER: Publicly Accessible Method Properties ----------------------------------------------
+    @property
+    def is_connected(self):
+        return self._server is not None
+
+    # DIVIDER: Publicly Accessible Methods --------------------------------------------------------
+    def connect(self):
+        """Logs in and selects the inbox, unless the session is already open"""
+        with self._lock:
+            if not self._server:
+                if self._use_ssl:
+                    server = imaplib.IMAP4_SSL(host=self._imap_host, port=self._imap_port,
+                                               ssl_context=ssl.create_default_context())
+                else:
+                    server = imaplib.IMAP4(host=self._imap_host, port=self._imap_port)
+                server.login(self._email, self._password)
+                server.select(mailbox="INBOX", readonly=False)
+                self._server = server
+
+    def close(self):
+        with self._lock:
+            if self._server:
+                try:
+                    self._server.logout()
+                except (imaplib.IMAP4.error, OSError):
+                    pass
+                self._server = None
+
+    def mark(self) -> int:
+        """Returns the UID of the next email to arrive (pass it to ``wait_for_mail`` to skip older emails)"""
+        return self._call(self._uid_next)
+
+    def wait_for_mail(self, from_sender: str = '', subject_title: str = '', since_uid: Optional[int] = None,
+                      timeout: float = 120.0) -> dict:
+        """
+        Returns (then deletes) the latest matching email, waiting up to ``timeout`` seconds for it to arrive
+        :param since_uid: only emails from this UID on are considered (see ``mark``)
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                mail_data = self._call(self._pop_latest, from_sender, subject_title, since_uid)
+                if mail_data:
+                    return mail_data
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f'Target email not received within {timeout}s '
+                                       f'(Subject: {subject_title}, From: {from_sender})')
+                self._call(self._idle, min(remaining, self._idle_seconds))
+
+    # DIVIDER: Class Private Methods to Process Data Internally -----------------------------------
+    def _call(self, method, *args):
+        """Runs ``method(server, *args)`` on the open session, re-connecting once if the session was dropped"""
+        with self._lock:
+            self.connect()
+            try:
+                return method(self._server, *args)
+            except (imaplib.IMAP4.abort, OSError):
+                self._server = None
+                self.connect()
+                return method(self._server, *args)
+
+    @staticmethod
+    def _uid_next(server: imaplib.IMAP4) -> int:
+        resp_code, data = server.status('INBOX', '(UIDNEXT)')
+        return int(re.search(rb'UIDNEXT (\d+)', data[0]).group(1))
+
+    @staticmethod
+    def _pop_latest(server: imaplib.IMAP4, from_sender: str, subject_title: str,
+                    since_uid: Optional[int]) -> Optional[dict]:
+        factors = _search_factors(from_sender, subject_title, is_unread=False)
+        if since_uid:
+            factors.insert(0, f'UID {since_uid}:*')
+        search_query = f"({' '.join(factors)})" if factors else 'ALL'
+
+        resp_code, messages = server.uid('search', None, search_query)
+        # 'UID n:*' always matches the last email, even one older than n
+        mail_uids = [int(uid) for uid in messages[0].split() if not since_uid or int(uid) >= since_uid]
+        if not mail_uids:
+            return None
+
+        last_uid = str(mail_uids[-1])
+        resp_code, mail_data = server.uid('fetch', last_uid, '(RFC822)')
+        received_message = email.message_from_bytes(mail_data[0][1])
+        server.uid('store', last_uid, '+FLAGS', '(\\Seen \\Deleted)')
+        server.expunge()
+
+        return _to_mail_data(received_message)
+
+    def _idle(self, server: imaplib.IMAP4, idle_seconds: float):
+        """Idles until the server reports a new email (EXISTS) or ``idle_seconds`` elapse"""
+        self._idle_count += 1
+        tag = 'IDLE{}'.format(self._idle_count).encode()
+
+        server.send(tag + b' IDLE\r\n')
+        # untagged responses already buffered (i.e.: an EXISTS sent right after the last command) come first
+        is_new_mail = False
+        while True:
+            line = self._read_line(server, time.monotonic() + self._response_timeout)
+            if line is None or line.startswith(tag):
+                raise imaplib.IMAP4.error(f'IDLE is not supported by the server: {line}')
+            if line.startswith(b'+'):
+                break
+            is_new_mail = is_new_mail or line.endswith(b'EXISTS')
+
+        deadline = time.monotonic() + idle_seconds
+        while not is_new_mail:
+            line = self._read_line(server, deadline)
+            if line is None or line.endswith(b'EXISTS'):
+                break
+
+        server.send(b'DONE\r\n')
+        while True:
+            line = self._read_line(server, time.monotonic() + self._response_timeout)
+            if line is None:
+                raise imaplib.IMAP4.abort('IDLE was not completed by the server')
+            if line.startswith(tag):
+                break
+
+    @staticmethod
+    def _read_line(server: imaplib.IMAP4, deadline: float) -> Optional[bytes]:
+        """
+        Reads one response line through the buffered reader of imaplib (so that no byte it already holds is skipped,
+        and none past the line is consumed), or returns None once the deadline passes without a line
+        """
+        while not IMAPIdleSession._is_readable(server):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([server.socket()], [], [], remaining)[0]:
+                return None
+
+        line = server.readline()
+        if not line:
+            raise imaplib.IMAP4.abort('The IMAP connection was closed while idling')
+        return line.rstrip(b'\r\n')
+
+    @staticmethod
+    def _is_readable(server: imaplib.IMAP4) -> bool:
+        """Whether the buffered reader holds bytes or can get some without blocking (SSL decrypted bytes included)"""
+        sock = server.socket()
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(server.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+
+# DIVIDER: --------------------------------------
+# INFO: Helper Functions
+
+def _search_factors(from_sender: str, subject_title: str, is_unread: bool) -> List[str]:
+    factors = list()
+
+    if is_unread:
+        factors.append('UNSEEN')
+
+    if from_sender:
+        factors.append(f'HEADER FROM "{from_sender}"')
+
+    if subject_title:
+        factors.append(f'SUBJECT "{subject_title}"')
+
+    return factors
+
+
+def _to_mail_data(received_message: email.message.Message) -> dict:
+    payload = received_message.get_payload(0)._payload if received_message.is_multipart() \
+        else received_message.get_payload()
+    return {
+        'from': received_message.get("From"),
+        'date': received_message.get("Date"),
+        'subject': received_message.get("Subject"),
+        'payload': payload
+    }
+
+
 # DIVIDER: --------------------------------------
 # INFO: Usage Examples
 
@@ -1,8 +1,9 @@
 import datetime
-import time
 from typing import List, IO, Union
 from dateutil import parser
 
+from src.utility.clock import VirtualClock
+
 
 class ColorPrinter:
     @classmethod
@@ -36,7 +37,7 @@ def countdown(message: str, time_sec):
         time_format = '{:02d}:{:02d}'.format(mins, secs)
         if mins or secs:
             print(f'\r\033[94m{message}: {time_format}\033[0m', end='', flush=True)
-        time.sleep(1)
+        VirtualClock().sleep(1)
         time_sec -= 1
     print(f'\r ', end='', flush=True)
 
@@ -1,4 +1,4 @@
-from threading import Lock
+from threading import RLock
 
 
 class SingletonMeta(type):
@@ -8,10 +8,11 @@ class SingletonMeta(type):
 
     _instances = {}
 
-    _lock: Lock = Lock()
+    _lock: RLock = RLock()
     """
     We now have a lock object that will be used to synchronize threads during
-    first access to the Singleton.
+    first access to the Singleton. It is re-entrant so that a singleton can
+    create another singleton (i.e.: QuesTradeAPI and SymbolIDCache) in its constructor.
     """
 
     def __call__(cls, *args, **kwargs):
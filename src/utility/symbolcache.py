@@ -0,0 +1,57 @@
+import json
+import os
+import time
+from threading import Lock
+from typing import Optional, Union
+
+from src.config.config import BASE_DIR
+from src.utility.singleton import SingletonMeta
+
+SYMBOL_CACHE_FILEPATH = os.path.join(BASE_DIR, 'cache', 'symbol_ids.json')
+
+
+class SymbolIDCache(metaclass=SingletonMeta):
+    """
+    On-disk cache of symbol to broker/datafeed ID mappings, shared by the Questrade and Wealthsimple lookups.
+    Entries are grouped by namespace (i.e.: 'questrade', 'wsimple') and expire after ``expiry_seconds``.
+    """
+
+    def __init__(self, filepath: str = SYMBOL_CACHE_FILEPATH, expiry_seconds: int = 7 * 24 * 3600):
+        self._filepath = filepath
+        self._expiry_seconds = expiry_seconds
+        self._lock = Lock()
+        self._entries: dict = self._load()
+
+    def get(self, namespace: str, symbol: str) -> Optional[Union[str, int]]:
+        with self._lock:
+            entry = self._entries.get(namespace, dict()).get(symbol)
+
+        if entry and time.time() - entry['cached_at'] < self._expiry_seconds:
+            return entry['id']
+        return None
+
+    def set(self, namespace: str, symbol: str, symbol_id: Union[str, int]):
+        with self._lock:
+            self._entries.setdefault(namespace, dict())[symbol] = {'id': symbol_id, 'cached_at': time.time()}
+            self._save()
+
+    def _load(self) -> dict:
+        try:
+            with open(self._filepath) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    def _save(self):
+        # write to a temporary file first so that a crash never leaves a truncated cache behind
+        os.makedirs(os.path.dirname(self._filepath), exist_ok=True)
+        temp_filepath = f'{self._filepath}.tmp'
+        with open(temp_filepath, 'w') as outfile:
+            json.dump(self._entries, outfile, indent=4, sort_keys=True)
+        os.replace(temp_filepath, self._filepath)
+
+
+if __name__ == '__main__':
+    symbol_cache = SymbolIDCache()
+    symbol_cache.set('questrade', 'CTS.TO', 19719)
+    print(symbol_cache.get('questrade', 'CTS.TO'))
@@ -0,0 +1,72 @@
+from threading import Event, Thread
+from typing import Callable, Optional
+
+
+class TokenRefresher:
+    """
+    Daemon thread renewing API tokens ahead of their expiry, so that no request on the trading path has to wait
+    for a token refresh (or a login round trip). ``seconds_until_due`` tells how long the current tokens can be kept
+    before renewing, and ``refresh`` renews and swaps them in. A failed refresh is retried after ``retry_seconds``.
+    """
+
+    def __init__(self, name: str, seconds_until_due: Callable[[], float], refresh: Callable[[], None],
+                 retry_seconds: float = 30.0, max_wait_seconds: float = 300.0):
+        self._name = name
+        self._seconds_until_due = seconds_until_due
+        self._refresh = refresh
+        self._retry_seconds = retry_seconds
+        # expiry is re-checked at least this often, in case the tokens were replaced from another thread
+        self._max_wait_seconds = max_wait_seconds
+
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if not self.is_running:
+            self._stop_event.clear()
+            self._thread = Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            wait_seconds = self._seconds_until_due()
+            if wait_seconds <= 0:
+                try:
+                    self._refresh()
+                    wait_seconds = self._seconds_until_due()
+                    if wait_seconds <= 0:
+                        print(f'{self._name}: The renewed tokens are already due (wait of {wait_seconds:.0f}s). '
+                              f'Retrying in {self._retry_seconds}s')
+                except Exception as err:
+                    print(f'{self._name}: Unable to refresh the tokens. Error details: {err}')
+
+                # never spin when the renewed tokens are already due (i.e.: a short-lived access token)
+                wait_seconds = wait_seconds if wait_seconds > 0 else self._retry_seconds
+
+            self._stop_event.wait(min(wait_seconds, self._max_wait_seconds))
+
+
+if __name__ == '__main__':
+    import time
+
+    due_timestamp = time.time() + 1
+
+    def _refresh():
+        global due_timestamp
+        print('refreshed at', time.time())
+        due_timestamp = time.time() + 1
+
+    token_refresher = TokenRefresher('demo-refresher', lambda: due_timestamp - time.time(), _refresh)
+    token_refresher.start()
+    time.sleep(3.5)
+    token_refresher.stop()